@@ -0,0 +1,149 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from . import cancellation
+from .cancellation import RequestCancelled
+from .config import ADMISSION_MAX_INFLIGHT_TOKENS, ADMISSION_QUEUE_TIMEOUT
+from .metrics import counter, gauge, histogram
+
+# --- Admission Control ---
+# Request shape limits (MAX_INPUT_ITEMS, MAX_INPUT_LENGTH) do not bound compute:
+# one request may still carry 256 x 8192 tokens. Once a request is tokenized,
+# its inference stage is admitted against a global budget of in-flight tokens.
+# Waiters are ordered by fair-queuing tags per `user`, so a tenant sending many
+# large requests only delays its own later requests.
+
+inflight_tokens = gauge(
+    "admission_inflight_tokens", "Tokens of admitted, still running inference."
+)
+admission_wait = histogram(
+    "admission_wait_seconds", "Time spent waiting for the token budget."
+)
+admission_rejected = counter(
+    "admission_rejected_total",
+    "Requests rejected by admission control.",
+    ("reason",),
+)
+
+ANONYMOUS = ""
+
+
+class AdmissionTimeout(Exception):
+    pass
+
+
+class _Waiter:
+    __slots__ = ("user", "cost", "start", "finish")
+
+    def __init__(self, user: str, cost: int, start: float):
+        self.user = user
+        self.cost = cost
+        self.start = start
+        self.finish = start + cost
+
+
+class AdmissionController:
+    """
+    Global in-flight token budget with weighted fair queuing across users.
+    Each waiter is tagged with a virtual finish time: its user's previous finish
+    tag (or the current virtual time, if later) plus its cost. The waiter with
+    the smallest tag is admitted as soon as its cost fits in the budget.
+    A cost above the whole budget is clamped to it, i.e. runs alone.
+    """
+
+    def __init__(self, max_tokens: int, timeout: Optional[float] = None):
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._queue: List[Tuple[float, int, _Waiter]] = []
+        self._seq = itertools.count()
+
+    @property
+    def in_flight(self) -> int:
+        with self._cond:
+            return self._in_flight
+
+    def waiting(self) -> int:
+        with self._cond:
+            return len(self._queue)
+
+    def _enqueue(self, user: str, cost: int) -> _Waiter:
+        start = max(self._virtual_time, self._last_finish.get(user, 0.0))
+        waiter = _Waiter(user, cost, start)
+        self._last_finish[user] = waiter.finish
+        heapq.heappush(self._queue, (waiter.finish, next(self._seq), waiter))
+        return waiter
+
+    def _remove(self, waiter: _Waiter):
+        self._queue = [item for item in self._queue if item[2] is not waiter]
+        heapq.heapify(self._queue)
+        self._cond.notify_all()
+
+    def _forget_idle_users(self):
+        # Users whose last tag is behind the virtual time carry no credit.
+        if len(self._last_finish) > 1024:
+            self._last_finish = {
+                user: finish
+                for user, finish in self._last_finish.items()
+                if finish > self._virtual_time
+            }
+
+    @contextmanager
+    def admit(self, tokens: int, user: Optional[str] = None):
+        """
+        Blocks until `tokens` fit in the budget and it is `user`'s turn.
+        Raises AdmissionTimeout if that takes longer than the timeout, and
+        RequestCancelled if the current request is cancelled while waiting.
+        """
+        if self.max_tokens <= 0 or tokens <= 0:
+            yield
+            return
+
+        cost = min(int(tokens), self.max_tokens)
+        start_time = time.perf_counter()
+        with self._cond:
+            waiter = self._enqueue(user or ANONYMOUS, cost)
+            try:
+                admitted = cancellation.wait_for(
+                    self._cond,
+                    lambda: (
+                        self._queue[0][2] is waiter
+                        and self._in_flight + cost <= self.max_tokens
+                    ),
+                    self.timeout,
+                )
+            except RequestCancelled:
+                self._remove(waiter)
+                raise
+            if not admitted:
+                self._remove(waiter)
+                admission_rejected.inc(reason="timeout")
+                raise AdmissionTimeout(
+                    f"Token budget exhausted; waited {self.timeout}s for {cost} tokens."
+                )
+            heapq.heappop(self._queue)
+            self._in_flight += cost
+            self._virtual_time = max(self._virtual_time, waiter.start)
+            self._forget_idle_users()
+            inflight_tokens.set(self._in_flight)
+            # A smaller waiter behind this one may also fit.
+            self._cond.notify_all()
+        admission_wait.observe(time.perf_counter() - start_time)
+
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= cost
+                inflight_tokens.set(self._in_flight)
+                self._cond.notify_all()
+
+
+admission = AdmissionController(ADMISSION_MAX_INFLIGHT_TOKENS, ADMISSION_QUEUE_TIMEOUT)
@@ -0,0 +1,235 @@
+import json
+import logging
+import os
+import platform
+import statistics
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from .config import (
+    AUTOTUNE_BATCH_SIZES,
+    AUTOTUNE_CACHE_DIR,
+    AUTOTUNE_LATENCY_SLO_MS,
+    AUTOTUNE_SEQ_BUCKETS,
+)
+from .tokenization import tokenize, tokenize_pairs
+
+# --- Batch Size Autotuning ---
+# The best encode/predict batch size depends on the model size, the sequence
+# length and the host. At load time each model is profiled on synthetic
+# inputs over a (sequence length bucket x batch size) grid. For every bucket,
+# the tuner keeps the batch size with the highest tokens/sec whose per-batch
+# latency stays within AUTOTUNE_LATENCY_SLO_MS. Tables are persisted next to
+# the model cache, keyed by host, so a restart skips the profiling.
+
+logger = logging.getLogger(__name__)
+
+_tables: Dict[str, "TunedTable"] = {}
+_by_model = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def host_fingerprint() -> Dict[str, object]:
+    import torch
+
+    return {
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+        "torch": torch.__version__,
+        "cuda": torch.cuda.get_device_name(0) if torch.cuda.is_available() else None,
+    }
+
+
+class TunedTable:
+    """
+    Tuned batch size per sequence length bucket, with the measurements it
+    was chosen from.
+    """
+
+    def __init__(self, model: str, kind: str, host: Dict, slo_ms: float, buckets):
+        self.model = model
+        self.kind = kind
+        self.host = host
+        self.slo_ms = slo_ms
+        # {bucket: {"batch_size": int, "tokens_per_second": float, "latency_ms": float}}
+        self.buckets: Dict[int, Dict[str, float]] = buckets
+
+    def batch_size_for(self, seq_len: int) -> Optional[int]:
+        if not self.buckets:
+            return None
+        bounds = sorted(self.buckets)
+        for bound in bounds:
+            if seq_len <= bound:
+                return int(self.buckets[bound]["batch_size"])
+        # Beyond the largest profiled bucket, keep tokens per batch constant.
+        largest = bounds[-1]
+        return max(1, int(self.buckets[largest]["batch_size"]) * largest // seq_len)
+
+    def to_dict(self) -> Dict:
+        return {
+            "model": self.model,
+            "kind": self.kind,
+            "host": self.host,
+            "slo_ms": self.slo_ms,
+            "buckets": {str(k): v for k, v in sorted(self.buckets.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "TunedTable":
+        buckets = {int(k): v for k, v in data["buckets"].items()}
+        return cls(data["model"], data["kind"], data["host"], data["slo_ms"], buckets)
+
+
+def _table_path(model_name: str, dtype: str = "fp32") -> Path:
+    # bf16 models batch differently from fp32 ones, so their tables are kept apart
+    suffix = "" if dtype == "fp32" else f"--{dtype}"
+    return Path(AUTOTUNE_CACHE_DIR) / f"{model_name.replace('/', '--')}{suffix}.json"
+
+
+def _forward(model, kind: str, seq_len: int, batch_size: int):
+    import torch
+
+    tokenizer = model.tokenizer
+    input_ids = torch.full((batch_size, seq_len), tokenizer.vocab_size - 1)
+    features = {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)}
+    with torch.no_grad():
+        if kind == "embedding":
+            features = {k: v.to(model.device) for k, v in features.items()}
+            if "token_type_ids" in getattr(tokenizer, "model_input_names", ()):
+                features.setdefault(
+                    "token_type_ids", torch.zeros_like(features["input_ids"])
+                )
+            model.forward(features)
+        else:
+            features = {k: v.to(model.model.device) for k, v in features.items()}
+            model.model(**features)
+
+
+def _max_length(model, kind: str) -> int:
+    value = model.max_seq_length if kind == "embedding" else model.max_length
+    return value if isinstance(value, int) else max(AUTOTUNE_SEQ_BUCKETS)
+
+
+def profile(
+    model,
+    kind: str,
+    seq_buckets: Sequence[int] = AUTOTUNE_SEQ_BUCKETS,
+    batch_sizes: Sequence[int] = AUTOTUNE_BATCH_SIZES,
+    slo_ms: float = AUTOTUNE_LATENCY_SLO_MS,
+    repeats: int = 2,
+) -> Dict[int, Dict[str, float]]:
+    """
+    Measures forward-pass latency on synthetic inputs and returns the chosen
+    batch size per sequence length bucket.
+    """
+    max_length = _max_length(model, kind)
+    results = {}
+    for seq_len in sorted(seq_buckets):
+        seq_len = min(seq_len, max_length)
+        if seq_len in results:
+            continue
+        best = None
+        for batch_size in sorted(batch_sizes):
+            _forward(model, kind, seq_len, batch_size)  # warm-up
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                _forward(model, kind, seq_len, batch_size)
+                timings.append(time.perf_counter() - start)
+            latency = statistics.median(timings)
+            if best is not None and latency * 1000 > slo_ms:
+                break
+            throughput = batch_size * seq_len / latency
+            if best is None or throughput > best["tokens_per_second"]:
+                best = {
+                    "batch_size": batch_size,
+                    "tokens_per_second": round(throughput, 1),
+                    "latency_ms": round(latency * 1000, 2),
+                }
+            if latency * 1000 > slo_ms:
+                # Larger batches only get slower.
+                break
+        results[seq_len] = best
+    return results
+
+
+def tune(model_name: str, model, kind: str, dtype: str = "fp32") -> TunedTable:
+    """
+    Loads the persisted table for this model, dtype and host, or profiles the
+    model and persists the result. The table is then used for every call on
+    `model`.
+    """
+    host = host_fingerprint()
+    path = _table_path(model_name, dtype)
+    table = None
+    try:
+        data = json.loads(path.read_text())
+        if data.get("host") == host and data.get("slo_ms") == AUTOTUNE_LATENCY_SLO_MS:
+            table = TunedTable.from_dict(data)
+    except (OSError, ValueError, KeyError):
+        pass
+
+    if table is None:
+        logger.info("Autotuning batch sizes for '%s'...", model_name)
+        table = TunedTable(
+            model_name, kind, host, AUTOTUNE_LATENCY_SLO_MS, profile(model, kind)
+        )
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(table.to_dict(), indent=2))
+            tmp.replace(path)
+        except OSError as e:
+            logger.warning("Could not persist autotune table to %s: %s", path, e)
+
+    register(model_name, model, table)
+    return table
+
+
+def register(model_name: str, model, table: TunedTable):
+    with _lock:
+        _tables[model_name] = table
+        _by_model[model] = table
+
+
+def unregister(model_name: str):
+    with _lock:
+        _tables.pop(model_name, None)
+
+
+def tables() -> Dict[str, TunedTable]:
+    with _lock:
+        return dict(_tables)
+
+
+def _sequence_length(model, items: List) -> Optional[int]:
+    tokenizer = model.tokenizer
+    if all(isinstance(item, str) for item in items):
+        ids = tokenize(tokenizer, items, add_special_tokens=True)
+    else:
+        queries = {item[0] for item in items}
+        if len(queries) != 1:
+            return None
+        ids = tokenize_pairs(tokenizer, items[0][0], [item[1] for item in items])
+    return max((len(x) for x in ids), default=0)
+
+
+def batch_size_for(
+    model, items: List, input_len: Optional[int] = None
+) -> Optional[int]:
+    """
+    Tuned batch size for encoding/scoring `items` with `model`, or None if the
+    model has not been tuned. The longest sequence picks the bucket; callers
+    that already know it in tokens pass it as `input_len`.
+    """
+    with _lock:
+        table = _by_model.get(model) if _by_model else None
+    if table is None or not items:
+        return None
+    seq_len = _sequence_length(model, items) if input_len is None else input_len
+    return None if seq_len is None else table.batch_size_for(seq_len)
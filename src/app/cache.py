@@ -0,0 +1,78 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from .config import EMBEDDING_CACHE_SIZE
+from .metrics import counter
+
+# --- Caches ---
+
+cache_requests = counter(
+    "cache_requests_total", "Cache lookups by cache and result.", ("cache", "result")
+)
+
+
+def text_key(text: str) -> bytes:
+    """
+    Compact cache key for a (possibly 64K-character) string.
+    """
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class LRUCache:
+    """
+    Thread-safe bounded LRU mapping. A maxsize of 0 disables caching.
+    By default maxsize counts entries; with a `weigher` it bounds the summed
+    weight of the values instead (e.g. the number of cached tokens).
+    """
+
+    def __init__(
+        self, name: str, maxsize: int, weigher: Optional[Callable[[Any], int]] = None
+    ):
+        self.name = name
+        self.maxsize = maxsize
+        self.weigher = weigher or (lambda value: 1)
+        self.weight = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if self.maxsize <= 0:
+            return None
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+        cache_requests.inc(
+            cache=self.name, result="hit" if value is not None else "miss"
+        )
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        weight = self.weigher(value)
+        if weight > self.maxsize:
+            return
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self.weight -= self.weigher(previous)
+            self._data[key] = value
+            self.weight += weight
+            while self.weight > self.maxsize:
+                _, evicted = self._data.popitem(last=False)
+                self.weight -= self.weigher(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.weight = 0
+
+
+# Document embeddings keyed by (model name, text key of the prefixed input).
+embedding_cache = LRUCache("embedding", EMBEDDING_CACHE_SIZE)
@@ -0,0 +1,186 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from .metrics import counter
+
+# --- Request Cancellation ---
+# Sync endpoints run in worker threads, so work for a client that has gone away
+# (or whose X-Request-Timeout has passed) would otherwise run to completion.
+# Each request binds a CancelToken to its context; queue waits and the
+# sub-batch loop check it and raise RequestCancelled to drop the work.
+# Worker threads cannot await the ASGI receive channel, so DisconnectWatcher
+# relays it on the event loop and records when the client goes away.
+
+cancelled_requests = counter(
+    "cancelled_requests_total",
+    "Requests whose inference was dropped before completion.",
+    ("reason", "stage"),
+)
+
+DISCONNECT = "disconnect"
+DEADLINE = "deadline"
+
+# How often blocked waits wake up to check for cancellation.
+POLL_INTERVAL = 0.05
+
+
+class RequestCancelled(Exception):
+    def __init__(self, reason: str, token: "CancelToken"):
+        super().__init__(f"Request cancelled ({reason}).")
+        self.reason = reason
+        self.token = token
+
+
+class CancelToken:
+    """
+    Cancellation state of one request: an optional deadline (monotonic clock)
+    and an optional callable that reports whether the client disconnected.
+    The disconnect probe is rate-limited to one call per POLL_INTERVAL.
+    """
+
+    def __init__(
+        self,
+        deadline: Optional[float] = None,
+        is_disconnected: Optional[Callable[[], bool]] = None,
+    ):
+        self.deadline = deadline
+        self._is_disconnected = is_disconnected
+        self._last_probe = float("-inf")
+        self._lock = threading.Lock()
+        self.reason: Optional[str] = None
+
+    def _probe(self) -> Optional[str]:
+        if self.reason is not None:
+            return self.reason
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.reason = DEADLINE
+        elif self._is_disconnected is not None:
+            with self._lock:
+                now = time.monotonic()
+                if now - self._last_probe >= POLL_INTERVAL:
+                    self._last_probe = now
+                    if self._is_disconnected():
+                        self.reason = DISCONNECT
+        return self.reason
+
+    def check(self, stage: str = "running"):
+        """
+        Raises RequestCancelled if the request was cancelled.
+        """
+        if self._probe() is not None:
+            cancelled_requests.inc(reason=self.reason, stage=stage)
+            raise RequestCancelled(self.reason, self)
+
+
+_current: ContextVar[Optional[CancelToken]] = ContextVar("cancel_token", default=None)
+
+
+def current() -> Optional[CancelToken]:
+    return _current.get()
+
+
+def activate(token: Optional[CancelToken]):
+    """
+    Sets the token for the rest of the current context, e.g. a request's task.
+    """
+    _current.set(token)
+
+
+@contextmanager
+def bind(token: Optional[CancelToken]):
+    """
+    Makes `token` the cancellation token of the work done in this block.
+    """
+    reset = _current.set(token)
+    try:
+        yield token
+    finally:
+        _current.reset(reset)
+
+
+def check(stage: str = "running"):
+    """
+    Raises RequestCancelled if the current request was cancelled.
+    """
+    token = _current.get()
+    if token is not None:
+        token.check(stage)
+
+
+def wait_for(cond: threading.Condition, predicate, timeout: Optional[float] = None):
+    """
+    Condition.wait_for that also gives up when the current request is
+    cancelled. Must be called with the condition's lock held.
+    """
+    token = _current.get()
+    if token is None:
+        return cond.wait_for(predicate, timeout)
+
+    end = None if timeout is None else time.monotonic() + timeout
+    while not predicate():
+        token.check("queued")
+        wait = POLL_INTERVAL
+        if end is not None:
+            wait = min(wait, end - time.monotonic())
+            if wait <= 0:
+                return predicate()
+        cond.wait(wait)
+    return True
+
+
+def wait_event(event: threading.Event):
+    """
+    Event.wait that gives up when the current request is cancelled.
+    """
+    token = _current.get()
+    if token is None:
+        event.wait()
+        return
+    while not event.wait(POLL_INTERVAL):
+        token.check("queued")
+
+
+class DisconnectWatcher:
+    """
+    ASGI middleware that reads each HTTP request's receive channel on the
+    event loop and hands the messages on to the app, so a disconnect is seen
+    even while the endpoint runs in a worker thread. The request's
+    scope["disconnected"] is a callable reporting it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        disconnected = threading.Event()
+        # One message at a time, so request bodies are not buffered here
+        messages: asyncio.Queue = asyncio.Queue(maxsize=1)
+
+        async def relay():
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    disconnected.set()
+                await messages.put(message)
+                if disconnected.is_set():
+                    return
+
+        async def relayed_receive():
+            if disconnected.is_set() and messages.empty():
+                return {"type": "http.disconnect"}
+            return await messages.get()
+
+        scope["disconnected"] = disconnected.is_set
+        task = asyncio.create_task(relay())
+        try:
+            await self.app(scope, relayed_receive, send)
+        finally:
+            task.cancel()
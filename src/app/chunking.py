@@ -0,0 +1,46 @@
+from typing import List, Tuple
+
+import numpy as np
+
+# --- Token Window Chunking ---
+
+# Smallest window a document is split into; shorter windows carry too little
+# context to score and multiply the number of model calls.
+MIN_WINDOW_SIZE = 16
+
+
+def window_spans(length: int, size: int, overlap: int) -> List[Tuple[int, int]]:
+    """
+    Splits `length` tokens into [start, end) windows of at most `size` tokens,
+    each starting `size - overlap` tokens after the previous one. The last
+    window always ends at `length`, so no tokens are dropped.
+    """
+    if length <= size:
+        return [(0, length)]
+
+    stride = max(1, size - overlap)
+    spans = []
+    start = 0
+    while True:
+        end = min(start + size, length)
+        spans.append((start, end))
+        if end == length:
+            return spans
+        start += stride
+
+
+def aggregate_scores(
+    scores: np.ndarray, owners: np.ndarray, num_groups: int, method: str
+) -> np.ndarray:
+    """
+    Reduces per-window scores to one score per owner with "max" or "mean".
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    if method == "mean":
+        sums = np.bincount(owners, weights=scores, minlength=num_groups)
+        counts = np.bincount(owners, minlength=num_groups)
+        return sums / np.maximum(counts, 1)
+
+    result = np.full(num_groups, -np.inf)
+    np.maximum.at(result, owners, scores)
+    return result
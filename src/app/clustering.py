@@ -0,0 +1,172 @@
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .index import kmeans_pp_init, normalize
+
+# --- Clustering ---
+# Both algorithms work on L2-normalized vectors, so the inner product is the
+# cosine similarity. Labels are renumbered in order of first appearance
+# (the first input is always in cluster 0) and empty clusters are dropped, so
+# the result may hold fewer than the requested number of clusters.
+
+
+class VectorBuffer:
+    """
+    Row-appendable matrix with a hard row cap, stored as float16 to halve the
+    memory of large streamed inputs. Capacity doubles up to `max_rows`.
+    """
+
+    def __init__(self, max_rows: int, dtype=np.float16):
+        self.max_rows = max_rows
+        self._dtype = dtype
+        self._data = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, vectors: np.ndarray):
+        vectors = np.atleast_2d(vectors)
+        needed = self._size + len(vectors)
+        if needed > self.max_rows:
+            raise OverflowError(f"More than {self.max_rows} vectors.")
+        if self._data is None:
+            capacity = min(self.max_rows, max(needed, 1024))
+            self._data = np.empty((capacity, vectors.shape[1]), dtype=self._dtype)
+        elif needed > len(self._data):
+            capacity = min(self.max_rows, max(needed, 2 * len(self._data)))
+            data = np.empty((capacity, self._data.shape[1]), dtype=self._dtype)
+            data[: self._size] = self._data[: self._size]
+            self._data = data
+        self._data[self._size : needed] = vectors
+        self._size = needed
+
+    @property
+    def vectors(self) -> np.ndarray:
+        if self._data is None:
+            return np.empty((0, 0), dtype=self._dtype)
+        return self._data[: self._size]
+
+
+def _relabel(
+    labels: np.ndarray, centroids: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Renumbers clusters by first appearance and drops centroids without members.
+    """
+    used, first = np.unique(labels, return_index=True)
+    order = used[np.argsort(first)]
+    mapping = np.full(len(centroids), -1, dtype=np.int64)
+    mapping[order] = np.arange(len(order))
+    return mapping[labels], centroids[order]
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, batch_size: int) -> np.ndarray:
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), batch_size):
+        batch = np.asarray(vectors[start : start + batch_size], dtype=np.float32)
+        labels[start : start + batch_size] = np.argmax(batch @ centroids.T, axis=1)
+    return labels
+
+
+def minibatch_kmeans(
+    vectors: np.ndarray,
+    k: int,
+    batch_size: int = 1024,
+    n_steps: Optional[int] = None,
+    seed: int = 0,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Spherical mini-batch k-means (Sculley, 2010) with k-means++ seeding.
+    `vectors` may be float16; only one batch at a time is converted to float32,
+    so the working memory does not grow with the number of inputs.
+    Returns (labels, centroids).
+    """
+    n = len(vectors)
+    k = max(1, min(k, n))
+    rng = np.random.default_rng(seed)
+
+    sample_size = min(n, max(batch_size, 8 * k))
+    sample = np.asarray(
+        vectors[np.sort(rng.choice(n, size=sample_size, replace=False))],
+        dtype=np.float32,
+    )
+    centroids = kmeans_pp_init(sample, k, rng, candidates=2 + int(math.log(k)))
+    counts = np.zeros(k, dtype=np.float64)
+
+    if n_steps is None:
+        n_steps = min(500, max(20, 3 * math.ceil(n / batch_size)))
+    batch_size = min(batch_size, n)
+    for _ in range(n_steps):
+        batch = np.asarray(
+            vectors[np.sort(rng.integers(n, size=batch_size))], dtype=np.float32
+        )
+        assign = np.argmax(batch @ centroids.T, axis=1)
+        onehot = np.zeros((k, batch_size), dtype=np.float32)
+        onehot[assign, np.arange(batch_size)] = 1.0
+        batch_counts = onehot.sum(axis=1)
+        counts += batch_counts
+        hit = batch_counts > 0
+        # Per-centroid learning rate 1/count: each centroid is the running
+        # mean of every vector ever assigned to it.
+        step = (
+            onehot[hit] @ batch - batch_counts[hit, None] * centroids[hit]
+        ) / counts[hit, None].astype(np.float32)
+        centroids[hit] += step
+        centroids = normalize(centroids)
+
+    labels = _assign(vectors, centroids, batch_size)
+    return _relabel(labels, centroids)
+
+
+def agglomerative(vectors: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Average-linkage agglomerative clustering on cosine similarity, merging
+    the most similar pair until `k` clusters remain. Needs the full N x N
+    similarity matrix, so it is meant for small inputs.
+    Returns (labels, centroids).
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    n = len(vectors)
+    k = max(1, min(k, n))
+    sim = (vectors @ vectors.T).astype(np.float64)
+    np.fill_diagonal(sim, -np.inf)
+    sizes = np.ones(n, dtype=np.float64)
+    labels = np.arange(n)
+
+    for _ in range(n - k):
+        i, j = divmod(int(np.argmax(sim)), n)
+        i, j = min(i, j), max(i, j)
+        # Lance-Williams update for average linkage.
+        merged = (sizes[i] * sim[i] + sizes[j] * sim[j]) / (sizes[i] + sizes[j])
+        sim[i, :] = merged
+        sim[:, i] = merged
+        sim[i, i] = -np.inf
+        sim[j, :] = -np.inf
+        sim[:, j] = -np.inf
+        sizes[i] += sizes[j]
+        labels[labels == j] = i
+
+    labels, _ = _relabel(labels, np.zeros((n, 1)))
+    centroids = np.zeros((labels.max() + 1, vectors.shape[1]), dtype=np.float32)
+    np.add.at(centroids, labels, vectors)
+    return labels, normalize(centroids)
+
+
+def cluster(
+    vectors: np.ndarray, k: int, method: str, max_agglomerative: int, seed: int = 0
+) -> Tuple[np.ndarray, np.ndarray, str]:
+    """
+    Clusters normalized `vectors` into at most `k` clusters. "auto" picks
+    agglomerative clustering up to `max_agglomerative` inputs, mini-batch
+    k-means beyond. Returns (labels, centroids, method used).
+    """
+    if method == "auto":
+        method = "agglomerative" if len(vectors) <= max_agglomerative else "kmeans"
+    if method == "agglomerative":
+        labels, centroids = agglomerative(vectors, k)
+    else:
+        labels, centroids = minibatch_kmeans(vectors, k, seed=seed)
+    return labels, centroids, method
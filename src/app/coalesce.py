@@ -0,0 +1,91 @@
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Sequence, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+from . import cancellation
+from .metrics import counter
+
+# --- Request Coalescing ---
+
+coalesced_requests = counter(
+    "coalesced_requests_total",
+    "Requests answered from an identical in-flight computation.",
+    ("endpoint",),
+)
+deduplicated_inputs = counter(
+    "deduplicated_inputs_total",
+    "Duplicate strings within a request that were not sent to the model.",
+    ("endpoint",),
+)
+
+
+def request_key(endpoint: str, request: BaseModel, exclude=None) -> Tuple[str, bytes]:
+    """
+    Normalized key of a validated request: fields that do not affect the
+    response (e.g. `user`) are excluded, everything else is hashed.
+    """
+    payload = request.model_dump_json(exclude=exclude).encode("utf-8")
+    return endpoint, hashlib.blake2b(payload, digest_size=16).digest()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs at most one computation per key at a time. Callers arriving while a
+    computation for their key is in flight wait for it and share its result
+    (or its exception) instead of running their own. A waiting caller whose
+    own request is cancelled stops waiting.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Returns (result, shared), where shared is True for waiting duplicates.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            cancellation.wait_event(call.done)
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+def deduplicate(texts: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+    """
+    Returns the distinct texts in first-seen order and, for every input, the
+    index of its distinct text, so results can be fanned back out with
+    `unique_results[inverse]`.
+    """
+    positions: Dict[str, int] = {}
+    inverse = np.empty(len(texts), dtype=np.int64)
+    for i, text in enumerate(texts):
+        inverse[i] = positions.setdefault(text, len(positions))
+    return list(positions), inverse
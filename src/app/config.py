@@ -7,19 +7,95 @@ from pathlib import Path
 APP_PORT = int(os.getenv("APP_PORT", "8000"))
 
 # --- Model Configuration ---
-# Load the list of supported models from the YAML file.
+# Load the list of supported models from the YAML file (MODELS_CONFIG overrides
+# its path). The file can be reloaded at runtime (see app/reload.py), which
+# updates EMBEDDING_MODELS, RERANK_MODELS and MODEL_OPTIONS in place so every
+# module that imported them sees the new configuration.
 CONFIG_DIR = Path(__file__).resolve().parent.parent.parent / "config"
-MODELS_FILE = CONFIG_DIR / "models.yml"
+MODELS_FILE = Path(os.getenv("MODELS_CONFIG", str(CONFIG_DIR / "models.yml")))
 
-SUPPORTED_MODELS = {}
-if MODELS_FILE.exists():
-    with open(MODELS_FILE, "r") as f:
-        data = yaml.safe_load(f)
-        if data:
-            SUPPORTED_MODELS = data
 
-EMBEDDING_MODELS = SUPPORTED_MODELS.get("embedding_models", [])
-RERANK_MODELS = SUPPORTED_MODELS.get("rerank_models", [])
+def _parse_model_entries(entries):
+    """
+    Model entries are either a model name or a mapping with a `name` key plus
+    per-model options (see config/models.yml).
+    Returns the list of names and a {name: options} dict.
+    """
+    names, options = [], {}
+    for entry in entries or []:
+        if isinstance(entry, str):
+            names.append(entry)
+        else:
+            entry = dict(entry)
+            name = entry.pop("name")
+            if entry.get("dtype", "fp32") not in ("fp32", "bf16"):
+                raise ValueError(
+                    f"{name}: dtype must be fp32 or bf16, got {entry['dtype']!r}."
+                )
+            names.append(name)
+            options[name] = entry
+    return names, options
+
+
+def load_models_config(path=MODELS_FILE):
+    """
+    Reads a models.yml file.
+    Returns (embedding model names, rerank model names, {name: options}).
+    A missing file means no models; an invalid one raises ValueError.
+    """
+    data = {}
+    if Path(path).exists():
+        with open(path, "r") as f:
+            try:
+                data = yaml.safe_load(f) or {}
+            except yaml.YAMLError as e:
+                raise ValueError(f"Invalid models config {path}: {e}")
+    if not isinstance(data, dict):
+        raise ValueError(f"Invalid models config {path}: expected a mapping.")
+    try:
+        embedding, embedding_options = _parse_model_entries(
+            data.get("embedding_models")
+        )
+        rerank, rerank_options = _parse_model_entries(data.get("rerank_models"))
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid model entry in {path}: {e}")
+    return embedding, rerank, {**embedding_options, **rerank_options}
+
+
+def apply_models_config(embedding, rerank, options):
+    """
+    Replaces the model lists and options in place. Each list assignment is a
+    single atomic operation, so readers see either the old or the new list.
+    """
+    EMBEDDING_MODELS[:] = embedding
+    RERANK_MODELS[:] = rerank
+    MODEL_OPTIONS.update(options)
+    for name in [name for name in MODEL_OPTIONS if name not in options]:
+        MODEL_OPTIONS.pop(name, None)
+
+
+# Model names per kind, and per-model options keyed by model name,
+# e.g. MODEL_OPTIONS[name]["cascade"].
+EMBEDDING_MODELS, RERANK_MODELS, MODEL_OPTIONS = [], [], {}
+apply_models_config(*load_models_config())
+
+# Seconds between checks of MODELS_FILE for changes; 0 disables the watcher
+# (SIGHUP and POST /admin/reload still reload it).
+MODELS_CONFIG_POLL_INTERVAL = float(os.getenv("MODELS_CONFIG_POLL_INTERVAL", "5"))
+
+# Token required in the X-Admin-Token header by the /admin endpoints.
+# Unset, they are disabled and answer 403; the models config can still be
+# reloaded by editing the file or with SIGHUP.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Models loaded at startup rather than on their first request, comma-separated
+# ("all" for every configured model). Empty by default, so workers boot
+# without importing torch.
+PRELOAD_MODELS = [
+    name.strip() for name in os.getenv("PRELOAD_MODELS", "").split(",") if name.strip()
+]
+if PRELOAD_MODELS == ["all"]:
+    PRELOAD_MODELS = EMBEDDING_MODELS + RERANK_MODELS
 
 # --- Ruri-v3 Prefix Mapping ---
 RURI_PREFIX_MAP = {
@@ -42,3 +118,159 @@ MAX_INPUT_LENGTH = int(os.getenv("MAX_INPUT_LENGTH", "65536"))
 # Processing too many items in a single request can lead to timeouts and resource exhaustion (DoS).
 # Clients should batch requests if they need to process more items.
 MAX_INPUT_ITEMS = int(os.getenv("MAX_INPUT_ITEMS", "256"))
+
+# MAX_MODELS_PER_REQUEST bounds how many embedding models one /v1/embeddings
+# request may list in `model`; every model embeds every input.
+MAX_MODELS_PER_REQUEST = int(os.getenv("MAX_MODELS_PER_REQUEST", "4"))
+
+# MAX_RERANK_BATCH_PAIRS bounds the (query, document) pairs of all groups of
+# one /v1/rerank/batch request together.
+MAX_RERANK_BATCH_PAIRS = int(os.getenv("MAX_RERANK_BATCH_PAIRS", "4096"))
+
+# --- Vector Index Configuration ---
+# Defaults for stored embedding collections (see app/index.py).
+# ANN_IVF_NLIST is the number of k-means cells of an IVF index and ANN_IVF_NPROBE
+# the number of cells scanned per query: raising nprobe trades latency for recall.
+ANN_IVF_NLIST = int(os.getenv("ANN_IVF_NLIST", "256"))
+ANN_IVF_NPROBE = int(os.getenv("ANN_IVF_NPROBE", "8"))
+
+# An IVF index is searched exactly until it holds ANN_IVF_MIN_TRAIN_SIZE vectors,
+# at which point its coarse quantizer is trained with k-means on what it has seen.
+ANN_IVF_MIN_TRAIN_SIZE = int(os.getenv("ANN_IVF_MIN_TRAIN_SIZE", "1024"))
+
+# MAX_COLLECTIONS bounds how many in-memory collections a single process may hold.
+MAX_COLLECTIONS = int(os.getenv("MAX_COLLECTIONS", "64"))
+
+# --- Cache Configuration ---
+# Number of document embeddings kept in memory (LRU) for reuse across requests,
+# e.g. by the rerank cascade. 0 disables the cache.
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "20000"))
+
+# Token ids of recently seen strings, bounded by the total number of cached
+# tokens (stored as int32, so 16M tokens is about 64MB). 0 disables the cache.
+TOKEN_CACHE_MAX_TOKENS = int(os.getenv("TOKEN_CACHE_MAX_TOKENS", str(16 * 1024 * 1024)))
+
+# --- Rerank Cascade Configuration ---
+# Default number of documents kept by the embedding prefilter when a rerank
+# cascade is enabled without an explicit top_m (per request or per model).
+RERANK_CASCADE_TOP_M = int(os.getenv("RERANK_CASCADE_TOP_M", "64"))
+
+# --- Long Document Chunking ---
+# Default token window and overlap used when a request asks for chunked
+# processing of long inputs (see app/chunking.py). Many short windows are
+# cheaper than one long sequence because attention cost grows quadratically.
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "512"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "64"))
+# Most windows one chunked request may produce (embedding windows, or
+# (query, window) pairs when reranking). A large overlap shortens the stride
+# between windows, and with it would multiply the cost of every input.
+MAX_CHUNK_WINDOWS = int(os.getenv("MAX_CHUNK_WINDOWS", "2048"))
+
+# --- Scheduler Configuration ---
+# Model calls are granted SCHEDULER_MAX_CONCURRENCY concurrent slots, interactive
+# lane first (see app/scheduler.py). torch already parallelizes a single call
+# across CPU cores, so one slot avoids oversubscription; raise it on GPUs.
+SCHEDULER_MAX_CONCURRENCY = int(os.getenv("SCHEDULER_MAX_CONCURRENCY", "1"))
+
+# Bulk-lane calls are split into sub-batches of this many inputs and yield the
+# slot between them, which bounds how long an interactive query can wait.
+SCHEDULER_SUB_BATCH_SIZE = int(os.getenv("SCHEDULER_SUB_BATCH_SIZE", "32"))
+
+# --- Admission Control ---
+# Upper bound on the tokens of all requests whose inference is running or
+# admitted at once (see app/admission.py). A request larger than the budget
+# runs alone. 0 disables admission control.
+ADMISSION_MAX_INFLIGHT_TOKENS = int(
+    os.getenv("ADMISSION_MAX_INFLIGHT_TOKENS", str(256 * 1024))
+)
+
+# Seconds a request may wait for the token budget before it is rejected with 503.
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "60"))
+
+# --- Memory Guard ---
+# Budget in MB for the predicted peak memory of one encode/predict call (see
+# app/memory.py). Calls over it use smaller forward batches, or are rejected
+# with 413 if a single input does not fit. 0 disables the guard.
+MEMORY_BUDGET_MB = int(os.getenv("MEMORY_BUDGET_MB", "0"))
+
+# --- Pipelined Encoding ---
+# Number of tokenized batches prepared ahead of the forward pass by a
+# background thread during multi-batch encodes (see app/pipeline.py).
+# 0 disables pipelining and uses SentenceTransformer.encode as is; that is the
+# default on single-CPU hosts, where the two stages cannot overlap.
+ENCODE_PREFETCH_BATCHES = int(
+    os.getenv("ENCODE_PREFETCH_BATCHES", "2" if (os.cpu_count() or 1) > 1 else "0")
+)
+
+# --- Batch Size Autotuning ---
+# When AUTOTUNE is enabled, each model is profiled when it is loaded and its
+# encode/predict calls use the tuned batch size for their sequence length
+# (see app/autotune.py). Tables are persisted under AUTOTUNE_CACHE_DIR, which
+# defaults to the Hugging Face model cache, and reused on the same host.
+AUTOTUNE = os.getenv("AUTOTUNE", "false").lower() in ("1", "true", "yes")
+AUTOTUNE_LATENCY_SLO_MS = float(os.getenv("AUTOTUNE_LATENCY_SLO_MS", "500"))
+AUTOTUNE_SEQ_BUCKETS = tuple(
+    int(x)
+    for x in os.getenv("AUTOTUNE_SEQ_BUCKETS", "64,128,256,512,1024,2048").split(",")
+)
+AUTOTUNE_BATCH_SIZES = tuple(
+    int(x) for x in os.getenv("AUTOTUNE_BATCH_SIZES", "1,4,8,16,32,64,128").split(",")
+)
+AUTOTUNE_CACHE_DIR = os.getenv(
+    "AUTOTUNE_CACHE_DIR",
+    os.path.join(
+        os.getenv(
+            "HF_HOME", os.path.join(os.path.expanduser("~"), ".cache", "huggingface")
+        ),
+        "embedding_jp_api",
+        "autotune",
+    ),
+)
+
+# --- Clustering ---
+# /v1/cluster/stream accepts up to CLUSTER_MAX_INPUTS texts per request (see
+# app/clustering.py). Texts are dropped once embedded and vectors are kept as
+# float16, about 1.5KB per input for a 768-dimensional model.
+CLUSTER_MAX_INPUTS = int(os.getenv("CLUSTER_MAX_INPUTS", "50000"))
+CLUSTER_MAX_CLUSTERS = int(os.getenv("CLUSTER_MAX_CLUSTERS", "1024"))
+
+# method="auto" uses agglomerative clustering up to this many inputs and
+# mini-batch k-means beyond; agglomerative needs an N x N similarity matrix.
+CLUSTER_AGGLOMERATIVE_MAX_N = int(os.getenv("CLUSTER_AGGLOMERATIVE_MAX_N", "512"))
+
+# --- Router ---
+# `uvicorn app.router:app` runs a router in front of several replicas of this
+# API (see app/router.py). ROUTER_REPLICAS lists their base URLs, comma-separated.
+ROUTER_REPLICAS = [
+    url.strip().rstrip("/")
+    for url in os.getenv("ROUTER_REPLICAS", "").split(",")
+    if url.strip()
+]
+
+# Each model is served by ROUTER_REPLICAS_PER_MODEL replicas, picked by
+# consistent hashing with ROUTER_VIRTUAL_NODES points per replica on the ring.
+ROUTER_REPLICAS_PER_MODEL = int(os.getenv("ROUTER_REPLICAS_PER_MODEL", "2"))
+ROUTER_VIRTUAL_NODES = int(os.getenv("ROUTER_VIRTUAL_NODES", "64"))
+
+# Seconds between polls of each replica's /ready endpoint.
+ROUTER_POLL_INTERVAL = float(os.getenv("ROUTER_POLL_INTERVAL", "1"))
+
+# A request leaves its preferred replica for another of the model's replicas
+# when that one has ROUTER_MAX_QUEUE_IMBALANCE fewer queued calls, and is
+# spilled to replicas outside the model's set once all of them queue at
+# least ROUTER_SPILL_QUEUE_DEPTH calls.
+ROUTER_MAX_QUEUE_IMBALANCE = int(os.getenv("ROUTER_MAX_QUEUE_IMBALANCE", "4"))
+ROUTER_SPILL_QUEUE_DEPTH = int(os.getenv("ROUTER_SPILL_QUEUE_DEPTH", "16"))
+
+# Idempotent requests still unanswered after the ROUTER_HEDGE_PERCENTILE
+# latency of their endpoint (at least ROUTER_HEDGE_MIN_DELAY_MS) are also sent
+# to the next replica, and the first response wins. Hedges are limited to
+# ROUTER_HEDGE_MAX_RATIO of requests. ROUTER_HEDGE_PERCENTILE=0 disables hedging.
+ROUTER_HEDGE_PERCENTILE = float(os.getenv("ROUTER_HEDGE_PERCENTILE", "95"))
+ROUTER_HEDGE_MIN_DELAY_MS = float(os.getenv("ROUTER_HEDGE_MIN_DELAY_MS", "20"))
+ROUTER_HEDGE_MAX_RATIO = float(os.getenv("ROUTER_HEDGE_MAX_RATIO", "0.1"))
+
+# Upper bound on the replicas one request is sent to, hedges and retries after
+# connection errors or 5xx responses included.
+ROUTER_MAX_ATTEMPTS = int(os.getenv("ROUTER_MAX_ATTEMPTS", "3"))
+ROUTER_TIMEOUT = float(os.getenv("ROUTER_TIMEOUT", "300"))
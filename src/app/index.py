@@ -0,0 +1,326 @@
+import numpy as np
+from typing import Optional, Tuple
+
+# --- Vector Indexes ---
+# All indexes store L2-normalized float32 vectors, so inner product equals cosine
+# similarity. Search returns (scores, ids) arrays of shape (n_queries, k); slots
+# that could not be filled hold score -inf and id -1.
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """
+    Returns a float32 copy of `vectors` with every row scaled to unit length.
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def kmeans_pp_init(vectors: np.ndarray, k: int, rng, candidates: int = 1) -> np.ndarray:
+    """
+    k-means++ seeding on cosine distance for normalized vectors.
+    Returns k rows of `vectors` (as float32) chosen as initial centroids.
+    With candidates > 1 ("greedy" k-means++), each step samples that many
+    points and keeps the one that lowers the total distance the most.
+    """
+    # Avoids starting two centroids in the same cluster, which plain random
+    # init frequently does.
+    n = vectors.shape[0]
+    centroids = np.empty((k, vectors.shape[1]), dtype=np.float32)
+    centroids[0] = vectors[rng.integers(n)]
+    distances = 1.0 - vectors @ centroids[0]
+    for c in range(1, k):
+        weights = np.clip(distances, 0.0, None).astype(np.float64)
+        total = weights.sum()
+        if total > 0:
+            idx = rng.choice(n, size=candidates, p=weights / total)
+        else:
+            idx = rng.integers(n, size=candidates)
+        if candidates == 1:
+            best = idx[0]
+            best_distances = np.minimum(distances, 1.0 - vectors @ vectors[best])
+        else:
+            trial = np.minimum(distances[None, :], 1.0 - vectors[idx] @ vectors.T)
+            pick = int(np.argmin(trial.sum(axis=1)))
+            best, best_distances = idx[pick], trial[pick]
+        centroids[c] = vectors[best]
+        distances = best_distances
+    return centroids
+
+
+def kmeans(vectors: np.ndarray, k: int, n_iter: int = 20, seed: int = 0) -> np.ndarray:
+    """
+    Spherical k-means on normalized vectors using numpy only.
+    Returns a (k, dim) array of unit-length centroids.
+    """
+    n = vectors.shape[0]
+    k = max(1, min(k, n))
+    rng = np.random.default_rng(seed)
+    centroids = kmeans_pp_init(vectors, k, rng)
+
+    for _ in range(n_iter):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=k)
+
+        # Re-seed empty cells with random points so every list stays usable.
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = vectors[rng.choice(n, size=int(empty.sum()))]
+
+        centroids = normalize(sums)
+
+    return centroids
+
+
+def _top_k(
+    scores: np.ndarray, ids: np.ndarray, k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Selects the k best (score, id) pairs from 1-D arrays, padded to length k.
+    """
+    out_scores = np.full(k, -np.inf, dtype=np.float32)
+    out_ids = np.full(k, -1, dtype=np.int64)
+    if scores.size == 0:
+        return out_scores, out_ids
+
+    # Optimization: argpartition is O(N) and only the k survivors are sorted.
+    n = min(k, scores.size)
+    if n < scores.size:
+        part = np.argpartition(-scores, n - 1)[:n]
+    else:
+        part = np.arange(scores.size)
+    order = part[np.lexsort((ids[part], -scores[part]))]
+
+    out_scores[:n] = scores[order]
+    out_ids[:n] = ids[order]
+    return out_scores, out_ids
+
+
+def top_k_rows(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Row-wise top-k of a 2-D score matrix, best first (ties by column index).
+    Returns the (n, k) scores and column indices, with k capped at the row width.
+    """
+    n, m = scores.shape
+    k = min(k, m)
+    if k <= 0:
+        return scores[:, :0], np.empty((n, 0), dtype=np.int64)
+    if k < m:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(m), (n, m))
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.lexsort((part, -part_scores), axis=1)
+    indices = np.take_along_axis(part, order, axis=1)
+    return np.take_along_axis(scores, indices, axis=1), indices
+
+
+class _GrowableMatrix:
+    """
+    Row-appendable float32 matrix with amortized O(1) inserts (capacity doubling).
+    """
+
+    def __init__(self, dim: int):
+        self._data = np.empty((0, dim), dtype=np.float32)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, vectors: np.ndarray, ids: np.ndarray):
+        needed = self._size + len(vectors)
+        if needed > len(self._data):
+            capacity = max(needed, 2 * len(self._data), 16)
+            data = np.empty((capacity, self._data.shape[1]), dtype=np.float32)
+            data[: self._size] = self._data[: self._size]
+            new_ids = np.empty(capacity, dtype=np.int64)
+            new_ids[: self._size] = self._ids[: self._size]
+            self._data, self._ids = data, new_ids
+
+        self._data[self._size : needed] = vectors
+        self._ids[self._size : needed] = ids
+        self._size = needed
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._data[: self._size]
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._ids[: self._size]
+
+
+class FlatIndex:
+    """
+    Exact (brute-force) inner-product index.
+    """
+
+    index_type = "flat"
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self._store = _GrowableMatrix(dim)
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def add(self, vectors: np.ndarray, ids: np.ndarray):
+        self._store.append(normalize(vectors), ids)
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = normalize(queries)
+        scores = queries @ self._store.vectors.T
+        results = [_top_k(row, self._store.ids, k) for row in scores]
+        return (
+            np.stack([r[0] for r in results]),
+            np.stack([r[1] for r in results]),
+        )
+
+
+class IVFIndex:
+    """
+    Inverted-file index (IVF-flat) with a k-means coarse quantizer.
+
+    Vectors are bucketed by their nearest centroid and a query only scans the
+    `nprobe` closest buckets. Until `min_train_size` vectors have been added the
+    index falls back to exact search, then trains itself on what it holds.
+    Inserts after training are incremental: new vectors are appended to their
+    bucket. While the number of cells is still capped by the training size, the
+    quantizer is retrained each time the collection grows 4x.
+
+    With `auto_train=False` the index never trains inside add(); the owner
+    polls training_vectors(), fits centroids on them (possibly without holding
+    its lock) and installs them with set_centroids().
+    """
+
+    index_type = "ivf"
+
+    def __init__(
+        self,
+        dim: int,
+        nlist: int,
+        nprobe: int,
+        min_train_size: int,
+        seed: int = 0,
+        auto_train: bool = True,
+    ):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.seed = seed
+        self.auto_train = auto_train
+        self.centroids: Optional[np.ndarray] = None
+        self._lists = []
+        self._pending = _GrowableMatrix(dim)
+        self._size = 0
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def training_vectors(self) -> Optional[np.ndarray]:
+        """
+        A copy of the vectors to (re)train the quantizer on, if training is
+        due: first once `min_train_size` vectors are held, then on 4x growth.
+        """
+        if not self.is_trained:
+            if len(self._pending) >= self.min_train_size:
+                return self._pending.vectors.copy()
+            return None
+        if len(self.centroids) < self.nlist and self._size >= 4 * self._trained_size:
+            return np.concatenate([lst.vectors for lst in self._lists])
+        return None
+
+    def fit(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Coarse quantizer centroids for `vectors`. Leaves the index unchanged.
+        """
+        vectors = normalize(vectors)
+        # Keep roughly 39+ points per cell (the usual k-means sampling guideline)
+        # and bound the training cost to 256 points per cell.
+        nlist = max(1, min(self.nlist, len(vectors) // 39 or 1))
+        if len(vectors) > nlist * 256:
+            rng = np.random.default_rng(self.seed)
+            vectors = vectors[rng.choice(len(vectors), nlist * 256, replace=False)]
+        return kmeans(vectors, nlist, seed=self.seed)
+
+    def train(self, vectors: np.ndarray):
+        """
+        Trains the coarse quantizer and re-buckets every stored vector.
+        """
+        self.set_centroids(self.fit(vectors))
+
+    def set_centroids(self, centroids: np.ndarray):
+        """
+        Installs a trained quantizer and re-buckets every stored vector,
+        including those added since its training vectors were taken.
+        """
+        self.centroids = centroids
+        self._trained_size = self._size
+
+        stored = [(lst.vectors, lst.ids) for lst in self._lists]
+        stored.append((self._pending.vectors, self._pending.ids))
+        self._lists = [_GrowableMatrix(self.dim) for _ in range(len(self.centroids))]
+        self._pending = _GrowableMatrix(self.dim)
+        for vecs, ids in stored:
+            if len(vecs):
+                self._assign(vecs, ids)
+
+    def _assign(self, vectors: np.ndarray, ids: np.ndarray):
+        cells = np.argmax(vectors @ self.centroids.T, axis=1)
+        for cell in np.unique(cells):
+            mask = cells == cell
+            self._lists[cell].append(vectors[mask], ids[mask])
+
+    def add(self, vectors: np.ndarray, ids: np.ndarray):
+        vectors = normalize(vectors)
+        self._size += len(vectors)
+
+        if self.is_trained:
+            self._assign(vectors, ids)
+        else:
+            self._pending.append(vectors, ids)
+
+        if self.auto_train:
+            training = self.training_vectors()
+            if training is not None:
+                self.train(training)
+
+    def search(
+        self, queries: np.ndarray, k: int, nprobe: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        queries = normalize(queries)
+
+        if not self.is_trained:
+            scores = queries @ self._pending.vectors.T
+            results = [_top_k(row, self._pending.ids, k) for row in scores]
+        else:
+            nprobe = max(1, min(nprobe or self.nprobe, len(self.centroids)))
+            coarse = queries @ self.centroids.T
+            results = []
+            for query, cell_scores in zip(queries, coarse):
+                if nprobe < len(self.centroids):
+                    cells = np.argpartition(-cell_scores, nprobe - 1)[:nprobe]
+                else:
+                    cells = np.arange(len(self.centroids))
+                probed = [self._lists[c] for c in cells if len(self._lists[c])]
+                if not probed:
+                    results.append(_top_k(np.empty(0), np.empty(0), k))
+                    continue
+                vecs = np.concatenate([lst.vectors for lst in probed])
+                ids = np.concatenate([lst.ids for lst in probed])
+                results.append(_top_k(vecs @ query, ids, k))
+
+        return (
+            np.stack([r[0] for r in results]),
+            np.stack([r[1] for r in results]),
+        )
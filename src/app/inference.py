@@ -0,0 +1,106 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from . import autotune, cancellation, memory
+from .config import SCHEDULER_MAX_CONCURRENCY, SCHEDULER_SUB_BATCH_SIZE
+from .pipeline import pipelined_encode, prefetch_for
+from .scheduler import BULK, scheduler
+
+# --- Scheduled Model Calls ---
+# Every encode/predict goes through the scheduler. Bulk calls larger than one
+# sub-batch are split, and the inference slot is released between sub-batches
+# so queued interactive work can run in between. Cancelled requests are
+# dropped before each model call, i.e. at sub-batch boundaries. Tuned models
+# get the batch size autotune picked for the longest input, lowered further
+# if the memory guard predicts it would exceed MEMORY_BUDGET_MB. Bulk encodes
+# on pipelined models take a slot per forward batch instead, so the next
+# batches are tokenized while one runs.
+
+# encode() and predict() default batch size
+DEFAULT_BATCH_SIZE = 32
+
+# Independent model calls of one request (e.g. several embedding models) run
+# side by side on this pool. Its tasks only wait on scheduler slots, never on
+# the pool itself, so a small fixed size cannot deadlock.
+_pool = ThreadPoolExecutor(
+    max_workers=max(4, SCHEDULER_MAX_CONCURRENCY), thread_name_prefix="inference"
+)
+
+
+def _batch_size(model, items: List, input_len: Optional[int] = None) -> Optional[int]:
+    batch_size = autotune.batch_size_for(model, items, input_len)
+    fitted = memory.fit_batch_size(
+        model, items, batch_size or DEFAULT_BATCH_SIZE, input_len=input_len
+    )
+    if fitted != (batch_size or DEFAULT_BATCH_SIZE):
+        batch_size = fitted
+    return batch_size
+
+
+def _run(model, fn, items: List, lane: str, input_len: Optional[int] = None):
+    batch_size = _batch_size(model, items, input_len)
+    if batch_size is not None:
+        fn = partial(fn, batch_size=batch_size)
+
+    if lane != BULK or len(items) <= SCHEDULER_SUB_BATCH_SIZE:
+        with scheduler.slot(lane):
+            cancellation.check()
+            return fn(items)
+
+    parts = []
+    for start in range(0, len(items), SCHEDULER_SUB_BATCH_SIZE):
+        with scheduler.slot(lane):
+            cancellation.check()
+            parts.append(
+                np.asarray(fn(items[start : start + SCHEDULER_SUB_BATCH_SIZE]))
+            )
+    return np.concatenate(parts)
+
+
+def encode(model, texts: List[str], lane: str):
+    """
+    model.encode(texts) scheduled in `lane`.
+    """
+    if lane == BULK and len(texts) > SCHEDULER_SUB_BATCH_SIZE:
+        # Forward batches no larger than a sub-batch, each in its own slot,
+        # while the next ones are tokenized ahead
+        batch_size = min(
+            _batch_size(model, texts) or DEFAULT_BATCH_SIZE, SCHEDULER_SUB_BATCH_SIZE
+        )
+        prefetch = prefetch_for(model, texts, batch_size)
+        if prefetch:
+            return pipelined_encode(
+                model,
+                list(texts),
+                batch_size=batch_size,
+                prefetch=prefetch,
+                forward_slot=partial(scheduler.slot, lane),
+            )
+    return _run(model, model.encode, texts, lane)
+
+
+def predict(model, pairs: List[List[str]], lane: str, input_len: Optional[int] = None):
+    """
+    model.predict(pairs) scheduled in `lane`. `input_len`, the longest pair in
+    tokens, saves tokenizing the pairs again to pick the batch size.
+    """
+    return _run(model, model.predict, pairs, lane, input_len)
+
+
+def run_concurrently(calls: List[Callable]) -> List:
+    """
+    Runs the calls concurrently, the first in the caller's thread and the rest
+    on the inference pool with the caller's context (so cancellation applies),
+    and returns their results in order. Errors are raised once all calls ended.
+    """
+    futures = [_pool.submit(contextvars.copy_context().run, call) for call in calls[1:]]
+    try:
+        first = calls[0]()
+    finally:
+        for future in futures:
+            future.exception()
+    return [first] + [future.result() for future in futures]
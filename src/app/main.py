@@ -1,22 +1,137 @@
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
-from typing import Tuple, List
+from fastapi import FastAPI, HTTPException, Request, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse
+from typing import Annotated, AsyncIterator, NamedTuple, Tuple, List, Optional, Union
+from functools import partial
+from contextlib import asynccontextmanager, contextmanager
 import heapq
+import hmac
+import time
+import base64
+import json
+import anyio
+import numpy as np
 import logging
 
 from .schemas import (
     EmbeddingRequest,
     EmbeddingResponse,
+    MultiModelEmbeddingResponse,
     EmbeddingData,
+    EmbeddingChunk,
     Usage,
     RerankRequest,
     RerankResponse,
     RerankData,
+    RerankChunking,
+    CascadeInfo,
+    CollectionCreateRequest,
+    CollectionInfo,
+    CollectionAddRequest,
+    CollectionAddResponse,
+    CollectionSearchRequest,
+    CollectionSearchResponse,
+    CollectionSearchData,
+    RetrieveRerankRequest,
+    RetrieveRerankResponse,
+    SimilarityRequest,
+    SimilarityResponse,
+    ClusterOptions,
+    ClusterRequest,
+    ClusterResponse,
+    BatchRerankRequest,
+    BatchRerankResult,
+    BatchRerankResponse,
+    TokenizeRequest,
+    TokenizeData,
+    TokenizeResponse,
 )
-from .models import get_model
-from .config import EMBEDDING_MODELS, RERANK_MODELS, RURI_PREFIX_MAP
+from .models import get_model, get_tokenizer, loaded_models, preload
+from .store import collection_store
+from .index import normalize, top_k_rows
+from .chunking import MIN_WINDOW_SIZE, window_spans, aggregate_scores
+from .tokenization import (
+    tokenize,
+    tokenize_pairs,
+    tokenizer_fingerprint,
+    truncation_offsets,
+    pair_truncation_offsets,
+)
+from .config import (
+    EMBEDDING_MODELS,
+    RERANK_MODELS,
+    RURI_PREFIX_MAP,
+    MODEL_OPTIONS,
+    RERANK_CASCADE_TOP_M,
+    PRELOAD_MODELS,
+    MODELS_FILE,
+    MODELS_CONFIG_POLL_INTERVAL,
+    ADMIN_TOKEN,
+    SCHEDULER_SUB_BATCH_SIZE,
+    MAX_INPUT_ITEMS,
+    MAX_INPUT_LENGTH,
+    CLUSTER_MAX_INPUTS,
+    CLUSTER_AGGLOMERATIVE_MAX_N,
+    AUTOTUNE_SEQ_BUCKETS,
+    CHUNK_OVERLAP,
+    MAX_CHUNK_WINDOWS,
+)
+from .cache import embedding_cache, text_key
+from .metrics import REGISTRY, counter
+from .scheduler import INTERACTIVE, BULK, LANES, scheduler, track_latency
+from .admission import admission, AdmissionTimeout
+from . import cancellation
+from .cancellation import CancelToken, DisconnectWatcher, RequestCancelled
+from .memory import MemoryBudgetExceeded
+from . import inference
+from . import autotune
+from .clustering import VectorBuffer, cluster
+from .wire import NegotiatedRoute, negotiate, render
+from .reload import (
+    ConfigWatcher,
+    reload,
+    install_sighup_handler,
+    remove_sighup_handler,
+)
+from .coalesce import (
+    SingleFlight,
+    request_key,
+    deduplicate,
+    coalesced_requests,
+    deduplicated_inputs,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if PRELOAD_MODELS:
+        await anyio.to_thread.run_sync(preload, PRELOAD_MODELS)
+    watcher = None
+    if MODELS_CONFIG_POLL_INTERVAL > 0:
+        watcher = ConfigWatcher(
+            MODELS_FILE, MODELS_CONFIG_POLL_INTERVAL, partial(reload, "watch")
+        )
+        watcher.start()
+    install_sighup_handler()
+    yield
+    remove_sighup_handler()
+    if watcher is not None:
+        watcher.stop()
 
-app = FastAPI(title="OpenAI-Compatible API")
+
+app = FastAPI(title="OpenAI-Compatible API", lifespan=lifespan)
+# Request bodies may also be MessagePack or Arrow IPC (see app/wire.py).
+app.router.route_class = NegotiatedRoute
+app.add_middleware(DisconnectWatcher)
+
+rerank_cascade_pairs = counter(
+    "rerank_cascade_pairs_total",
+    "Rerank (query, document) pairs by cascade outcome.",
+    ("model", "outcome"),
+)
+
+# Identical requests in flight at the same time share one computation.
+inflight = SingleFlight()
 
 
 @app.exception_handler(Exception)
@@ -30,147 +145,1491 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 
 
-@app.post("/v1/embeddings", response_model=EmbeddingResponse)
-def create_embeddings(request: EmbeddingRequest):
+@app.exception_handler(RequestCancelled)
+async def request_cancelled_handler(request: Request, exc: RequestCancelled):
+    # 499 (client closed request) mirrors nginx; nobody is left to read it.
+    status_code = 504 if exc.reason == cancellation.DEADLINE else 499
+    return JSONResponse(status_code=status_code, content={"detail": str(exc)})
+
+
+@app.exception_handler(MemoryBudgetExceeded)
+async def memory_budget_exceeded_handler(request: Request, exc: MemoryBudgetExceeded):
+    return JSONResponse(status_code=413, content={"detail": str(exc)})
+
+
+async def bind_cancel_token(request: Request):
     """
-    Creates embeddings for the given input, following OpenAI's API format.
+    Binds a CancelToken for this request: a deadline from the optional
+    X-Request-Timeout header (seconds) and a probe for client disconnects.
+    Sync endpoints run in a copy of this context, so their worker threads see it.
     """
-    if request.model not in EMBEDDING_MODELS:
-        raise HTTPException(
-            status_code=400, detail=f"Model '{request.model}' not found for embeddings."
-        )
+    deadline = None
+    timeout = request.headers.get("x-request-timeout")
+    if timeout is not None:
+        try:
+            seconds = float(timeout)
+        except ValueError:
+            seconds = 0.0
+        if not seconds > 0:
+            raise HTTPException(
+                status_code=400, detail="Invalid X-Request-Timeout header."
+            )
+        deadline = time.monotonic() + seconds
 
-    try:
-        model = get_model(request.model)
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    # Set by DisconnectWatcher on the event loop; safe to read from any thread
+    is_disconnected = request.scope.get("disconnected")
+    cancellation.activate(CancelToken(deadline, is_disconnected))
 
-    inputs = request.input if isinstance(request.input, list) else [request.input]
 
+def _resolve_prefix(
+    model_name: str, input_type: Optional[str], apply_ruri_prefix: bool, single: bool
+) -> str:
+    """
+    Determines the Ruri-v3 prefix once per request.
+    `single` tells the compatibility fallback whether the input was a bare string.
+    """
+    if "ruri-v3" not in model_name:
+        return ""
+    if input_type in RURI_PREFIX_MAP:
+        return RURI_PREFIX_MAP[input_type]
+    if apply_ruri_prefix:
+        # Fallback logic based on input shape (compatibility mode)
+        return RURI_PREFIX_MAP["query"] if single else RURI_PREFIX_MAP["document"]
+    return ""
+
+
+def _apply_prefix(inputs: List[str], prefix: str) -> List[str]:
+    # If the text already starts with the prefix, we don't add it again.
+    if not prefix:
+        return list(inputs)
+    return [text if text.startswith(prefix) else f"{prefix}{text}" for text in inputs]
+
+
+def _prepare_embedding_inputs(
+    model, inputs: List[str], prefix: str
+) -> Tuple[List[str], int]:
+    """
+    Applies the prefix and truncates inputs to the model's maximum sequence length.
+    Returns the strings to encode and the total token usage.
+    """
     max_seq_length = getattr(model, "max_seq_length", 8192)
     tokenizer = model.tokenizer
 
-    # Optimization: Determine prefix once per request
-    prefix = ""
-    if "ruri-v3" in request.model:
-        if request.input_type in RURI_PREFIX_MAP:
-            prefix = RURI_PREFIX_MAP[request.input_type]
-        elif request.apply_ruri_prefix:
-            # Fallback logic based on input shape (compatibility mode)
-            if isinstance(request.input, str):
-                prefix = RURI_PREFIX_MAP["query"]
-            else:
-                prefix = RURI_PREFIX_MAP["document"]
-
     # 1. Prepare strings with prefixes
-    # If the text already starts with the prefix, we don't add it again.
-    if prefix:
-        processed_inputs = [
-            text if text.startswith(prefix) else f"{prefix}{text}" for text in inputs
-        ]
-    else:
-        processed_inputs = inputs
+    processed_inputs = _apply_prefix(inputs, prefix)
 
     # 2. Batch tokenize to calculate usage and truncate if necessary
-    # We use batch_encode_plus (tokenizer call) which is much faster than looping
+    # Token ids come from the token cache; misses are tokenized in one batched call.
     total_tokens = 0
     special_tokens_count = tokenizer.num_special_tokens_to_add(False)
     limit = max_seq_length - special_tokens_count
 
-    # Process in batches to avoid OOM on huge payloads
-    batch_size = 256
-    for i in range(0, len(processed_inputs), batch_size):
-        batch = processed_inputs[i : i + batch_size]
-        # add_special_tokens=False so we get raw tokens of the content
-        encodings = tokenizer(batch, add_special_tokens=False)
-
-        for j, ids in enumerate(encodings["input_ids"]):
-            if len(ids) > limit:
-                # Truncate input to avoid double tokenization of long tails in model.encode
-                # and to ensure the model sees exactly what we counted.
-                truncated_ids = ids[:limit]
-                truncated_text = tokenizer.decode(truncated_ids)
-                processed_inputs[i + j] = truncated_text
-                total_tokens += len(truncated_ids) + special_tokens_count
-            else:
-                total_tokens += len(ids) + special_tokens_count
+    # add_special_tokens=False so we get raw tokens of the content
+    for i, ids in enumerate(tokenize(tokenizer, processed_inputs)):
+        if len(ids) > limit:
+            # Truncate input to avoid double tokenization of long tails in model.encode
+            # and to ensure the model sees exactly what we counted.
+            truncated_ids = ids[:limit]
+            truncated_text = tokenizer.decode(truncated_ids.tolist())
+            processed_inputs[i] = truncated_text
+            total_tokens += len(truncated_ids) + special_tokens_count
+        else:
+            total_tokens += len(ids) + special_tokens_count
 
-    usage = Usage(prompt_tokens=total_tokens, total_tokens=total_tokens)
+    return processed_inputs, total_tokens
 
-    # Get embeddings
-    vectors = model.encode(processed_inputs)
 
-    # Create response data
-    response_data = [
-        EmbeddingData(embedding=vector.tolist(), index=i)
-        for i, vector in enumerate(vectors)
+def _check_chunk_windows(num_windows: int):
+    if num_windows > MAX_CHUNK_WINDOWS:
+        raise HTTPException(
+            status_code=422,
+            detail=(
+                f"Chunking would split the request into {num_windows} windows, over "
+                f"the limit of {MAX_CHUNK_WINDOWS}; send fewer or shorter inputs, "
+                "or a smaller overlap."
+            ),
+        )
+
+
+def _chunk_embedding_inputs(
+    model, inputs: List[str], prefix: str, overlap: Optional[int]
+) -> Tuple[List[str], np.ndarray, List[Tuple[int, int]], int]:
+    """
+    Splits inputs longer than the model's maximum sequence length into
+    overlapping token windows, each carrying the prefix.
+    Returns the window texts, the input index of each window, the token span of
+    each window within its input, and the total token usage.
+    Raises a 422 if the overlap does not fit the window, or the request would
+    produce more than MAX_CHUNK_WINDOWS windows.
+    """
+    max_seq_length = getattr(model, "max_seq_length", 8192)
+    tokenizer = model.tokenizer
+    special_tokens_count = tokenizer.num_special_tokens_to_add(False)
+    limit = max_seq_length - special_tokens_count
+
+    prefix_length = len(tokenize(tokenizer, [prefix])[0]) if prefix else 0
+    window_size = max(1, limit - prefix_length)
+    if overlap is None:
+        # The default overlap is kept to half of a small model's window
+        overlap = min(CHUNK_OVERLAP, window_size // 2)
+    elif overlap >= window_size:
+        raise HTTPException(
+            status_code=422,
+            detail=(
+                f"'chunk_overlap' ({overlap}) must be smaller than the model's "
+                f"window of {window_size} tokens."
+            ),
+        )
+
+    # Windows are cut from the text without its prefix, which is re-applied per window.
+    contents = [
+        text[len(prefix) :] if prefix and text.startswith(prefix) else text
+        for text in inputs
     ]
+    token_ids = tokenize(tokenizer, contents)
+    input_spans = [window_spans(len(ids), window_size, overlap) for ids in token_ids]
+    _check_chunk_windows(sum(len(s) for s in input_spans))
+
+    windows, owners, spans = [], [], []
+    total_tokens = 0
+    for i, ids in enumerate(token_ids):
+        for start, end in input_spans[i]:
+            if end - start == len(ids):
+                windows.append(f"{prefix}{contents[i]}")
+            else:
+                windows.append(f"{prefix}{tokenizer.decode(ids[start:end].tolist())}")
+            owners.append(i)
+            spans.append((start, end))
+            total_tokens += end - start + prefix_length + special_tokens_count
 
-    return EmbeddingResponse(data=response_data, model=request.model, usage=usage)
+    return windows, np.asarray(owners, dtype=np.int64), spans, total_tokens
 
 
-@app.post("/v1/rerank", response_model=RerankResponse)
-def create_rerank(request: RerankRequest):
+def _pool_windows(
+    window_vectors: np.ndarray,
+    owners: np.ndarray,
+    spans: List[Tuple[int, int]],
+    num_inputs: int,
+) -> np.ndarray:
     """
-    Reranks a list of documents for a given query.
+    Token-length weighted mean of each input's window vectors. If the model
+    emits unit vectors, the pooled vectors are re-normalized to match.
     """
-    if request.model not in RERANK_MODELS:
+    window_vectors = np.asarray(window_vectors, dtype=np.float32)
+    weights = np.asarray([end - start for start, end in spans], dtype=np.float32)
+    weights = np.maximum(weights, 1.0)
+
+    pooled = np.zeros((num_inputs, window_vectors.shape[1]), dtype=np.float32)
+    np.add.at(pooled, owners, window_vectors * weights[:, None])
+    pooled /= np.bincount(owners, weights=weights, minlength=num_inputs)[:, None]
+
+    norms = np.linalg.norm(window_vectors, axis=1)
+    if np.allclose(norms, 1.0, atol=1e-3):
+        pooled = normalize(pooled)
+    return pooled
+
+
+def _coalesce(endpoint: str, request, compute, exclude=None):
+    """
+    Runs compute(request), or waits for an identical request already in flight
+    and returns its response.
+    """
+    key = request_key(endpoint, request, exclude)
+    while True:
+        try:
+            response, shared = inflight.do(key, lambda: compute(request))
+            break
+        except RequestCancelled as e:
+            if e.token is cancellation.current():
+                raise
+            # The request we waited on was cancelled by its own client; run ours.
+    if shared:
+        coalesced_requests.inc(endpoint=endpoint)
+    return response
+
+
+@contextmanager
+def _admitted(tokens: int, user: Optional[str]):
+    """
+    Holds `tokens` of the in-flight token budget for an inference stage.
+    Requests that cannot be admitted in time are rejected with 503.
+    """
+    try:
+        with admission.admit(tokens, user):
+            yield
+    except AdmissionTimeout as e:
         raise HTTPException(
-            status_code=400, detail=f"Model '{request.model}' not found for reranking."
+            status_code=503, detail=str(e), headers={"Retry-After": "1"}
+        )
+
+
+def _encode_deduplicated(model, texts: List[str], endpoint: str, lane: str):
+    """
+    Encodes each distinct text once and fans the vectors back out to every position.
+    """
+    unique_texts, inverse = deduplicate(texts)
+    if len(unique_texts) == len(texts):
+        return inference.encode(model, texts, lane)
+    deduplicated_inputs.inc(len(texts) - len(unique_texts), endpoint=endpoint)
+    return np.asarray(inference.encode(model, unique_texts, lane))[inverse]
+
+
+def _embedding_lane(request: EmbeddingRequest) -> str:
+    """
+    Queries are latency-sensitive, documents are bulk indexing. Without either
+    hint, a single input is treated as interactive.
+    """
+    if request.priority is not None:
+        return request.priority
+    if request.input_type == "query":
+        return INTERACTIVE
+    if request.input_type == "document":
+        return BULK
+    if isinstance(request.input, str) or len(request.input) == 1:
+        return INTERACTIVE
+    return BULK
+
+
+@app.post(
+    "/v1/embeddings",
+    response_model=Union[EmbeddingResponse, MultiModelEmbeddingResponse],
+    response_model_exclude_none=True,
+    dependencies=[Depends(bind_cancel_token)],
+)
+def create_embeddings(request: EmbeddingRequest, media_type: str = Depends(negotiate)):
+    """
+    Creates embeddings for the given input, following OpenAI's API format.
+    """
+    lane = _embedding_lane(request)
+    with track_latency("embeddings", lane):
+        # `user` and `priority` do not change the result, so they are left out
+        # of the coalescing key.
+        response = _coalesce(
+            "embeddings",
+            request,
+            partial(_create_embeddings, lane=lane),
+            exclude={"user", "priority"},
+        )
+        return render(response, media_type, exclude_none=True)
+
+
+def _embedding_model(model_name: str):
+    if model_name not in EMBEDDING_MODELS:
+        raise HTTPException(
+            status_code=400, detail=f"Model '{model_name}' not found for embeddings."
         )
 
     try:
-        model = get_model(request.model)
+        return get_model(model_name)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    # Prepare pairs for the cross-encoder
-    pairs = [[request.query, doc] for doc in request.documents]
 
-    # Calculate token usage
-    tokenizer = model.tokenizer
-    total_tokens = 0
+class _EmbeddingPlan(NamedTuple):
+    """
+    Model-ready texts of a request: truncated inputs, or token windows with
+    the input index (`owners`) and token span of each window.
+    """
 
-    # Batch processing for token counting to improve performance and manage memory
-    batch_size = 256
+    texts: List[str]
+    total_tokens: int
+    owners: Optional[np.ndarray] = None
+    spans: Optional[List[Tuple[int, int]]] = None
 
-    for i in range(0, len(pairs), batch_size):
-        batch_pairs = pairs[i : i + batch_size]
-        batch_queries = [p[0] for p in batch_pairs]
-        batch_docs = [p[1] for p in batch_pairs]
 
-        encodings = tokenizer(batch_queries, batch_docs, add_special_tokens=True)
+def _plan_embeddings(
+    request: EmbeddingRequest, model, inputs: List[str], prefix: str
+) -> _EmbeddingPlan:
+    if request.long_input_strategy == "truncate":
+        processed_inputs, total_tokens = _prepare_embedding_inputs(
+            model, inputs, prefix
+        )
+        return _EmbeddingPlan(processed_inputs, total_tokens)
 
-        for input_ids in encodings["input_ids"]:
-            total_tokens += len(input_ids)
+    # Chunked strategies: every window of every input goes through one encode call.
+    windows, owners, spans, total_tokens = _chunk_embedding_inputs(
+        model, inputs, prefix, request.chunk_overlap
+    )
+    return _EmbeddingPlan(windows, total_tokens, owners, spans)
 
-    usage = Usage(prompt_tokens=total_tokens, total_tokens=total_tokens)
 
-    # Get scores from the model
-    scores = model.predict(pairs)
+def _run_embeddings(
+    request: EmbeddingRequest,
+    model_name: str,
+    model,
+    plan: _EmbeddingPlan,
+    num_inputs: int,
+    lane: str,
+) -> EmbeddingResponse:
+    usage = Usage(prompt_tokens=plan.total_tokens, total_tokens=plan.total_tokens)
+
+    # No inputs means no windows to pool: answer like the truncate strategy
+    if plan.owners is None or not plan.texts:
+        # Get embeddings (repeated strings are encoded once)
+        with _admitted(plan.total_tokens, request.user):
+            vectors = _encode_deduplicated(model, plan.texts, "embeddings", lane)
+
+        # Create response data
+        response_data = [
+            EmbeddingData(embedding=vector.tolist(), index=i)
+            for i, vector in enumerate(vectors)
+        ]
+
+        response = EmbeddingResponse(data=response_data, model=model_name, usage=usage)
+        response._vectors = vectors
+        return response
+
+    with _admitted(plan.total_tokens, request.user):
+        window_vectors = np.asarray(
+            _encode_deduplicated(model, plan.texts, "embeddings", lane),
+            dtype=np.float32,
+        )
+    pooled = _pool_windows(window_vectors, plan.owners, plan.spans, num_inputs)
+
+    chunks = [[] for _ in range(num_inputs)]
+    if request.long_input_strategy == "chunk_all":
+        for vector, owner, (start, end) in zip(window_vectors, plan.owners, plan.spans):
+            chunks[owner].append(
+                EmbeddingChunk(embedding=vector.tolist(), start=start, end=end)
+            )
 
+    response_data = [
+        EmbeddingData(embedding=vector.tolist(), index=i, chunks=chunks[i] or None)
+        for i, vector in enumerate(pooled)
+    ]
+
+    response = EmbeddingResponse(data=response_data, model=model_name, usage=usage)
+    response._vectors = pooled
+    return response
+
+
+def _create_embeddings(request: EmbeddingRequest, lane: str):
+    model_names = request.model if isinstance(request.model, list) else [request.model]
+    models = [_embedding_model(name) for name in model_names]
+    inputs = request.input if isinstance(request.input, list) else [request.input]
+
+    # Models with the same tokenizer, prefix and sequence limit see identical
+    # model-ready texts, so tokenization and truncation run once per group.
+    plans, shared = [], {}
+    for name, model in zip(model_names, models):
+        # Optimization: Determine prefix once per request
+        prefix = _resolve_prefix(
+            name,
+            request.input_type,
+            request.apply_ruri_prefix,
+            isinstance(request.input, str),
+        )
+        key = (
+            tokenizer_fingerprint(model.tokenizer),
+            prefix,
+            getattr(model, "max_seq_length", 8192),
+        )
+        if key not in shared:
+            shared[key] = _plan_embeddings(request, model, inputs, prefix)
+        plans.append(shared[key])
+
+    if not isinstance(request.model, list):
+        return _run_embeddings(
+            request, request.model, models[0], plans[0], len(inputs), lane
+        )
+
+    # One encode per model, run concurrently on the inference pool.
+    responses = inference.run_concurrently(
+        [
+            partial(_run_embeddings, request, name, model, plan, len(inputs), lane)
+            for name, model, plan in zip(model_names, models, plans)
+        ]
+    )
+    total_tokens = sum(response.usage.total_tokens for response in responses)
+    return MultiModelEmbeddingResponse(
+        data=responses,
+        model=model_names,
+        usage=Usage(prompt_tokens=total_tokens, total_tokens=total_tokens),
+    )
+
+
+def _encode_base64(array: np.ndarray, dtype) -> str:
+    # Little-endian, row-major, so clients can np.frombuffer(...).reshape(shape).
+    return base64.b64encode(
+        np.ascontiguousarray(array, dtype=np.dtype(dtype).newbyteorder("<"))
+    ).decode("ascii")
+
+
+@app.post(
+    "/v1/similarity",
+    response_model=SimilarityResponse,
+    response_model_exclude_none=True,
+    dependencies=[Depends(bind_cancel_token)],
+)
+def create_similarity(request: SimilarityRequest):
+    """
+    Pairwise cosine similarity of `input` against `targets` (or itself),
+    embedded in one batched pass and scored with one normalized matmul.
+    """
+    lane = request.priority or (
+        INTERACTIVE
+        if len(request.input) + len(request.targets or []) <= SCHEDULER_SUB_BATCH_SIZE
+        else BULK
+    )
+    with track_latency("similarity", lane):
+        return _coalesce(
+            "similarity",
+            request,
+            partial(_create_similarity, lane=lane),
+            exclude={"user", "priority"},
+        )
+
+
+def _create_similarity(request: SimilarityRequest, lane: str):
+    model = _embedding_model(request.model)
+
+    prefix = _resolve_prefix(request.model, request.input_type, False, False)
+    texts = request.input + (request.targets or [])
+    processed_inputs, total_tokens = _prepare_embedding_inputs(model, texts, prefix)
+
+    # One encode call for both lists; repeated strings are encoded once.
+    with _admitted(total_tokens, request.user):
+        vectors = normalize(
+            _encode_deduplicated(model, processed_inputs, "similarity", lane)
+        )
+    left = vectors[: len(request.input)]
+    right = vectors[len(request.input) :] if request.targets else left
+    scores = left @ right.T
+
+    indices = None
+    if request.top_k is not None:
+        k = request.top_k
+        if request.exclude_self and not request.targets:
+            np.fill_diagonal(scores, -np.inf)
+            k = min(k, scores.shape[1] - 1)
+        scores, indices = top_k_rows(scores, k)
+
+    if request.encoding_format == "base64":
+        scores_out = _encode_base64(scores, np.float32)
+        indices_out = None if indices is None else _encode_base64(indices, np.int32)
+    else:
+        scores_out = scores.tolist()
+        indices_out = None if indices is None else indices.tolist()
+
+    return SimilarityResponse(
+        model=request.model,
+        shape=list(scores.shape),
+        scores=scores_out,
+        indices=indices_out,
+        usage=Usage(prompt_tokens=total_tokens, total_tokens=total_tokens),
+    )
+
+
+def _embed_for_clustering(
+    model, options: ClusterOptions, texts: List[str], lane: str
+) -> Tuple[np.ndarray, int]:
+    prefix = _resolve_prefix(options.model, options.input_type, False, False)
+    processed_inputs, total_tokens = _prepare_embedding_inputs(model, texts, prefix)
+    with _admitted(total_tokens, options.user):
+        vectors = normalize(
+            _encode_deduplicated(model, processed_inputs, "cluster", lane)
+        )
+    return vectors, total_tokens
+
+
+def _cluster_response(
+    options: ClusterOptions, vectors: np.ndarray, total_tokens: int
+) -> ClusterResponse:
+    if options.method == "agglomerative" and len(vectors) > CLUSTER_AGGLOMERATIVE_MAX_N:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Agglomerative clustering supports at most "
+            f"{CLUSTER_AGGLOMERATIVE_MAX_N} inputs; use method 'kmeans'.",
+        )
+    labels, centroids, method = cluster(
+        vectors,
+        options.n_clusters,
+        options.method,
+        CLUSTER_AGGLOMERATIVE_MAX_N,
+        seed=options.seed,
+    )
+    return ClusterResponse(
+        model=options.model,
+        method=method,
+        labels=labels.tolist(),
+        sizes=np.bincount(labels).tolist(),
+        centroids=centroids.tolist() if options.return_centroids else None,
+        usage=Usage(prompt_tokens=total_tokens, total_tokens=total_tokens),
+    )
+
+
+@app.post(
+    "/v1/cluster",
+    response_model=ClusterResponse,
+    response_model_exclude_none=True,
+    dependencies=[Depends(bind_cancel_token)],
+)
+def create_cluster(request: ClusterRequest):
+    """
+    Embeds the inputs (with the `トピック: ` prefix for Ruri-v3) and clusters them.
+    """
+    lane = request.priority or BULK
+    with track_latency("cluster", lane):
+        return _coalesce(
+            "cluster",
+            request,
+            partial(_create_cluster, lane=lane),
+            exclude={"user", "priority"},
+        )
+
+
+def _create_cluster(request: ClusterRequest, lane: str):
+    model = _embedding_model(request.model)
+    vectors, total_tokens = _embed_for_clustering(model, request, request.input, lane)
+    return _cluster_response(request, vectors, total_tokens)
+
+
+# A line holds one JSON string; allow for escapes and multi-byte characters.
+_MAX_STREAM_LINE_BYTES = 12 * MAX_INPUT_LENGTH + 1024
+
+
+async def _ndjson_lines(request: Request) -> AsyncIterator[bytes]:
+    """
+    Yields the non-empty lines of a streamed body without buffering it whole.
+    """
+    pending = b""
+    async for chunk in request.stream():
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        if len(pending) > _MAX_STREAM_LINE_BYTES:
+            raise HTTPException(status_code=413, detail="Input line too long.")
+        for line in lines:
+            if line.strip():
+                yield line
+    if pending.strip():
+        yield pending
+
+
+def _parse_stream_item(line: bytes, number: int) -> str:
+    try:
+        item = json.loads(line)
+    except ValueError:
+        item = None
+    if isinstance(item, dict):
+        item = item.get("input")
+    if not isinstance(item, str):
+        raise HTTPException(
+            status_code=422,
+            detail=f"Line {number}: expected a JSON string or an object with an 'input' string.",
+        )
+    if len(item) > MAX_INPUT_LENGTH:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Line {number}: input longer than {MAX_INPUT_LENGTH} characters.",
+        )
+    return item
+
+
+@app.post(
+    "/v1/cluster/stream",
+    response_model=ClusterResponse,
+    response_model_exclude_none=True,
+    dependencies=[Depends(bind_cancel_token)],
+)
+async def create_cluster_stream(
+    request: Request, options: Annotated[ClusterOptions, Query()]
+):
+    """
+    Clusters an NDJSON upload of up to CLUSTER_MAX_INPUTS texts (one JSON string
+    or {"input": ...} object per line); options are query parameters.
+    Inputs are embedded MAX_INPUT_ITEMS at a time while the body is read and
+    only their float16 vectors are kept, so memory stays bounded.
+    """
+    lane = options.priority or BULK
+    with track_latency("cluster", lane):
+        model = await run_in_threadpool(_embedding_model, options.model)
+        buffer = VectorBuffer(CLUSTER_MAX_INPUTS)
+        total_tokens = 0
+
+        def embed(texts: List[str]) -> int:
+            vectors, tokens = _embed_for_clustering(model, options, texts, lane)
+            buffer.append(vectors)
+            return tokens
+
+        pending, count = [], 0
+        async for line in _ndjson_lines(request):
+            count += 1
+            if count > CLUSTER_MAX_INPUTS:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"At most {CLUSTER_MAX_INPUTS} inputs can be clustered.",
+                )
+            pending.append(_parse_stream_item(line, count))
+            if len(pending) == MAX_INPUT_ITEMS:
+                total_tokens += await run_in_threadpool(embed, pending)
+                pending = []
+        if pending:
+            total_tokens += await run_in_threadpool(embed, pending)
+        if not count:
+            raise HTTPException(status_code=422, detail="No inputs to cluster.")
+
+        return await run_in_threadpool(
+            _cluster_response, options, buffer.vectors, total_tokens
+        )
+
+
+def _count_pair_tokens(tokenizer, query: str, documents: List[str]) -> int:
+    """
+    Counts the tokens of every (query, document) pair as the cross-encoder sees them.
+    """
+    # Pairs are tokenized in batches through the token cache
+    return sum(len(ids) for ids in tokenize_pairs(tokenizer, query, documents))
+
+
+def _rank_results(
+    scores,
+    documents: List[str],
+    top_n: Optional[int],
+    return_documents: Optional[bool],
+    doc_ids: Optional[List[int]] = None,
+) -> List[RerankData]:
+    """
+    Sorts scored documents (best first) and keeps the top_n.
+    `doc_ids` maps positions in `documents` to the indices reported to the client.
+    """
     # Combine documents with their scores
     results = []
     for i, score in enumerate(scores):
-        result_item = {"document": i, "score": float(score)}
-        if request.return_documents:
-            result_item["text"] = request.documents[i]
+        result_item = {
+            "document": doc_ids[i] if doc_ids is not None else i,
+            "score": float(score),
+        }
+        if return_documents:
+            result_item["text"] = documents[i]
         results.append(result_item)
 
     # Sort results by score in descending order
     # Optimization: Use heapq.nlargest for top_n which is O(N log k) instead of O(N log N)
-    if request.top_n is not None:
+    if top_n is not None:
         # Use (score, -index) tuple key to ensure stability (deterministic tie-breaking)
         # matching Python's stable sort behavior where earlier indices come first for same score.
         sorted_results = heapq.nlargest(
-            request.top_n, results, key=lambda x: (x["score"], -x["document"])
+            top_n, results, key=lambda x: (x["score"], -x["document"])
         )
     else:
         sorted_results = sorted(results, key=lambda x: x["score"], reverse=True)
 
     # Format for response schema
-    response_data = [RerankData(**result) for result in sorted_results]
+    return [RerankData(**result) for result in sorted_results]
+
+
+def _resolve_cascade(request: RerankRequest) -> Optional[Tuple[str, int]]:
+    """
+    Merges the request's cascade settings over the reranker's models.yml options.
+    Returns (embedding model, top_m), or None when the cascade is off.
+    """
+    options = dict(MODEL_OPTIONS.get(request.model, {}).get("cascade") or {})
+    if request.cascade is not None:
+        if not request.cascade.enabled:
+            return None
+        options.update(
+            request.cascade.model_dump(exclude_none=True, exclude={"enabled"})
+        )
+    elif not options:
+        return None
+
+    embedding_model = options.get("embedding_model") or (
+        EMBEDDING_MODELS[0] if EMBEDDING_MODELS else None
+    )
+    if embedding_model not in EMBEDDING_MODELS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Model '{embedding_model}' not found for embeddings.",
+        )
+    return embedding_model, int(options.get("top_m", RERANK_CASCADE_TOP_M))
+
+
+def _embed_documents_cached(
+    model_name: str,
+    model,
+    documents: List[str],
+    prefix: str,
+    lane: str,
+    user: Optional[str] = None,
+) -> Tuple[np.ndarray, int]:
+    """
+    Embeds documents, reusing vectors from the embedding cache where possible.
+    Returns the (len(documents), dim) matrix and the tokens spent on misses.
+    """
+    keys = [(model_name, prefix, text_key(doc)) for doc in documents]
+    vectors = [embedding_cache.get(key) for key in keys]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+
+    total_tokens = 0
+    if missing:
+        processed_inputs, total_tokens = _prepare_embedding_inputs(
+            model, [documents[i] for i in missing], prefix
+        )
+        with _admitted(total_tokens, user):
+            encoded = np.asarray(
+                inference.encode(model, processed_inputs, lane), dtype=np.float32
+            )
+        for i, vector in zip(missing, encoded):
+            vectors[i] = vector
+            embedding_cache.put(keys[i], vector)
+
+    return np.stack(vectors), total_tokens
+
+
+def _calibrated_fallback(
+    kept_similarities: np.ndarray,
+    kept_scores: np.ndarray,
+    skipped_similarities: np.ndarray,
+) -> np.ndarray:
+    """
+    Scores documents the cascade skipped on the cross-encoder's scale.
+    A least-squares line maps cosine to cross-encoder score on the scored
+    candidates; results are capped just below the lowest scored candidate so a
+    skipped document never outranks one that was actually reranked.
+    """
+    floor = float(np.min(kept_scores))
+    slope, intercept = 0.0, floor
+    if len(kept_scores) >= 2 and np.ptp(kept_similarities) > 0:
+        slope, intercept = np.polyfit(kept_similarities, kept_scores, 1)
+        # A negative fit would invert the prefilter's own ranking.
+        slope = max(float(slope), 0.0)
+        if slope == 0.0:
+            intercept = floor
+    cap = np.nextafter(floor, -np.inf)
+    return np.minimum(slope * skipped_similarities + intercept, cap)
+
+
+def _chunk_documents(
+    model, query: str, documents: List[str], chunking: RerankChunking
+) -> Tuple[List[str], np.ndarray]:
+    """
+    Splits documents into overlapping token windows for the cross-encoder.
+    Returns the window texts and, for each window, the index of its document.
+    Documents that fit in one window are passed through untouched. Raises a
+    422 if there would be more than MAX_CHUNK_WINDOWS windows.
+    """
+    tokenizer = model.tokenizer
+    window_size = chunking.window_size
+    overlap = chunking.overlap
+
+    # Keep every (query, window) pair within the cross-encoder's max length.
+    max_length = getattr(model, "max_length", None)
+    if isinstance(max_length, int):
+        query_tokens = len(tokenize(tokenizer, [query])[0])
+        room = max_length - query_tokens - tokenizer.num_special_tokens_to_add(True)
+        if room < MIN_WINDOW_SIZE:
+            raise HTTPException(
+                status_code=400,
+                detail=(
+                    f"Query is too long for chunked reranking: it leaves {max(room, 0)} "
+                    f"of the model's {max_length} tokens for each document window "
+                    f"(minimum {MIN_WINDOW_SIZE})."
+                ),
+            )
+        if room < window_size:
+            # Shrink the overlap with the window, keeping the stride's share
+            overlap = overlap * room // window_size
+            window_size = room
+
+    document_ids = tokenize(tokenizer, documents)
+    document_spans = [
+        window_spans(len(ids), window_size, overlap) for ids in document_ids
+    ]
+    _check_chunk_windows(sum(len(spans) for spans in document_spans))
+
+    windows, owners = [], []
+    for i, ids in enumerate(document_ids):
+        if len(ids) <= window_size:
+            windows.append(documents[i])
+            owners.append(i)
+            continue
+        for start, end in document_spans[i]:
+            windows.append(tokenizer.decode(ids[start:end].tolist()))
+            owners.append(i)
+
+    return windows, np.asarray(owners, dtype=np.int64)
+
+
+@app.post(
+    "/v1/rerank",
+    response_model=RerankResponse,
+    dependencies=[Depends(bind_cancel_token)],
+)
+def create_rerank(request: RerankRequest, media_type: str = Depends(negotiate)):
+    """
+    Reranks a list of documents for a given query.
+    """
+    lane = request.priority or INTERACTIVE
+    with track_latency("rerank", lane):
+        response = _coalesce(
+            "rerank",
+            request,
+            partial(_create_rerank, lane=lane),
+            exclude={"user", "priority"},
+        )
+        return render(response, media_type)
+
+
+def _rerank_model(model_name: str):
+    if model_name not in RERANK_MODELS:
+        raise HTTPException(
+            status_code=400, detail=f"Model '{model_name}' not found for reranking."
+        )
+
+    try:
+        return get_model(model_name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _create_rerank(request: RerankRequest, lane: str):
+    model = _rerank_model(request.model)
+
+    documents = request.documents
+    cascade = _resolve_cascade(request)
+    cascade_info = None
+    total_tokens = 0
+
+    if cascade is not None and len(documents) > cascade[1]:
+        # Cascade: keep only the top_m documents by bi-encoder cosine.
+        embedding_model_name, top_m = cascade
+        try:
+            embedding_model = get_model(embedding_model_name)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        query_prefix = _resolve_prefix(embedding_model_name, "query", False, True)
+        doc_prefix = _resolve_prefix(embedding_model_name, "document", False, False)
+        query_inputs, query_tokens = _prepare_embedding_inputs(
+            embedding_model, [request.query], query_prefix
+        )
+        with _admitted(query_tokens, request.user):
+            query_vector = normalize(
+                inference.encode(embedding_model, query_inputs, lane)
+            )[0]
+        doc_vectors, doc_tokens = _embed_documents_cached(
+            embedding_model_name,
+            embedding_model,
+            documents,
+            doc_prefix,
+            lane,
+            request.user,
+        )
+        similarities = normalize(doc_vectors) @ query_vector
+        total_tokens += query_tokens + doc_tokens
+
+        kept_mask = np.zeros(len(documents), dtype=bool)
+        kept_mask[np.argpartition(-similarities, top_m - 1)[:top_m]] = True
+        kept_ids = np.flatnonzero(kept_mask)
+        skipped_ids = np.flatnonzero(~kept_mask)
+        scored_documents = [documents[i] for i in kept_ids]
+
+        cascade_info = CascadeInfo(
+            embedding_model=embedding_model_name,
+            scored=len(kept_ids),
+            skipped=len(skipped_ids),
+        )
+        rerank_cascade_pairs.inc(len(kept_ids), model=request.model, outcome="scored")
+        rerank_cascade_pairs.inc(
+            len(skipped_ids), model=request.model, outcome="skipped"
+        )
+    else:
+        scored_documents = documents
+
+    if request.chunking is not None:
+        # All windows of all documents are scored in one predict call.
+        pair_documents, owners = _chunk_documents(
+            model, request.query, scored_documents, request.chunking
+        )
+    else:
+        pair_documents = scored_documents
+
+    # Calculate token usage
+    pair_tokens = _count_pair_tokens(model.tokenizer, request.query, pair_documents)
+    total_tokens += pair_tokens
+    usage = Usage(prompt_tokens=total_tokens, total_tokens=total_tokens)
+
+    # Prepare pairs for the cross-encoder; repeated documents are scored once.
+    unique_documents, inverse = deduplicate(pair_documents)
+    pairs = [[request.query, doc] for doc in unique_documents]
+
+    # Get scores from the model
+    with _admitted(pair_tokens, request.user):
+        scores = inference.predict(model, pairs, lane)
+    if len(unique_documents) < len(pair_documents):
+        deduplicated_inputs.inc(
+            len(pair_documents) - len(unique_documents), endpoint="rerank"
+        )
+        scores = np.asarray(scores)[inverse]
+
+    if request.chunking is not None:
+        scores = aggregate_scores(
+            scores, owners, len(scored_documents), request.chunking.aggregation
+        )
+
+    if cascade_info is not None:
+        kept_scores = np.asarray(scores, dtype=np.float64)
+        scores = np.empty(len(documents), dtype=np.float64)
+        scores[kept_ids] = kept_scores
+        scores[skipped_ids] = _calibrated_fallback(
+            similarities[kept_ids], kept_scores, similarities[skipped_ids]
+        )
+
+    response_data = _rank_results(
+        scores, documents, request.top_n, request.return_documents
+    )
 
     return RerankResponse(
-        query=request.query, data=response_data, model=request.model, usage=usage
+        query=request.query,
+        data=response_data,
+        model=request.model,
+        usage=usage,
+        cascade=cascade_info,
+    )
+
+
+@app.post(
+    "/v1/rerank/batch",
+    response_model=BatchRerankResponse,
+    dependencies=[Depends(bind_cancel_token)],
+)
+def create_rerank_batch(request: BatchRerankRequest):
+    """
+    Reranks several (query, documents) groups with one model in one request.
+    """
+    lane = request.priority or BULK
+    with track_latency("rerank_batch", lane):
+        return _coalesce(
+            "rerank_batch",
+            request,
+            partial(_create_rerank_batch, lane=lane),
+            exclude={"user", "priority"},
+        )
+
+
+def _top_indices(scores: np.ndarray, top_n: Optional[int]) -> np.ndarray:
+    """
+    Indices of the top_n highest scores (all if None), best first. Equal
+    scores keep the earlier index first, as in _rank_results.
+    """
+    n = len(scores)
+    if top_n is not None and top_n < n:
+        if top_n == 0:
+            return np.empty(0, dtype=np.int64)
+        # The top_n-th highest score; ties at it are taken in index order.
+        kth = scores[np.argpartition(scores, n - top_n)[n - top_n]]
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)[: top_n - len(above)]
+        candidates = np.concatenate([above, ties])
+    else:
+        candidates = np.arange(n)
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+
+def _create_rerank_batch(request: BatchRerankRequest, lane: str):
+    model = _rerank_model(request.model)
+    tokenizer = model.tokenizer
+    groups = request.groups
+    sizes = [len(group.documents) for group in groups]
+
+    # Each distinct query and document is tokenized once; a pair's length is
+    # the sum of both plus the pair's special tokens.
+    queries, query_of = deduplicate([group.query for group in groups])
+    documents, document_of = deduplicate(
+        [doc for group in groups for doc in group.documents]
+    )
+    query_lengths = np.asarray(
+        [len(ids) for ids in tokenize(tokenizer, queries)], dtype=np.int64
+    )
+    document_lengths = np.asarray(
+        [len(ids) for ids in tokenize(tokenizer, documents)], dtype=np.int64
+    )
+    pair_query = np.repeat(query_of, sizes)
+    pair_lengths = (
+        query_lengths[pair_query]
+        + document_lengths[document_of]
+        + tokenizer.num_special_tokens_to_add(True)
+    )
+    total_tokens = int(pair_lengths.sum())
+
+    # Repeated (query, document) pairs are scored once.
+    pair_keys = pair_query * max(1, len(documents)) + document_of
+    unique_keys, first, inverse = np.unique(
+        pair_keys, return_index=True, return_inverse=True
+    )
+    if len(unique_keys) < len(pair_keys):
+        deduplicated_inputs.inc(
+            len(pair_keys) - len(unique_keys), endpoint="rerank_batch"
+        )
+
+    # Pairs are sorted by length and scored in one predict call per length
+    # bucket, so batches pad little and each bucket gets its own tuned batch size.
+    full_lengths = pair_lengths[first]
+    lengths = full_lengths
+    max_length = getattr(model, "max_length", None)
+    if isinstance(max_length, int):
+        lengths = np.minimum(lengths, max_length)
+    order = np.argsort(lengths, kind="stable")
+    buckets = np.searchsorted(sorted(AUTOTUNE_SEQ_BUCKETS), lengths[order])
+    scores = np.empty(len(unique_keys), dtype=np.float64)
+    with _admitted(total_tokens, request.user):
+        for bucket in np.split(order, np.flatnonzero(np.diff(buckets)) + 1):
+            if not len(bucket):
+                continue
+            query_ids, document_ids = np.divmod(
+                unique_keys[bucket], max(1, len(documents))
+            )
+            pairs = [
+                [queries[q], documents[d]] for q, d in zip(query_ids, document_ids)
+            ]
+            # The bucket's pair lengths are known, so the batch size lookups
+            # need not tokenize the pairs again (nor give up on mixed queries).
+            input_len = int(full_lengths[bucket].max())
+            scores[bucket] = np.asarray(
+                inference.predict(model, pairs, lane, input_len), dtype=np.float64
+            ).reshape(-1)
+    pair_scores = scores[inverse]
+
+    results = []
+    starts = np.cumsum([0] + sizes)
+    for i, group in enumerate(groups):
+        group_scores = pair_scores[starts[i] : starts[i + 1]]
+        results.append(
+            BatchRerankResult(
+                index=i,
+                query=group.query,
+                data=[
+                    RerankData(
+                        document=int(j),
+                        score=float(group_scores[j]),
+                        text=group.documents[j] if request.return_documents else None,
+                    )
+                    for j in _top_indices(group_scores, group.top_n)
+                ],
+            )
+        )
+
+    return BatchRerankResponse(
+        data=results,
+        model=request.model,
+        usage=Usage(prompt_tokens=total_tokens, total_tokens=total_tokens),
+    )
+
+
+@app.post(
+    "/v1/tokenize",
+    response_model=TokenizeResponse,
+    response_model_exclude_none=True,
+)
+def create_tokenize(request: TokenizeRequest):
+    """
+    Counts and truncates inputs as /v1/embeddings would (or, with a query,
+    /v1/rerank). Only the model's tokenizer is loaded, and nothing is encoded.
+    """
+    with track_latency("tokenize", INTERACTIVE):
+        try:
+            tokenizer, max_length = get_tokenizer(request.model)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        inputs = request.input if isinstance(request.input, list) else [request.input]
+
+        if request.model in RERANK_MODELS:
+            if request.query is None:
+                raise HTTPException(
+                    status_code=400, detail="'query' is required for rerank models."
+                )
+            data = _preview_pairs(
+                tokenizer, max_length, request.query, inputs, request.return_offsets
+            )
+        else:
+            if request.query is not None:
+                raise HTTPException(
+                    status_code=400, detail="'query' is only valid for rerank models."
+                )
+            prefix = _resolve_prefix(
+                request.model,
+                request.input_type,
+                request.apply_ruri_prefix,
+                isinstance(request.input, str),
+            )
+            data = _preview_embedding_inputs(
+                tokenizer, max_length, inputs, prefix, request.return_offsets
+            )
+
+        total_tokens = sum(item.tokens for item in data)
+        return TokenizeResponse(
+            data=data,
+            model=request.model,
+            max_tokens=max_length,
+            usage=Usage(prompt_tokens=total_tokens, total_tokens=total_tokens),
+        )
+
+
+def _preview_embedding_inputs(
+    tokenizer, max_seq_length: int, inputs: List[str], prefix: str, offsets: bool
+) -> List[TokenizeData]:
+    """
+    Token counts and truncation of _prepare_embedding_inputs, without decoding
+    the truncated texts. Offsets are relative to the inputs, prefix excluded.
+    """
+    processed_inputs = _apply_prefix(inputs, prefix)
+    special_tokens_count = tokenizer.num_special_tokens_to_add(False)
+    limit = max_seq_length - special_tokens_count
+
+    data = [
+        TokenizeData(
+            index=i,
+            tokens=min(len(ids), limit) + special_tokens_count,
+            truncated=len(ids) > limit,
+        )
+        for i, ids in enumerate(tokenize(tokenizer, processed_inputs))
+    ]
+    if offsets:
+        cut = [item.index for item in data if item.truncated]
+        for i, offset in zip(
+            cut,
+            truncation_offsets(tokenizer, [processed_inputs[i] for i in cut], limit),
+        ):
+            if offset is not None:
+                added = len(processed_inputs[i]) - len(inputs[i])
+                data[i].truncation_offset = max(0, offset - added)
+    return data
+
+
+def _preview_pairs(
+    tokenizer, max_length: int, query: str, documents: List[str], offsets: bool
+) -> List[TokenizeData]:
+    """
+    Token counts of (query, document) pairs as _count_pair_tokens counts them,
+    and whether the cross-encoder truncates each pair.
+    """
+    data = [
+        TokenizeData(index=i, tokens=len(ids), truncated=len(ids) > max_length)
+        for i, ids in enumerate(tokenize_pairs(tokenizer, query, documents))
+    ]
+    if offsets:
+        cut = [item.index for item in data if item.truncated]
+        for i, offset in zip(
+            cut,
+            pair_truncation_offsets(
+                tokenizer, query, [documents[i] for i in cut], max_length
+            ),
+        ):
+            data[i].truncation_offset = offset
+    return data
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Exposes in-process metrics in the Prometheus text format.
+    """
+    return REGISTRY.render()
+
+
+@app.get("/ready")
+def ready():
+    """
+    Readiness and load of this replica, polled by the router (app/router.py):
+    models already loaded, and model calls waiting for or holding an
+    inference slot or the admission token budget.
+    """
+    return {
+        "status": "ready",
+        "models": loaded_models(),
+        "queue_depth": sum(scheduler.waiting(lane) for lane in LANES)
+        + admission.waiting(),
+        "running": scheduler.running,
+        "inflight_tokens": admission.in_flight,
+    }
+
+
+def require_admin(request: Request):
+    """
+    Checks the X-Admin-Token header. The /admin endpoints are disabled (403)
+    unless ADMIN_TOKEN is configured.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=403, detail="Admin endpoints are disabled: set ADMIN_TOKEN."
+        )
+    token = request.headers.get("x-admin-token", "")
+    if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token.")
+
+
+@app.post("/admin/reload", dependencies=[Depends(require_admin)])
+def reload_models_config():
+    """
+    Re-applies config/models.yml: added models are loaded and warmed, then
+    swapped in; removed models are unloaded.
+    """
+    try:
+        result = reload("admin")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        logging.exception("Models config reload failed")
+        raise HTTPException(
+            status_code=500, detail="Reload failed; see the server log."
+        )
+    return {
+        **result,
+        "embedding_models": list(EMBEDDING_MODELS),
+        "rerank_models": list(RERANK_MODELS),
+    }
+
+
+@app.get("/v1/autotune")
+def get_autotune(model: Optional[str] = None):
+    """
+    Shows the tuned batch size per sequence length bucket of each loaded model.
+    """
+    tables = autotune.tables()
+    if model is not None:
+        if model not in tables:
+            raise HTTPException(
+                status_code=404, detail=f"Model '{model}' has no autotune table."
+            )
+        tables = {model: tables[model]}
+    return {"object": "list", "data": [table.to_dict() for table in tables.values()]}
+
+
+# --- Collections (in-process vector search) ---
+
+
+def _get_collection(name: str):
+    collection = collection_store.get(name)
+    if collection is None:
+        raise HTTPException(status_code=404, detail=f"Collection '{name}' not found.")
+    return collection
+
+
+@app.post("/v1/collections", response_model=CollectionInfo)
+def create_collection(request: CollectionCreateRequest):
+    """
+    Creates an empty collection bound to one of the configured embedding models.
+    """
+    if request.model not in EMBEDDING_MODELS:
+        raise HTTPException(
+            status_code=400, detail=f"Model '{request.model}' not found for embeddings."
+        )
+
+    try:
+        collection = collection_store.create(
+            request.name,
+            request.model,
+            index_type=request.index_type,
+            nlist=request.nlist,
+            nprobe=request.nprobe,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return CollectionInfo(**collection.info())
+
+
+@app.get("/v1/collections/{name}", response_model=CollectionInfo)
+def get_collection(name: str):
+    return CollectionInfo(**_get_collection(name).info())
+
+
+@app.delete("/v1/collections/{name}")
+def delete_collection(name: str):
+    if not collection_store.delete(name):
+        raise HTTPException(status_code=404, detail=f"Collection '{name}' not found.")
+    return {"object": "collection.deleted", "name": name, "deleted": True}
+
+
+@app.post(
+    "/v1/collections/{name}/documents",
+    response_model=CollectionAddResponse,
+    dependencies=[Depends(bind_cancel_token)],
+)
+def add_collection_documents(name: str, request: CollectionAddRequest):
+    """
+    Embeds documents with the collection's model and inserts them into its index.
+    """
+    collection = _get_collection(name)
+
+    try:
+        model = get_model(collection.model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    prefix = _resolve_prefix(collection.model, request.input_type, False, False)
+    processed_inputs, total_tokens = _prepare_embedding_inputs(
+        model, request.documents, prefix
+    )
+    # Ingestion is bulk work and yields to interactive queries between sub-batches.
+    with _admitted(total_tokens, None):
+        vectors = inference.encode(model, processed_inputs, BULK)
+
+    try:
+        ids = collection.add(vectors, request.documents)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return CollectionAddResponse(
+        ids=ids,
+        count=len(collection),
+        usage=Usage(prompt_tokens=total_tokens, total_tokens=total_tokens),
+    )
+
+
+@app.post(
+    "/v1/collections/{name}/search",
+    response_model=CollectionSearchResponse,
+    dependencies=[Depends(bind_cancel_token)],
+)
+def search_collection(name: str, request: CollectionSearchRequest):
+    """
+    Embeds the query and returns the nearest documents of the collection.
+    """
+    collection = _get_collection(name)
+
+    try:
+        model = get_model(collection.model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    prefix = _resolve_prefix(collection.model, request.input_type, False, True)
+    processed_inputs, total_tokens = _prepare_embedding_inputs(
+        model, [request.query], prefix
+    )
+    with _admitted(total_tokens, None):
+        query_vector = inference.encode(model, processed_inputs, INTERACTIVE)
+
+    hits = collection.search(query_vector, request.top_k, nprobe=request.nprobe)
+    response_data = [
+        CollectionSearchData(
+            document=doc_id,
+            score=score,
+            text=collection.documents[doc_id] if request.return_documents else None,
+        )
+        for doc_id, score in hits
+    ]
+
+    return CollectionSearchResponse(
+        query=request.query,
+        data=response_data,
+        model=collection.model,
+        usage=Usage(prompt_tokens=total_tokens, total_tokens=total_tokens),
+    )
+
+
+# --- Retrieve-then-rerank pipeline ---
+
+
+@app.post(
+    "/v1/retrieve_rerank",
+    response_model=RetrieveRerankResponse,
+    dependencies=[Depends(bind_cancel_token)],
+)
+def retrieve_rerank(request: RetrieveRerankRequest):
+    """
+    Two-stage retrieval in one call: embedding recall of the top_m candidates,
+    then cross-encoder scoring of those candidates. Documents stay in process
+    between the stages.
+    """
+    if request.model not in RERANK_MODELS:
+        raise HTTPException(
+            status_code=400, detail=f"Model '{request.model}' not found for reranking."
+        )
+
+    collection = _get_collection(request.collection) if request.collection else None
+    if collection is not None:
+        embedding_model_name = collection.model
+        if request.embedding_model not in (None, collection.model):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Collection '{collection.name}' is indexed with '{collection.model}'.",
+            )
+    else:
+        embedding_model_name = request.embedding_model or (
+            EMBEDDING_MODELS[0] if EMBEDDING_MODELS else None
+        )
+        if embedding_model_name is None:
+            raise HTTPException(
+                status_code=400,
+                detail="An embedding_model must be given: no embedding models are configured.",
+            )
+    if embedding_model_name not in EMBEDDING_MODELS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Model '{embedding_model_name}' not found for embeddings.",
+        )
+
+    try:
+        embedding_model = get_model(embedding_model_name)
+        rerank_model = get_model(request.model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Stage 1: embedding recall
+    query_prefix = _resolve_prefix(embedding_model_name, "query", False, True)
+    if collection is not None:
+        processed_inputs, embed_tokens = _prepare_embedding_inputs(
+            embedding_model, [request.query], query_prefix
+        )
+        with _admitted(embed_tokens, request.user):
+            query_vector = inference.encode(
+                embedding_model, processed_inputs, INTERACTIVE
+            )
+        hits = collection.search(query_vector, request.top_m, nprobe=request.nprobe)
+        candidate_ids = [doc_id for doc_id, _ in hits]
+        candidates = [collection.documents[doc_id] for doc_id in candidate_ids]
+    else:
+        # The query and the documents share one tokenizer pass and one encode call.
+        doc_prefix = _resolve_prefix(embedding_model_name, "document", False, False)
+        texts = [request.query] + [
+            doc if doc.startswith(doc_prefix) else f"{doc_prefix}{doc}"
+            for doc in request.documents
+        ]
+        if not texts[0].startswith(query_prefix):
+            texts[0] = f"{query_prefix}{texts[0]}"
+        processed_inputs, embed_tokens = _prepare_embedding_inputs(
+            embedding_model, texts, ""
+        )
+        with _admitted(embed_tokens, request.user):
+            vectors = normalize(
+                inference.encode(embedding_model, processed_inputs, INTERACTIVE)
+            )
+        similarities = vectors[1:] @ vectors[0]
+
+        top_m = min(request.top_m, len(request.documents))
+        if top_m < len(request.documents):
+            candidate_ids = np.argpartition(-similarities, top_m - 1)[:top_m]
+        else:
+            candidate_ids = np.arange(len(request.documents))
+        candidate_ids = sorted(candidate_ids.tolist())
+        candidates = [request.documents[i] for i in candidate_ids]
+
+    # Stage 2: cross-encoder scoring of the candidates only
+    rerank_tokens = _count_pair_tokens(
+        rerank_model.tokenizer, request.query, candidates
+    )
+    scores = []
+    if candidates:
+        with _admitted(rerank_tokens, request.user):
+            scores = inference.predict(
+                rerank_model, [[request.query, doc] for doc in candidates], INTERACTIVE
+            )
+
+    response_data = _rank_results(
+        scores,
+        candidates,
+        request.top_n,
+        request.return_documents,
+        doc_ids=candidate_ids,
+    )
+
+    total_tokens = embed_tokens + rerank_tokens
+    return RetrieveRerankResponse(
+        query=request.query,
+        data=response_data,
+        model=request.model,
+        embedding_model=embedding_model_name,
+        candidates=len(candidates),
+        usage=Usage(prompt_tokens=total_tokens, total_tokens=total_tokens),
     )
@@ -0,0 +1,211 @@
+import weakref
+from typing import List, NamedTuple, Optional
+
+from .config import MEMORY_BUDGET_MB
+from .metrics import counter
+from .tokenization import tokenize, tokenize_pairs
+
+# --- Memory Guard ---
+# MAX_INPUT_ITEMS and MAX_INPUT_LENGTH bound a request's shape, not its
+# memory. Before each encode/predict call the peak memory is predicted from
+# the model's config and the padded sequence length: the activations of one
+# layer of one forward batch (inference runs without autograd, so layers do
+# not accumulate), the attention scores if the model materializes them (eager
+# attention; SDPA and flash attention do not, and grow linearly with the
+# sequence), the batch's tokenization inside encode/predict (before inputs
+# are truncated; rerank documents reach it at full length), and for encode
+# the output vectors with their Python list and JSON copies.
+# src/benchmarks/benchmark_memory.py measures the real peaks the constants
+# below were fitted to.
+#
+# With MEMORY_BUDGET_MB set, a call whose prediction exceeds the budget is
+# split into smaller forward batches; if even one input at a time does not
+# fit, MemoryBudgetExceeded is raised (413). The budget applies per model
+# call; with several scheduler slots, calls run side by side.
+
+FLOAT_BYTES = 4
+
+# Live (batch, seq, hidden) float tensors within one layer: hidden states,
+# query/key/value and the attention output.
+HIDDEN_COPIES = 4
+# (batch, seq, intermediate) tensors: the up-projection and its activation.
+INTERMEDIATE_COPIES = 2
+# (batch, heads, seq, seq) tensors of eager attention: scores and softmax.
+ATTENTION_COPIES = 2
+# Held by a tokenizer call per token of its untruncated inputs
+TOKENIZER_BYTES_PER_TOKEN = 100
+# Per output value: float32 array, a Python float and list slot (tolist),
+# and about 20 bytes of JSON text, held twice (serialized bytes and body).
+OUTPUT_VALUE_BYTES = FLOAT_BYTES + 32 + 2 * 20
+
+memory_guard = counter(
+    "memory_guard_total",
+    "Model calls split or rejected by the memory budget.",
+    ("action",),
+)
+
+
+class MemoryBudgetExceeded(Exception):
+    pass
+
+
+class ModelShape(NamedTuple):
+    hidden_size: int
+    num_layers: int
+    num_heads: int
+    intermediate_size: int
+    output_dim: int
+    max_length: int
+    # Whether attention scores are materialized (eager attention)
+    eager_attention: bool
+
+
+# BERT-base-like fallback for models whose config cannot be read
+DEFAULT_SHAPE = ModelShape(768, 12, 12, 3072, 768, 512, True)
+
+_shapes = weakref.WeakKeyDictionary()
+
+
+def _int(value, default: int) -> int:
+    return value if isinstance(value, int) and value > 0 else default
+
+
+def model_shape(model) -> ModelShape:
+    """
+    Reads the transformer dimensions of a SentenceTransformer or CrossEncoder.
+    """
+    try:
+        return _shapes[model]
+    except (KeyError, TypeError):
+        pass
+
+    if hasattr(model, "max_seq_length"):
+        # SentenceTransformer
+        try:
+            config = model._first_module().auto_model.config
+        except AttributeError:
+            config = None
+        max_length = model.max_seq_length
+        output_dim = getattr(model, "get_sentence_embedding_dimension", lambda: None)()
+    else:
+        # CrossEncoder
+        config = getattr(getattr(model, "model", None), "config", None)
+        max_length = getattr(model, "max_length", None)
+        output_dim = 1
+
+    hidden_size = _int(getattr(config, "hidden_size", None), DEFAULT_SHAPE.hidden_size)
+    shape = ModelShape(
+        hidden_size=hidden_size,
+        num_layers=_int(
+            getattr(config, "num_hidden_layers", None), DEFAULT_SHAPE.num_layers
+        ),
+        num_heads=_int(
+            getattr(config, "num_attention_heads", None), DEFAULT_SHAPE.num_heads
+        ),
+        intermediate_size=_int(
+            getattr(config, "intermediate_size", None), 4 * hidden_size
+        ),
+        output_dim=_int(output_dim, hidden_size),
+        max_length=_int(
+            max_length,
+            _int(
+                getattr(config, "max_position_embeddings", None),
+                DEFAULT_SHAPE.max_length,
+            ),
+        ),
+        eager_attention=getattr(config, "_attn_implementation", "eager")
+        not in ("sdpa", "flash_attention_2"),
+    )
+    try:
+        _shapes[model] = shape
+    except TypeError:
+        pass
+    return shape
+
+
+def forward_bytes(shape: ModelShape, batch_size: int, input_len: int) -> int:
+    """
+    Predicted peak memory of tokenizing and running one forward batch whose
+    longest input has `input_len` tokens before truncation.
+    """
+    seq_len = min(input_len, shape.max_length)
+    tokens = batch_size * seq_len
+    activations = tokens * (
+        HIDDEN_COPIES * shape.hidden_size
+        + INTERMEDIATE_COPIES * shape.intermediate_size
+    )
+    if shape.eager_attention:
+        activations += batch_size * shape.num_heads * seq_len**2 * ATTENTION_COPIES
+    tokenizer = batch_size * input_len * TOKENIZER_BYTES_PER_TOKEN
+    return FLOAT_BYTES * activations + tokenizer
+
+
+def output_bytes(shape: ModelShape, num_items: int) -> int:
+    """
+    Predicted memory of the call's results once returned as a response.
+    """
+    return num_items * shape.output_dim * OUTPUT_VALUE_BYTES
+
+
+def predicted_peak_bytes(
+    shape: ModelShape, num_items: int, batch_size: int, input_len: int
+) -> int:
+    return output_bytes(shape, num_items) + forward_bytes(
+        shape, min(batch_size, num_items), input_len
+    )
+
+
+def input_length(model, items: List, max_length: int) -> int:
+    """
+    Longest model input in tokens (with special tokens), before truncation.
+    Pairs with different queries are assumed to fill `max_length`.
+    """
+    tokenizer = model.tokenizer
+    if all(isinstance(item, str) for item in items):
+        ids = tokenize(tokenizer, items, add_special_tokens=True)
+    elif len({item[0] for item in items}) == 1:
+        ids = tokenize_pairs(tokenizer, items[0][0], [item[1] for item in items])
+    else:
+        return max_length
+    return max((len(x) for x in ids), default=0)
+
+
+def fit_batch_size(
+    model,
+    items: List,
+    batch_size: int,
+    budget_bytes: Optional[int] = None,
+    input_len: Optional[int] = None,
+) -> int:
+    """
+    The largest forward batch size, at most `batch_size`, whose predicted peak
+    stays within the budget. Raises MemoryBudgetExceeded if none does.
+    Returns `batch_size` unchanged when no budget is configured. `input_len`
+    is the longest input in tokens, when the caller already knows it.
+    """
+    if budget_bytes is None:
+        budget_bytes = MEMORY_BUDGET_MB * 1024 * 1024
+    if budget_bytes <= 0 or not items:
+        return batch_size
+
+    shape = model_shape(model)
+    if input_len is None:
+        input_len = input_length(model, items, shape.max_length)
+    fitted = min(batch_size, len(items))
+    if predicted_peak_bytes(shape, len(items), fitted, input_len) <= budget_bytes:
+        return batch_size
+    while (
+        fitted > 1
+        and predicted_peak_bytes(shape, len(items), fitted, input_len) > budget_bytes
+    ):
+        fitted //= 2
+
+    peak = predicted_peak_bytes(shape, len(items), fitted, input_len)
+    if peak > budget_bytes:
+        memory_guard.inc(action="rejected")
+        raise MemoryBudgetExceeded(
+            f"Request needs about {peak / 2**20:.0f}MB, over the memory budget "
+            f"of {budget_bytes / 2**20:.0f}MB; send fewer or shorter inputs."
+        )
+    memory_guard.inc(action="split")
+    return fitted
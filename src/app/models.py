@@ -1,13 +1,93 @@
-from .config import EMBEDDING_MODELS, RERANK_MODELS
-from sentence_transformers import SentenceTransformer, CrossEncoder
-import torch
+from .config import (
+    EMBEDDING_MODELS,
+    RERANK_MODELS,
+    MODEL_OPTIONS,
+    MODELS_FILE,
+    TOKEN_CACHE_MAX_TOKENS,
+    ENCODE_PREFETCH_BATCHES,
+    AUTOTUNE,
+    load_models_config,
+    apply_models_config,
+)
+from . import autotune, precision
+from .cache import embedding_cache
+from .tokenization import install_cached_tokenize
+from .pipeline import install_pipelined_encode
 
+import gc
+import json
+import logging
+import sys
 import threading
+from typing import Any, NamedTuple, Optional
 
 # --- Model Loader (Factory) ---
+# torch and sentence-transformers take seconds to import, so they are imported
+# when the first model is loaded rather than with this module. Workers boot
+# and tests that mock get_model run without them.
+#
+# Loaded models are never mutated: a config reload loads and warms the new
+# instances off to the side, then swaps the cache entries and the model lists
+# under one lock. Requests already holding the old instance finish on it; it
+# is freed once the last one drops its reference.
+
+logger = logging.getLogger(__name__)
 
 _model_cache = {}
+# Serializes first-time loads and the swap of a reload.
 _model_lock = threading.Lock()
+# Serializes reloads; held while new models load, which takes _model_lock
+# only for the swap so requests are not blocked meanwhile.
+_reload_lock = threading.Lock()
+
+# Tokenizers of models not loaded yet (see get_tokenizer)
+_tokenizer_cache = {}
+_tokenizer_lock = threading.Lock()
+
+# transformers' placeholder model_max_length for tokenizers without a limit
+_UNBOUNDED_LENGTH = 1_000_000
+
+
+def _model_kind(model_name: str):
+    if model_name in EMBEDDING_MODELS:
+        return "embedding"
+    if model_name in RERANK_MODELS:
+        return "rerank"
+    return None
+
+
+def load_model(model_name: str, kind: str, options: Optional[dict] = None):
+    """
+    Loads a new, uncached instance of `model_name` ("embedding" or "rerank")
+    with its models config `options` (by default, its current entry).
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer, CrossEncoder
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    print(f"Loading model '{model_name}' on device '{device}'...")
+
+    if options is None:
+        options = MODEL_OPTIONS.get(model_name, {})
+    dtype = options.get("dtype", precision.FP32)
+    if kind == "embedding":
+        model = SentenceTransformer(model_name, device=device)
+        dtype = precision.apply_dtype(model, kind, dtype, device)
+        if TOKEN_CACHE_MAX_TOKENS > 0:
+            # Share the token cache with the model input stage of encode()
+            install_cached_tokenize(model)
+        # Tokenize the next batches while the current forward pass runs
+        install_pipelined_encode(model, ENCODE_PREFETCH_BATCHES)
+        if AUTOTUNE:
+            autotune.tune(model_name, model, "embedding", dtype)
+    else:
+        model = CrossEncoder(model_name, device=device)
+        dtype = precision.apply_dtype(model, kind, dtype, device)
+        if AUTOTUNE:
+            autotune.tune(model_name, model, "rerank", dtype)
+
+    print(f"Model '{model_name}' loaded successfully ({dtype}).")
+    return model
 
 
 def get_model(model_name: str):
@@ -15,23 +95,211 @@ def get_model(model_name: str):
     Factory function to get a model instance.
     It loads real models from Hugging Face and caches them.
     """
-    with _model_lock:
-        if model_name in _model_cache:
-            return _model_cache[model_name]
-
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        print(f"Loading model '{model_name}' on device '{device}'...")
+    model = _model_cache.get(model_name)
+    if model is not None:
+        return model
 
-        if model_name in EMBEDDING_MODELS:
-            model = SentenceTransformer(model_name, device=device)
-            _model_cache[model_name] = model
-            print(f"Model '{model_name}' loaded successfully.")
+    with _model_lock:
+        model = _model_cache.get(model_name)
+        if model is not None:
             return model
-
-        if model_name in RERANK_MODELS:
-            model = CrossEncoder(model_name, device=device)
+        kind = _model_kind(model_name)
+        if kind is not None:
+            model = load_model(model_name, kind)
             _model_cache[model_name] = model
-            print(f"Model '{model_name}' loaded successfully.")
             return model
 
     raise ValueError(f"Model '{model_name}' is not supported.")
+
+
+class TokenizerOnly(NamedTuple):
+    """
+    A model's tokenizer and input limit in tokens: max_seq_length for
+    embedding models, the (query, document) pair limit for rerankers.
+    """
+
+    tokenizer: Any
+    max_length: int
+
+
+def _pair_limit(tokenizer, config) -> int:
+    # CrossEncoder leaves truncation to the tokenizer's model_max_length.
+    limit = getattr(tokenizer, "model_max_length", None)
+    if isinstance(limit, int) and limit < _UNBOUNDED_LENGTH:
+        return limit
+    return getattr(config, "max_position_embeddings", 512)
+
+
+def _read_json(model_name: str, filename: str):
+    from transformers.utils import cached_file
+
+    try:
+        path = cached_file(
+            model_name, filename, _raise_exceptions_for_missing_entries=False
+        )
+    except OSError:
+        return None
+    if path is None:
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_tokenizer(model_name: str, kind: str) -> TokenizerOnly:
+    """
+    Loads the tokenizer and input limit of `model_name` without its weights,
+    resolved the way SentenceTransformer / CrossEncoder resolve them.
+    """
+    from transformers import AutoConfig, AutoTokenizer
+
+    subfolder = ""
+    if kind == "embedding":
+        # The transformer module may live in a subfolder (modules.json).
+        for module in _read_json(model_name, "modules.json") or []:
+            if module.get("type", "").endswith("models.Transformer"):
+                subfolder = module.get("path", "")
+                break
+    tokenizer = AutoTokenizer.from_pretrained(model_name, subfolder=subfolder)
+    config = AutoConfig.from_pretrained(model_name, subfolder=subfolder)
+
+    if kind == "rerank":
+        return TokenizerOnly(tokenizer, _pair_limit(tokenizer, config))
+
+    sbert_config = _read_json(
+        model_name,
+        f"{subfolder}/sentence_bert_config.json"
+        if subfolder
+        else "sentence_bert_config.json",
+    )
+    max_length = (sbert_config or {}).get("max_seq_length")
+    if max_length is None:
+        max_length = min(
+            getattr(config, "max_position_embeddings", _UNBOUNDED_LENGTH),
+            tokenizer.model_max_length,
+        )
+    return TokenizerOnly(tokenizer, max_length)
+
+
+def get_tokenizer(model_name: str) -> TokenizerOnly:
+    """
+    The tokenizer of a configured model. A loaded model's own tokenizer is
+    used; otherwise only the tokenizer is loaded (and cached), not the weights.
+    """
+    kind = _model_kind(model_name)
+    if kind is None:
+        raise ValueError(f"Model '{model_name}' is not supported.")
+
+    model = _model_cache.get(model_name)
+    if model is not None:
+        if kind == "embedding":
+            return TokenizerOnly(model.tokenizer, model.max_seq_length)
+        if isinstance(getattr(model, "max_length", None), int):
+            return TokenizerOnly(model.tokenizer, model.max_length)
+        return TokenizerOnly(
+            model.tokenizer,
+            _pair_limit(model.tokenizer, getattr(model.model, "config", None)),
+        )
+
+    cached = _tokenizer_cache.get(model_name)
+    if cached is not None:
+        return cached
+    with _tokenizer_lock:
+        cached = _tokenizer_cache.get(model_name)
+        if cached is None:
+            cached = _tokenizer_cache[model_name] = load_tokenizer(model_name, kind)
+        return cached
+
+
+def loaded_models():
+    """
+    Names of the models currently resident in this process.
+    """
+    return list(_model_cache)
+
+
+def preload(model_names):
+    """
+    Loads the given models (and with them torch) ahead of the first request.
+    """
+    for model_name in model_names:
+        get_model(model_name)
+
+
+def _warm_up(model, kind: str):
+    # The first call allocates buffers and selects kernels; keep it off the
+    # first request.
+    if kind == "embedding":
+        model.encode(["warm up"])
+    else:
+        model.predict([["warm up", "warm up"]])
+
+
+def _release_memory():
+    gc.collect()
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+def reload_models(path=None) -> dict:
+    """
+    Re-reads the models config and applies it without a restart.
+    Added models, and loaded models whose entry changed, are loaded and warmed
+    in the calling thread while requests keep using the current instances;
+    then the config and instances are swapped in at once and removed models
+    are unloaded. If any load fails, nothing changes.
+    Returns the added, removed and reloaded model names.
+    """
+    with _reload_lock:
+        embedding, rerank, options = load_models_config(path or MODELS_FILE)
+        new_kinds = {name: "embedding" for name in embedding}
+        new_kinds.update({name: "rerank" for name in rerank})
+        old_kinds = {
+            name: _model_kind(name) for name in EMBEDDING_MODELS + RERANK_MODELS
+        }
+
+        added = [name for name in new_kinds if name not in old_kinds]
+        removed = [name for name in old_kinds if name not in new_kinds]
+        changed = [
+            name
+            for name in new_kinds
+            if name in old_kinds
+            and (
+                old_kinds[name] != new_kinds[name]
+                or MODEL_OPTIONS.get(name) != options.get(name)
+            )
+        ]
+
+        fresh = {}
+        for name in added + changed:
+            # Changed models that were never loaded just load lazily later.
+            if name in changed and name not in _model_cache:
+                continue
+            # The new config is only applied after the loads, so pass the
+            # model its new entry (e.g. a changed dtype).
+            model = load_model(name, new_kinds[name], options.get(name, {}))
+            _warm_up(model, new_kinds[name])
+            fresh[name] = model
+
+        with _model_lock:
+            apply_models_config(embedding, rerank, options)
+            for name in removed + [name for name in changed if name not in fresh]:
+                _model_cache.pop(name, None)
+            _model_cache.update(fresh)
+            for name in removed + changed:
+                _tokenizer_cache.pop(name, None)
+
+        for name in removed:
+            autotune.unregister(name)
+        if removed or changed:
+            # Cached document vectors are keyed by model name.
+            embedding_cache.clear()
+            _release_memory()
+
+        logger.info(
+            "Models config reloaded: added=%s removed=%s reloaded=%s",
+            added,
+            removed,
+            changed,
+        )
+        return {"added": added, "removed": removed, "reloaded": changed}
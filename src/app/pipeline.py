@@ -0,0 +1,156 @@
+import queue
+import threading
+import weakref
+from contextlib import nullcontext
+from typing import Callable, ContextManager, List, Optional
+
+import numpy as np
+
+from . import cancellation
+
+# --- Pipelined Encoding ---
+# SentenceTransformer.encode alternates between tokenizing a batch and running
+# its forward pass, so the CPU is idle in one stage while busy in the other.
+# Here a background thread tokenizes (and pads) batch k+1 while the forward
+# pass of batch k runs; the Rust tokenizer and torch both release the GIL.
+# A bounded queue caps how many prepared batches may wait.
+#
+# Scheduled bulk encodes run one pipelined call over the whole request and
+# take a scheduler slot per forward batch (see inference.encode), so their
+# sub-batches are tokenized ahead too.
+
+_DONE = object()
+
+# Prefetch depth of models with install_pipelined_encode applied
+_prefetch = weakref.WeakKeyDictionary()
+
+
+def _tokenize_batches(model, batches: List[List[str]], out: queue.Queue, stop):
+    try:
+        for batch in batches:
+            item = model.tokenize(batch)
+            while not stop.is_set():
+                try:
+                    out.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            if stop.is_set():
+                return
+        item = _DONE
+    except BaseException as e:  # Surfaced by the consumer
+        item = e
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def pipelined_encode(
+    model,
+    sentences: List[str],
+    batch_size: int = 32,
+    prefetch: int = 2,
+    normalize_embeddings: bool = False,
+    forward_slot: Optional[Callable[[], ContextManager]] = None,
+) -> np.ndarray:
+    """
+    Equivalent of model.encode(sentences) for sentence embeddings as numpy,
+    with tokenization of the next `prefetch` batches overlapped with the
+    current forward pass. Batches are formed over length-sorted inputs, as in
+    SentenceTransformer.encode. Each forward pass runs inside `forward_slot()`
+    if given.
+    """
+    import torch
+    from sentence_transformers.util import batch_to_device
+
+    length_sorted_idx = np.argsort([-model._text_length(s) for s in sentences])
+    sentences_sorted = [sentences[i] for i in length_sorted_idx]
+    batches = [
+        sentences_sorted[start : start + batch_size]
+        for start in range(0, len(sentences_sorted), batch_size)
+    ]
+
+    device = model.device
+    prepared: queue.Queue = queue.Queue(maxsize=max(1, prefetch))
+    stop = threading.Event()
+    producer = threading.Thread(
+        target=_tokenize_batches,
+        args=(model, batches, prepared, stop),
+        name="tokenize-prefetch",
+        daemon=True,
+    )
+    producer.start()
+
+    embeddings = []
+    try:
+        while True:
+            item = prepared.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            with forward_slot() if forward_slot else nullcontext():
+                # Long requests stop between batches once their client is gone.
+                cancellation.check()
+                features = batch_to_device(item, device)
+                with torch.no_grad():
+                    out = model.forward(features)["sentence_embedding"].detach()
+                    if normalize_embeddings:
+                        out = torch.nn.functional.normalize(out, p=2, dim=1)
+            embeddings.append(out.float().cpu().numpy())
+    finally:
+        stop.set()
+        producer.join()
+
+    stacked = np.concatenate(embeddings) if embeddings else np.empty((0, 0))
+    return stacked[np.argsort(length_sorted_idx)]
+
+
+def _pipelines(model, sentences, batch_size: int, kwargs) -> bool:
+    unsupported = set(kwargs) - {"normalize_embeddings", "show_progress_bar"}
+    return not (
+        unsupported
+        or isinstance(sentences, str)
+        or len(sentences) <= batch_size
+        or getattr(model, "default_prompt_name", None)
+        or getattr(model, "truncate_dim", None)
+    )
+
+
+def prefetch_for(model, sentences, batch_size: int) -> int:
+    """
+    Prefetch depth to encode `sentences` with pipelined_encode, or 0 if the
+    model is not pipelined or the call would use the original encode.
+    """
+    prefetch = _prefetch.get(model, 0)
+    if prefetch and _pipelines(model, sentences, batch_size, {}):
+        return prefetch
+    return 0
+
+
+def install_pipelined_encode(model, prefetch: int):
+    """
+    Routes multi-batch model.encode(list) calls through pipelined_encode.
+    Calls with other options, prompts or a single batch use the original method.
+    """
+    if prefetch <= 0:
+        return model
+    original_encode = model.encode
+
+    def encode(sentences, batch_size: int = 32, **kwargs):
+        if not _pipelines(model, sentences, batch_size, kwargs):
+            return original_encode(sentences, batch_size=batch_size, **kwargs)
+        return pipelined_encode(
+            model,
+            list(sentences),
+            batch_size=batch_size,
+            prefetch=prefetch,
+            normalize_embeddings=kwargs.get("normalize_embeddings", False),
+        )
+
+    model.encode = encode
+    _prefetch[model] = prefetch
+    return model
@@ -0,0 +1,96 @@
+import logging
+from typing import FrozenSet
+
+# --- Inference Precision ---
+# A model runs in bfloat16 when its config/models.yml entry sets `dtype: bf16`
+# (default fp32). Its transformer's weights are cast when it is loaded, which
+# halves their memory, and matmuls use the native bf16 kernels of AMX /
+# AVX512-BF16 Xeons (or Arm BF16 cores). The transformer's outputs are upcast
+# to float32, so pooling, any Dense layers after it, normalization, scores and
+# the API stay float32.
+#
+# Without native support bf16 is emulated and slower than fp32, so such hosts
+# run the model in fp32 and log a warning. src/benchmarks/benchmark_dtype.py
+# checks accuracy parity and compares throughput against fp32.
+
+logger = logging.getLogger(__name__)
+
+FP32 = "fp32"
+BF16 = "bf16"
+DTYPES = (FP32, BF16)
+
+# CPU flags (x86 /proc/cpuinfo "flags", Arm "Features") of native bf16 matmul
+BF16_CPU_FLAGS = frozenset(("avx512_bf16", "amx_bf16", "bf16"))
+
+
+def _cpu_flags() -> FrozenSet[str]:
+    try:
+        with open("/proc/cpuinfo") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return frozenset()
+    flags = set()
+    for line in lines:
+        key, _, value = line.partition(":")
+        if key.strip() in ("flags", "Features"):
+            flags.update(value.split())
+    return frozenset(flags)
+
+
+def bf16_supported(device: str) -> bool:
+    """
+    Whether `device` ("cpu" or "cuda") has native bf16 matmul.
+    """
+    import torch
+
+    if device == "cuda":
+        return torch.cuda.is_bf16_supported()
+    return bool(BF16_CPU_FLAGS & _cpu_flags())
+
+
+def _upcast_features(module, args, features):
+    # SentenceTransformer modules pass a features dict along.
+    import torch
+
+    return {
+        key: value.float()
+        if torch.is_tensor(value) and value.is_floating_point()
+        else value
+        for key, value in features.items()
+    }
+
+
+def _upcast_logits(module, args, output):
+    if isinstance(output, tuple):
+        return (output[0].float(),) + output[1:]
+    output["logits"] = output["logits"].float()
+    return output
+
+
+def apply_dtype(
+    model, kind: str, dtype: str, device: str, require_support: bool = True
+) -> str:
+    """
+    Casts a freshly loaded SentenceTransformer ("embedding") or CrossEncoder
+    ("rerank") to `dtype` and returns the dtype it runs in. With
+    `require_support`, bf16 falls back to fp32 on devices without native bf16.
+    """
+    if dtype == BF16 and require_support and not bf16_supported(device):
+        logger.warning(
+            "bf16 was requested but the %s has no native bf16 support; running in fp32.",
+            device,
+        )
+        dtype = FP32
+    if dtype == BF16:
+        import torch
+
+        if kind == "embedding":
+            # Modules after the transformer (e.g. Dense) get float32 inputs
+            # and keep float32 weights.
+            transformer = model._first_module()
+            transformer.to(torch.bfloat16)
+            transformer.register_forward_hook(_upcast_features)
+        else:
+            model.model.to(torch.bfloat16)
+            model.model.register_forward_hook(_upcast_logits)
+    return dtype
@@ -0,0 +1,129 @@
+import asyncio
+import hashlib
+import logging
+import signal
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+from . import models
+from .metrics import counter
+
+# --- Models Config Reload ---
+# config/models.yml is re-applied without a restart when its content changes
+# (polled every MODELS_CONFIG_POLL_INTERVAL seconds), on SIGHUP, or through
+# POST /admin/reload. Reloads run in the background and swap models in only
+# once they are loaded and warmed (see models.reload_models).
+
+logger = logging.getLogger(__name__)
+
+model_reloads = counter(
+    "model_reloads_total",
+    "Models config reloads by trigger and outcome.",
+    ("trigger", "outcome"),
+)
+
+
+def reload(trigger: str) -> dict:
+    """
+    Reloads the models config in the calling thread and records the outcome.
+    """
+    try:
+        result = models.reload_models()
+    except Exception:
+        model_reloads.inc(trigger=trigger, outcome="error")
+        raise
+    model_reloads.inc(trigger=trigger, outcome="ok")
+    return result
+
+
+def _reload_logged(trigger: str):
+    try:
+        reload(trigger)
+    except Exception:
+        logger.exception("Reloading the models config (%s) failed", trigger)
+
+
+def request_reload(trigger: str) -> threading.Thread:
+    """
+    Starts a reload on a background thread and returns it.
+    """
+    thread = threading.Thread(
+        target=_reload_logged, args=(trigger,), name="models-reload", daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def install_sighup_handler() -> bool:
+    """
+    Reloads on SIGHUP. Must be called from the running event loop of the main
+    thread; returns False where signal handlers cannot be installed.
+    """
+    if not hasattr(signal, "SIGHUP"):
+        return False
+    try:
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGHUP, request_reload, "signal"
+        )
+    except (NotImplementedError, RuntimeError, ValueError):
+        return False
+    return True
+
+
+def remove_sighup_handler():
+    try:
+        asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+    except (AttributeError, NotImplementedError, RuntimeError, ValueError):
+        pass
+
+
+class ConfigWatcher:
+    """
+    Polls a file and calls `on_change` from its own thread when the file's
+    content changes. A failing callback is logged and not retried until the
+    file changes again.
+    """
+
+    def __init__(self, path, interval: float, on_change: Callable[[], None]):
+        self.path = Path(path)
+        self.interval = interval
+        self.on_change = on_change
+        self._signature = self._read_signature()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _read_signature(self) -> Optional[bytes]:
+        try:
+            return hashlib.blake2b(self.path.read_bytes(), digest_size=16).digest()
+        except OSError:
+            return None
+
+    def check(self) -> bool:
+        """
+        Calls `on_change` if the file changed since the last check.
+        """
+        signature = self._read_signature()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        try:
+            self.on_change()
+        except Exception:
+            logger.exception("Handling a change of %s failed", self.path)
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name="models-config-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,519 @@
+import asyncio
+import bisect
+import hashlib
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, List, NamedTuple, Optional, Sequence
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+
+from .config import (
+    ROUTER_REPLICAS,
+    ROUTER_REPLICAS_PER_MODEL,
+    ROUTER_VIRTUAL_NODES,
+    ROUTER_POLL_INTERVAL,
+    ROUTER_MAX_QUEUE_IMBALANCE,
+    ROUTER_SPILL_QUEUE_DEPTH,
+    ROUTER_HEDGE_PERCENTILE,
+    ROUTER_HEDGE_MIN_DELAY_MS,
+    ROUTER_HEDGE_MAX_RATIO,
+    ROUTER_MAX_ATTEMPTS,
+    ROUTER_TIMEOUT,
+)
+from .metrics import REGISTRY, counter, gauge
+from .wire import decode_body
+
+# --- Replica Router ---
+# Behind a round-robin balancer every replica loads every model, and each
+# replica's embedding/token caches and single-flight see a fraction of the
+# repeats. The router instead sends each request to a replica chosen by:
+#
+#   1. Consistent hashing of the model: a hash ring with virtual nodes maps
+#      each model to ROUTER_REPLICAS_PER_MODEL replicas, its home set. Adding
+#      or removing a replica only moves the models next to it on the ring.
+#   2. Rendezvous hashing of the request body within the home set, so repeats
+#      of a request land on the replica that has it cached.
+#   3. Queue depth, polled from each replica's /ready: a request leaves its
+#      preferred replica for a less loaded one of the home set, and spills to
+#      the rest of the ring (replicas that already hold the model first) when
+#      the whole home set is backed up.
+#
+# Collections live in one replica's memory, so requests naming a collection
+# always go to the collection's owner on the ring.
+#
+# Idempotent requests are hedged: if the replica has not answered after the
+# endpoint's recent p95 latency, the request is also sent to the next replica
+# and the first response wins; the other is cancelled, which also cancels its
+# queued inference on the replica. Connection errors and 502/503/504 responses
+# are retried on the next replica.
+
+logger = logging.getLogger(__name__)
+
+routed_requests = counter(
+    "router_requests_total",
+    "Requests sent to each replica by outcome.",
+    ("replica", "outcome"),
+)
+hedged_requests = counter(
+    "router_hedges_total",
+    "Hedged requests by whether the hedge answered first.",
+    ("outcome",),
+)
+replica_queue_depth = gauge(
+    "router_replica_queue_depth",
+    "Queued and running model calls last reported by each replica.",
+    ("replica",),
+)
+
+# Endpoints without side effects, safe to send to several replicas
+IDEMPOTENT_PATHS = frozenset(
+    (
+        "/v1/embeddings",
+        "/v1/rerank",
+        "/v1/rerank/batch",
+        "/v1/similarity",
+        "/v1/cluster",
+        "/v1/retrieve_rerank",
+        "/v1/tokenize",
+    )
+)
+RETRY_STATUSES = frozenset((502, 503, 504))
+# Headers not forwarded: hop-by-hop, and those httpx sets or decodes itself
+DROPPED_HEADERS = frozenset(
+    (
+        "connection",
+        "keep-alive",
+        "transfer-encoding",
+        "upgrade",
+        "te",
+        "trailer",
+        "host",
+        "content-length",
+        "accept-encoding",
+        "content-encoding",
+    )
+)
+# Hedging starts once an endpoint has this many latency samples
+MIN_HEDGE_SAMPLES = 20
+LATENCY_WINDOW = 1000
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big"
+    )
+
+
+class HashRing:
+    """
+    Consistent-hash ring with `virtual_nodes` points per node.
+    """
+
+    def __init__(self, nodes: Sequence[str], virtual_nodes: int):
+        points = sorted(
+            (_hash(f"{node}#{i}"), node)
+            for node in nodes
+            for i in range(max(1, virtual_nodes))
+        )
+        self._hashes = [h for h, _ in points]
+        self._nodes = [node for _, node in points]
+        self._count = len(set(nodes))
+
+    def walk(self, key: str) -> List[str]:
+        """
+        Distinct nodes in ring order, starting at the position of `key`.
+        """
+        order: List[str] = []
+        start = bisect.bisect(self._hashes, _hash(key))
+        for i in range(len(self._nodes)):
+            node = self._nodes[(start + i) % len(self._nodes)]
+            if node not in order:
+                order.append(node)
+                if len(order) == self._count:
+                    break
+        return order
+
+
+class Route(NamedTuple):
+    # Ring position: the model or collection, or the body for unknown models
+    key: str
+    # Spreads requests over the key's replicas; equal inputs stay together
+    input_key: str
+    model: Optional[str]
+    # Bound to the one replica owning `key` (collections)
+    sticky: bool
+    idempotent: bool
+
+
+def route_for(method: str, path: str, query, payload, body: bytes) -> Route:
+    """
+    Routing key of a request, from its path and decoded body if any.
+    """
+    parts = path.strip("/").split("/")
+    collection = None
+    if parts[:2] == ["v1", "collections"]:
+        collection = parts[2] if len(parts) > 2 else (payload or {}).get("name")
+    elif isinstance(payload, dict):
+        collection = payload.get("collection")
+    if isinstance(collection, str):
+        return Route(f"collection:{collection}", "", None, True, False)
+
+    model = payload.get("model") if isinstance(payload, dict) else query.get("model")
+    if isinstance(model, list):
+        model = ",".join(sorted(str(m) for m in model))
+    input_key = hashlib.blake2b(
+        body or str(query).encode("utf-8"), digest_size=16
+    ).hexdigest()
+    return Route(
+        f"model:{model}" if model else f"input:{input_key}",
+        input_key,
+        model if isinstance(model, str) else None,
+        False,
+        method in ("GET", "HEAD") or path in IDEMPOTENT_PATHS,
+    )
+
+
+class Replica:
+    def __init__(self, url: str):
+        self.url = url
+        self.healthy = True
+        self.queue_depth = 0
+        self.models = frozenset()
+        # Requests this router has sent and not yet seen answered
+        self.outstanding = 0
+
+    @property
+    def load(self) -> int:
+        # The polled depth is up to a poll interval old and includes other
+        # routers' requests; this router's own in-flight count is current.
+        return max(self.queue_depth, self.outstanding)
+
+
+class Router:
+    def __init__(
+        self,
+        replicas: Sequence[str],
+        replicas_per_model: int = ROUTER_REPLICAS_PER_MODEL,
+        virtual_nodes: int = ROUTER_VIRTUAL_NODES,
+        mounts: Optional[Dict[str, httpx.AsyncBaseTransport]] = None,
+    ):
+        self.replicas = {url: Replica(url) for url in replicas}
+        self.ring = HashRing(list(self.replicas), virtual_nodes)
+        self.replicas_per_model = max(1, replicas_per_model)
+        self.client: Optional[httpx.AsyncClient] = None
+        self._mounts = mounts
+        self._poller: Optional[asyncio.Task] = None
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._requests = 0
+        self._hedges = 0
+
+    async def start(self):
+        if not self.replicas:
+            raise RuntimeError("ROUTER_REPLICAS is not set.")
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(ROUTER_TIMEOUT, connect=5.0), mounts=self._mounts
+        )
+        await self.poll()
+        self._poller = asyncio.create_task(self._poll_forever())
+
+    async def stop(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            await asyncio.gather(self._poller, return_exceptions=True)
+        if self.client is not None:
+            await self.client.aclose()
+
+    # --- Replica state ---
+
+    async def poll(self):
+        """
+        Refreshes health, queue depth and resident models of every replica.
+        """
+        await asyncio.gather(*(self._poll_one(r) for r in self.replicas.values()))
+
+    async def _poll_one(self, replica: Replica):
+        try:
+            response = await self.client.get(
+                f"{replica.url}/ready", timeout=max(ROUTER_POLL_INTERVAL, 1.0)
+            )
+            response.raise_for_status()
+            status = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            if replica.healthy:
+                logger.warning("Replica %s is not ready: %r", replica.url, e)
+            replica.healthy = False
+            return
+        replica.healthy = True
+        replica.queue_depth = int(status.get("queue_depth", 0)) + int(
+            status.get("running", 0)
+        )
+        replica.models = frozenset(status.get("models", ()))
+        replica_queue_depth.set(replica.queue_depth, replica=replica.url)
+
+    async def _poll_forever(self):
+        while True:
+            await asyncio.sleep(ROUTER_POLL_INTERVAL)
+            await self.poll()
+
+    def candidates(self, route: Route) -> List[str]:
+        """
+        Replicas to try for a request, best first.
+        """
+        walk = self.ring.walk(route.key)
+        if route.sticky:
+            return walk[:1]
+
+        home = sorted(
+            walk[: self.replicas_per_model],
+            key=lambda url: _hash(f"{route.input_key}@{url}"),
+            reverse=True,
+        )
+        up = [url for url in home if self.replicas[url].healthy]
+        rest = sorted(
+            (url for url in walk[len(home) :] if self.replicas[url].healthy),
+            key=lambda url: (
+                route.model not in self.replicas[url].models,
+                self.replicas[url].load,
+            ),
+        )
+        least = min(up, key=lambda url: self.replicas[url].load, default=None)
+        if least is not None:
+            least_load = self.replicas[least].load
+            if self.replicas[up[0]].load - least_load >= ROUTER_MAX_QUEUE_IMBALANCE:
+                up.remove(least)
+                up.insert(0, least)
+        if rest and (least is None or least_load >= ROUTER_SPILL_QUEUE_DEPTH):
+            order = rest[:1] + up + rest[1:]
+        else:
+            order = up + rest
+        # Replicas that failed their last poll are tried last
+        return order + [url for url in walk if not self.replicas[url].healthy]
+
+    # --- Hedging ---
+
+    def observe(self, path: str, seconds: float):
+        samples = self._latencies.get(path)
+        if samples is None:
+            samples = self._latencies[path] = deque(maxlen=LATENCY_WINDOW)
+        samples.append(seconds)
+
+    def hedge_delay(self, path: str) -> Optional[float]:
+        """
+        Seconds after which a request to `path` is hedged, or None.
+        """
+        samples = self._latencies.get(path)
+        if ROUTER_HEDGE_PERCENTILE <= 0 or not samples:
+            return None
+        if len(samples) < MIN_HEDGE_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(len(ordered) * ROUTER_HEDGE_PERCENTILE / 100))
+        return max(ordered[index], ROUTER_HEDGE_MIN_DELAY_MS / 1000)
+
+    def _may_hedge(self) -> bool:
+        # Hedges are budgeted so that a slow fleet is not sent extra load.
+        return self._hedges < ROUTER_HEDGE_MAX_RATIO * self._requests
+
+    # --- Forwarding ---
+
+    async def _send(self, url: str, method: str, target: str, headers, content):
+        replica = self.replicas[url]
+        replica.outstanding += 1
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(
+                method, f"{url}{target}", headers=headers, content=content
+            )
+        except httpx.TransportError as e:
+            if isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout)):
+                replica.healthy = False
+            routed_requests.inc(replica=url, outcome="error")
+            raise
+        except asyncio.CancelledError:
+            routed_requests.inc(replica=url, outcome="cancelled")
+            raise
+        finally:
+            replica.outstanding -= 1
+        if response.status_code >= 500:
+            routed_requests.inc(replica=url, outcome="error")
+        else:
+            routed_requests.inc(replica=url, outcome="ok")
+            self.observe(target.split("?", 1)[0], time.perf_counter() - start)
+        return response
+
+    async def dispatch(
+        self, route: Route, order: List[str], method: str, target: str, headers, content
+    ):
+        """
+        Sends the request along `order` with hedging and retries, and returns
+        (response, replica). Raises the last transport error if no replica
+        answered.
+        """
+        self._requests += 1
+        path = target.split("?", 1)[0]
+        remaining = iter(order[: max(1, ROUTER_MAX_ATTEMPTS)])
+        pending: Dict[asyncio.Task, str] = {}
+
+        def launch() -> bool:
+            url = next(remaining, None)
+            if url is None:
+                return False
+            task = asyncio.create_task(
+                self._send(url, method, target, headers, content)
+            )
+            pending[task] = url
+            return True
+
+        launch()
+        first = order[0] if order else None
+        delay = self.hedge_delay(path) if route.idempotent else None
+        deadline = time.perf_counter() + delay if delay is not None else None
+        hedged = hedge_sent = False
+        failure = None
+        try:
+            while pending:
+                timeout = None
+                if deadline is not None and not hedged:
+                    timeout = max(0.0, deadline - time.perf_counter())
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedged = True
+                    if self._may_hedge() and launch():
+                        self._hedges += 1
+                        hedge_sent = True
+                    continue
+                for task in done:
+                    url = pending.pop(task)
+                    try:
+                        response = task.result()
+                    except httpx.TransportError as e:
+                        failure = e
+                        retry = route.idempotent or isinstance(e, httpx.ConnectError)
+                    else:
+                        if not route.idempotent or (
+                            response.status_code not in RETRY_STATUSES
+                        ):
+                            if hedge_sent:
+                                hedged_requests.inc(
+                                    outcome="won" if url != first else "lost"
+                                )
+                            return response, url
+                        failure, retry = response, True
+                    if retry and not pending:
+                        launch()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        if isinstance(failure, httpx.Response):
+            return failure, None
+        raise failure
+
+    async def proxy(self, request: Request) -> Response:
+        path = request.url.path
+        target = path + (f"?{request.url.query}" if request.url.query else "")
+        headers = {
+            key: value
+            for key, value in request.headers.items()
+            if key.lower() not in DROPPED_HEADERS
+        }
+        streaming = path.endswith("/stream")
+        if streaming:
+            # Streamed uploads are forwarded as they arrive, to one replica.
+            content, body, payload = request.stream(), b"", None
+        else:
+            content = body = await request.body()
+            payload = None
+            if body:
+                # MessagePack and Arrow bodies name their model too
+                content_type = request.headers.get("content-type")
+                try:
+                    payload = decode_body(content_type, body)
+                except (ValueError, HTTPException) as e:
+                    # Malformed bodies (the replica answers 400) or a missing
+                    # msgpack / pyarrow: route by the body hash instead
+                    detail = e.detail if isinstance(e, HTTPException) else repr(e)
+                    logger.warning(
+                        "Routing %s %s by body hash: cannot decode its %s body: %s",
+                        request.method,
+                        path,
+                        content_type,
+                        detail,
+                    )
+        route = route_for(request.method, path, request.query_params, payload, body)
+        order = self.candidates(route)
+        if streaming:
+            route, order = route._replace(idempotent=False), order[:1]
+
+        try:
+            response, url = await self.dispatch(
+                route, order, request.method, target, headers, content
+            )
+        except httpx.HTTPError as e:
+            return JSONResponse(
+                status_code=502, content={"detail": f"No replica answered: {e!r}"}
+            )
+        response_headers = {
+            key: value
+            for key, value in response.headers.items()
+            if key.lower() not in DROPPED_HEADERS
+        }
+        if url is not None:
+            response_headers["x-replica"] = url
+        return Response(
+            content=response.content,
+            status_code=response.status_code,
+            headers=response_headers,
+        )
+
+
+def create_app(router: Router) -> FastAPI:
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        await router.start()
+        yield
+        await router.stop()
+
+    app = FastAPI(title="Embedding API Router", lifespan=lifespan)
+    app.state.router = router
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    def metrics():
+        return REGISTRY.render()
+
+    @app.get("/ready")
+    def ready():
+        """
+        Ready while at least one replica is; lists the replicas' last state.
+        """
+        replicas = {
+            url: {
+                "healthy": replica.healthy,
+                "queue_depth": replica.queue_depth,
+                "models": sorted(replica.models),
+            }
+            for url, replica in router.replicas.items()
+        }
+        if not any(replica.healthy for replica in router.replicas.values()):
+            return JSONResponse(
+                status_code=503, content={"status": "unavailable", "replicas": replicas}
+            )
+        return {"status": "ready", "replicas": replicas}
+
+    @app.api_route(
+        "/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE", "HEAD"]
+    )
+    async def proxy(request: Request):
+        return await router.proxy(request)
+
+    return app
+
+
+app = create_app(Router(ROUTER_REPLICAS))
@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Optional
+
+from . import cancellation
+from .config import SCHEDULER_MAX_CONCURRENCY
+from .metrics import gauge, histogram
+
+# --- Inference Scheduler ---
+# Model calls run in priority lanes. A slot is granted to the oldest waiter of
+# the highest-priority non-empty lane, so interactive queries never queue
+# behind a bulk ingest: bulk work runs in sub-batches (see app/inference.py)
+# and gives its slot back between them.
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+# Highest priority first.
+LANES = (INTERACTIVE, BULK)
+
+queue_wait = histogram(
+    "scheduler_queue_wait_seconds",
+    "Time spent waiting for an inference slot.",
+    ("lane",),
+)
+queue_depth = gauge(
+    "scheduler_queue_depth",
+    "Model calls waiting for an inference slot.",
+    ("lane",),
+)
+request_latency = histogram(
+    "request_latency_seconds",
+    "End-to-end request processing time.",
+    ("endpoint", "lane"),
+)
+
+
+class _Ticket:
+    __slots__ = ("lane",)
+
+    def __init__(self, lane: str):
+        self.lane = lane
+
+
+class Scheduler:
+    """
+    Grants up to `max_concurrency` concurrent inference slots, strictly by lane
+    priority and first-come-first-served within a lane.
+    """
+
+    def __init__(self, max_concurrency: int = 1):
+        self.max_concurrency = max(1, max_concurrency)
+        self._cond = threading.Condition()
+        self._running = 0
+        self._queues: Dict[str, Deque[_Ticket]] = {lane: deque() for lane in LANES}
+
+    def _head(self) -> Optional[_Ticket]:
+        for lane in LANES:
+            if self._queues[lane]:
+                return self._queues[lane][0]
+        return None
+
+    def waiting(self, lane: str) -> int:
+        with self._cond:
+            return len(self._queues[lane])
+
+    @property
+    def running(self) -> int:
+        with self._cond:
+            return self._running
+
+    @contextmanager
+    def slot(self, lane: str):
+        """
+        Blocks until the caller may run one model call in `lane`.
+        Gives up with RequestCancelled if the current request is cancelled.
+        """
+        if lane not in self._queues:
+            raise ValueError(f"Unknown scheduler lane '{lane}'.")
+
+        ticket = _Ticket(lane)
+        start = time.perf_counter()
+        with self._cond:
+            self._queues[lane].append(ticket)
+            queue_depth.inc(lane=lane)
+            try:
+                cancellation.wait_for(
+                    self._cond,
+                    lambda: (
+                        self._running < self.max_concurrency and self._head() is ticket
+                    ),
+                )
+            finally:
+                self._queues[lane].remove(ticket)
+                queue_depth.dec(lane=lane)
+                # The next head may fit in a remaining slot.
+                self._cond.notify_all()
+            self._running += 1
+        queue_wait.observe(time.perf_counter() - start, lane=lane)
+
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._running -= 1
+                self._cond.notify_all()
+
+
+scheduler = Scheduler(SCHEDULER_MAX_CONCURRENCY)
+
+
+@contextmanager
+def track_latency(endpoint: str, lane: str):
+    """
+    Records the wall time of a request under its endpoint and lane.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        request_latency.observe(
+            time.perf_counter() - start, endpoint=endpoint, lane=lane
+        )
@@ -1,7 +1,24 @@
-from pydantic import BaseModel, Field, ConfigDict, StringConstraints
-from typing import List, Union, Optional, Annotated
+from pydantic import (
+    BaseModel,
+    Field,
+    ConfigDict,
+    PrivateAttr,
+    StringConstraints,
+    model_serializer,
+    model_validator,
+)
+from typing import Any, List, Union, Optional, Annotated, Literal
 
-from .config import MAX_INPUT_LENGTH, MAX_INPUT_ITEMS
+from .chunking import MIN_WINDOW_SIZE
+from .config import (
+    MAX_INPUT_LENGTH,
+    MAX_INPUT_ITEMS,
+    MAX_MODELS_PER_REQUEST,
+    MAX_RERANK_BATCH_PAIRS,
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    CLUSTER_MAX_CLUSTERS,
+)
 
 # --- Security Types ---
 LimitedString = Annotated[str, StringConstraints(max_length=MAX_INPUT_LENGTH)]
@@ -13,9 +30,13 @@ class EmbeddingRequest(BaseModel):
     input: Union[
         LimitedString,
         # Limit list size to prevent memory exhaustion (DoS)
-        Annotated[List[LimitedString], Field(max_length=MAX_INPUT_ITEMS)]
+        Annotated[List[LimitedString], Field(max_length=MAX_INPUT_ITEMS)],
+    ]
+    model: Union[
+        str,
+        # Several models embed the same inputs; results are returned per model.
+        Annotated[List[str], Field(min_length=1, max_length=MAX_MODELS_PER_REQUEST)],
     ]
-    model: str
     user: Optional[str] = None
     input_type: Optional[str] = Field(
         None,
@@ -29,12 +50,41 @@ class EmbeddingRequest(BaseModel):
         False,
         description="Automatically apply prefixes based on input shape if true (fallback/compatibility).",
     )
+    long_input_strategy: Literal["truncate", "chunk_mean", "chunk_all"] = Field(
+        "truncate",
+        description="How inputs over the model's max_seq_length are handled: truncate the tail, "
+        "embed token windows and average them, or additionally return every window's vector.",
+    )
+    chunk_overlap: Optional[int] = Field(
+        None,
+        ge=0,
+        description="Token overlap between windows of chunked inputs; must be smaller "
+        "than the model's window. Defaults to CHUNK_OVERLAP, at most half the window.",
+    )
+    priority: Optional[Literal["interactive", "bulk"]] = Field(
+        None,
+        description="Scheduler lane. Defaults to interactive for queries and single inputs, bulk otherwise.",
+    )
+
+    @model_validator(mode="after")
+    def check_distinct_models(self):
+        if isinstance(self.model, list) and len(set(self.model)) != len(self.model):
+            raise ValueError("'model' must not list the same model twice.")
+        return self
+
+
+class EmbeddingChunk(BaseModel):
+    embedding: List[float]
+    # Token offsets of the window within the input text (prefix excluded).
+    start: int
+    end: int
 
 
 class EmbeddingData(BaseModel):
     object: str = "embedding"
     embedding: List[float]
     index: int
+    chunks: Optional[List[EmbeddingChunk]] = None
 
 
 class Usage(BaseModel):
@@ -47,10 +97,51 @@ class EmbeddingResponse(BaseModel):
     data: List[EmbeddingData]
     model: str
     usage: Usage
+    # The embeddings as one (n, dim) array, for binary responses (app/wire.py)
+    _vectors: Optional[Any] = PrivateAttr(None)
+
+
+class MultiModelEmbeddingResponse(BaseModel):
+    # Returned when `model` is a list: one EmbeddingResponse per model, in order
+    object: str = "list"
+    data: List[EmbeddingResponse]
+    model: List[str]
+    # Sum over models
+    usage: Usage
 
 
 # --- For /v1/rerank ---
-# Schemas for the rerank endpoint will be added in the corresponding step.
+class RerankCascade(BaseModel):
+    """
+    Embedding prefilter: only the top_m documents by bi-encoder cosine are
+    scored by the cross-encoder; the rest receive a calibrated fallback score.
+    Unset fields fall back to the reranker's `cascade` options in models.yml.
+    """
+
+    enabled: bool = True
+    embedding_model: Optional[str] = None
+    top_m: Optional[int] = Field(None, ge=1, le=MAX_INPUT_ITEMS)
+
+
+class RerankChunking(BaseModel):
+    """
+    Splits each document into overlapping token windows, scores every
+    (query, window) pair and aggregates the window scores per document.
+    """
+
+    window_size: int = Field(
+        CHUNK_SIZE, ge=MIN_WINDOW_SIZE, description="Document tokens per window."
+    )
+    overlap: int = Field(CHUNK_OVERLAP, ge=0)
+    aggregation: Literal["max", "mean"] = "max"
+
+    @model_validator(mode="after")
+    def check_overlap(self):
+        if self.overlap >= self.window_size:
+            raise ValueError("'overlap' must be smaller than 'window_size'.")
+        return self
+
+
 class RerankRequest(BaseModel):
     query: LimitedString
     # Limit list size to prevent memory exhaustion (DoS)
@@ -62,10 +153,16 @@ class RerankRequest(BaseModel):
         ),
     ]
     model: str
+    user: Optional[str] = None
     top_n: Optional[int] = Field(
         None, validation_alias="top_k", ge=0, le=MAX_INPUT_ITEMS
     )
     return_documents: Optional[bool] = None
+    cascade: Optional[RerankCascade] = None
+    chunking: Optional[RerankChunking] = None
+    priority: Optional[Literal["interactive", "bulk"]] = Field(
+        None, description="Scheduler lane. Defaults to interactive."
+    )
 
     model_config = ConfigDict(populate_by_name=True)
 
@@ -76,8 +173,306 @@ class RerankData(BaseModel):
     text: Optional[LimitedString] = None
 
 
+class CascadeInfo(BaseModel):
+    embedding_model: str
+    scored: int
+    skipped: int
+
+
 class RerankResponse(BaseModel):
     query: LimitedString
     data: List[RerankData]
     model: str
     usage: Optional[Usage] = None
+    cascade: Optional[CascadeInfo] = None
+
+    @model_serializer(mode="wrap")
+    def _omit_unused_cascade(self, handler):
+        # Responses only carry `cascade` when the prefilter ran
+        data = handler(self)
+        if data.get("cascade") is None:
+            data.pop("cascade", None)
+        return data
+
+
+# --- For /v1/rerank/batch ---
+
+
+class RerankGroup(BaseModel):
+    query: LimitedString
+    documents: Annotated[List[LimitedString], Field(max_length=MAX_INPUT_ITEMS)]
+    top_n: Optional[int] = Field(
+        None, validation_alias="top_k", ge=0, le=MAX_INPUT_ITEMS
+    )
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class BatchRerankRequest(BaseModel):
+    groups: Annotated[
+        List[RerankGroup], Field(min_length=1, max_length=MAX_INPUT_ITEMS)
+    ]
+    model: str
+    user: Optional[str] = None
+    return_documents: Optional[bool] = None
+    priority: Optional[Literal["interactive", "bulk"]] = Field(
+        None, description="Scheduler lane. Defaults to bulk."
+    )
+
+    @model_validator(mode="after")
+    def check_total_pairs(self):
+        total = sum(len(group.documents) for group in self.groups)
+        if total > MAX_RERANK_BATCH_PAIRS:
+            raise ValueError(
+                f"At most {MAX_RERANK_BATCH_PAIRS} documents can be reranked per request."
+            )
+        return self
+
+
+class BatchRerankResult(BaseModel):
+    index: int
+    query: LimitedString
+    data: List[RerankData]
+
+
+class BatchRerankResponse(BaseModel):
+    object: str = "list"
+    data: List[BatchRerankResult]
+    model: str
+    usage: Usage
+
+
+# --- For /v1/collections ---
+CollectionName = Annotated[str, StringConstraints(pattern=r"^[A-Za-z0-9_.-]{1,64}$")]
+
+
+class CollectionCreateRequest(BaseModel):
+    name: CollectionName
+    model: str = Field(
+        ..., description="Embedding model used for documents and queries."
+    )
+    index_type: Literal["flat", "ivf"] = "ivf"
+    nlist: Optional[int] = Field(None, ge=1, description="Number of IVF cells.")
+    nprobe: Optional[int] = Field(
+        None, ge=1, description="Default number of IVF cells scanned per query."
+    )
+
+
+class CollectionInfo(BaseModel):
+    object: str = "collection"
+    name: str
+    model: str
+    index_type: str
+    count: int
+    trained: bool
+    nlist: Optional[int] = None
+    nprobe: Optional[int] = None
+
+
+class CollectionAddRequest(BaseModel):
+    # Limit list size to prevent memory exhaustion (DoS)
+    documents: Annotated[
+        List[LimitedString],
+        Field(min_length=1, max_length=MAX_INPUT_ITEMS),
+    ]
+    input_type: Optional[str] = "document"
+
+
+class CollectionAddResponse(BaseModel):
+    object: str = "list"
+    ids: List[int]
+    count: int
+    usage: Usage
+
+
+class CollectionSearchRequest(BaseModel):
+    query: LimitedString
+    top_k: int = Field(10, ge=1, le=MAX_INPUT_ITEMS)
+    nprobe: Optional[int] = Field(
+        None, ge=1, description="Overrides the collection's nprobe for this query."
+    )
+    input_type: Optional[str] = "query"
+    return_documents: bool = True
+
+
+class CollectionSearchData(BaseModel):
+    document: int
+    score: float
+    text: Optional[LimitedString] = None
+
+
+class CollectionSearchResponse(BaseModel):
+    query: LimitedString
+    data: List[CollectionSearchData]
+    model: str
+    usage: Usage
+
+
+# --- For /v1/retrieve_rerank ---
+class RetrieveRerankRequest(BaseModel):
+    query: LimitedString
+    # Exactly one candidate source: an inline document list or a stored collection.
+    documents: Optional[
+        Annotated[List[LimitedString], Field(max_length=MAX_INPUT_ITEMS)]
+    ] = None
+    collection: Optional[str] = None
+    embedding_model: Optional[str] = Field(
+        None,
+        description="Embedding model for first-stage recall. Defaults to the collection's model, or the first configured embedding model.",
+    )
+    model: str = Field(..., description="Cross-encoder used for the second stage.")
+    top_m: int = Field(
+        50,
+        ge=1,
+        le=MAX_INPUT_ITEMS,
+        description="Number of first-stage candidates passed to the cross-encoder.",
+    )
+    top_n: Optional[int] = Field(
+        None, validation_alias="top_k", ge=0, le=MAX_INPUT_ITEMS
+    )
+    nprobe: Optional[int] = Field(None, ge=1)
+    return_documents: Optional[bool] = None
+    user: Optional[str] = None
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    @model_validator(mode="after")
+    def check_candidate_source(self):
+        if (self.documents is None) == (self.collection is None):
+            raise ValueError("Exactly one of 'documents' or 'collection' is required.")
+        return self
+
+
+class RetrieveRerankResponse(RerankResponse):
+    embedding_model: str
+    candidates: int = Field(
+        ..., description="Number of first-stage candidates scored by the cross-encoder."
+    )
+
+
+# --- For /v1/similarity ---
+
+
+class SimilarityRequest(BaseModel):
+    # Limit list sizes to prevent memory exhaustion (DoS)
+    input: Annotated[
+        List[LimitedString], Field(min_length=1, max_length=MAX_INPUT_ITEMS)
+    ]
+    targets: Optional[
+        Annotated[List[LimitedString], Field(min_length=1, max_length=MAX_INPUT_ITEMS)]
+    ] = Field(
+        None,
+        description="Texts to compare `input` against. Defaults to `input` itself.",
+    )
+    model: str
+    user: Optional[str] = None
+    input_type: Optional[str] = Field(
+        "sts", description="Ruri-v3 prefix applied to both lists."
+    )
+    top_k: Optional[int] = Field(
+        None,
+        ge=1,
+        le=MAX_INPUT_ITEMS,
+        description="Return only the k best targets per row.",
+    )
+    exclude_self: bool = Field(
+        False,
+        description="With top_k and no targets, skip each input's match with itself.",
+    )
+    encoding_format: Literal["float", "base64"] = Field(
+        "float",
+        description="base64 returns little-endian float32 scores (and int32 indices), row-major.",
+    )
+    priority: Optional[Literal["interactive", "bulk"]] = None
+
+
+class SimilarityResponse(BaseModel):
+    object: str = "similarity"
+    model: str
+    # Rows x columns of `scores` (columns = targets, or top_k)
+    shape: List[int]
+    scores: Union[List[List[float]], str]
+    indices: Optional[Union[List[List[int]], str]] = None
+    usage: Usage
+
+
+# --- For /v1/cluster ---
+
+
+class ClusterOptions(BaseModel):
+    # Also sent as query parameters by /v1/cluster/stream
+    model: str
+    n_clusters: int = Field(8, ge=1, le=CLUSTER_MAX_CLUSTERS)
+    method: Literal["auto", "kmeans", "agglomerative"] = Field(
+        "auto",
+        description="auto: agglomerative for small inputs, mini-batch k-means otherwise.",
+    )
+    input_type: Optional[str] = Field(
+        "clustering", description="Ruri-v3 prefix applied to every input."
+    )
+    return_centroids: bool = False
+    seed: int = Field(0, ge=0)
+    user: Optional[str] = None
+    priority: Optional[Literal["interactive", "bulk"]] = None
+
+
+class ClusterRequest(ClusterOptions):
+    # Limit list size to prevent memory exhaustion (DoS)
+    input: Annotated[
+        List[LimitedString], Field(min_length=1, max_length=MAX_INPUT_ITEMS)
+    ]
+
+
+class ClusterResponse(BaseModel):
+    object: str = "cluster"
+    model: str
+    method: str
+    # Cluster index per input; clusters are numbered by first appearance
+    labels: List[int]
+    sizes: List[int]
+    centroids: Optional[List[List[float]]] = None
+    usage: Usage
+
+
+# --- For /v1/tokenize ---
+
+
+class TokenizeRequest(BaseModel):
+    input: Union[
+        LimitedString,
+        # Limit list size to prevent memory exhaustion (DoS)
+        Annotated[List[LimitedString], Field(max_length=MAX_INPUT_ITEMS)],
+    ]
+    model: str = Field(
+        ..., description="Embedding or rerank model whose tokenizer is used."
+    )
+    query: Optional[LimitedString] = Field(
+        None,
+        description="Rerank models only: inputs are counted as (query, document) pairs.",
+    )
+    input_type: Optional[str] = Field(
+        None, description="Embedding models: prefix type, as in /v1/embeddings."
+    )
+    apply_ruri_prefix: bool = False
+    return_offsets: bool = Field(
+        False,
+        description="Return the character offset in each truncated input where the model input ends.",
+    )
+
+
+class TokenizeData(BaseModel):
+    object: str = "tokens"
+    index: int
+    # Tokens counted for the input in the usage of /v1/embeddings or /v1/rerank
+    tokens: int
+    truncated: bool
+    truncation_offset: Optional[int] = None
+
+
+class TokenizeResponse(BaseModel):
+    object: str = "list"
+    data: List[TokenizeData]
+    model: str
+    # The model's input limit in tokens, special tokens included
+    max_tokens: int
+    usage: Usage
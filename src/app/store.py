@@ -0,0 +1,170 @@
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .config import (
+    ANN_IVF_MIN_TRAIN_SIZE,
+    ANN_IVF_NLIST,
+    ANN_IVF_NPROBE,
+    MAX_COLLECTIONS,
+)
+from .index import FlatIndex, IVFIndex
+
+# --- Embedding Collections ---
+# Collections live in process memory next to the loaded models, so a search
+# request embeds its query and scans the index without leaving the process.
+
+
+class Collection:
+    """
+    A named set of documents embedded with one model and held in a vector index.
+    The index is created lazily because its dimension is only known once the
+    first vectors arrive.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model: str,
+        index_type: str = "ivf",
+        nlist: Optional[int] = None,
+        nprobe: Optional[int] = None,
+    ):
+        self.name = name
+        self.model = model
+        self.index_type = index_type
+        self.nlist = nlist or ANN_IVF_NLIST
+        self.nprobe = nprobe or ANN_IVF_NPROBE
+        self.documents: List[str] = []
+        self.index = None
+        self._lock = threading.RLock()
+        self._training = False
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _create_index(self, dim: int):
+        if self.index_type == "flat":
+            return FlatIndex(dim)
+        return IVFIndex(
+            dim, self.nlist, self.nprobe, ANN_IVF_MIN_TRAIN_SIZE, auto_train=False
+        )
+
+    def add(self, vectors: np.ndarray, documents: List[str]) -> List[int]:
+        """
+        Appends documents and their vectors. Returns the ids assigned to them.
+        """
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            if self.index is None:
+                self.index = self._create_index(vectors.shape[1])
+            elif vectors.shape[1] != self.index.dim:
+                raise ValueError(
+                    f"Expected vectors of dimension {self.index.dim}, got {vectors.shape[1]}."
+                )
+
+            start = len(self.documents)
+            ids = np.arange(start, start + len(documents), dtype=np.int64)
+            self.index.add(vectors, ids)
+            self.documents.extend(documents)
+            training = self._start_training()
+
+        if training is not None:
+            self._train(training)
+        return ids.tolist()
+
+    def _start_training(self) -> Optional[np.ndarray]:
+        # Called with the lock held; at most one training runs at a time.
+        if self._training or not isinstance(self.index, IVFIndex):
+            return None
+        training = self.index.training_vectors()
+        self._training = training is not None
+        return training
+
+    def _train(self, vectors: np.ndarray):
+        """
+        Runs k-means without the lock, so adds and searches carry on against
+        the current index meanwhile, then swaps the new quantizer in.
+        """
+        try:
+            centroids = self.index.fit(vectors)
+            with self._lock:
+                self.index.set_centroids(centroids)
+        finally:
+            with self._lock:
+                self._training = False
+
+    def search(
+        self, query_vector: np.ndarray, k: int, nprobe: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Returns up to k (document id, cosine score) pairs, best first.
+        """
+        with self._lock:
+            if self.index is None or len(self.index) == 0:
+                return []
+            if isinstance(self.index, IVFIndex):
+                scores, ids = self.index.search(query_vector, k, nprobe=nprobe)
+            else:
+                scores, ids = self.index.search(query_vector, k)
+
+        return [
+            (int(doc_id), float(score))
+            for doc_id, score in zip(ids[0], scores[0])
+            if doc_id >= 0
+        ]
+
+    def info(self) -> dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "model": self.model,
+                "index_type": self.index_type,
+                "count": len(self.documents),
+                # An IVF collection is untrained until its index has trained;
+                # flat collections need no training
+                "trained": bool(
+                    getattr(self.index, "is_trained", self.index_type == "flat")
+                ),
+                "nlist": self.nlist if self.index_type == "ivf" else None,
+                "nprobe": self.nprobe if self.index_type == "ivf" else None,
+            }
+
+
+class CollectionStore:
+    """
+    Thread-safe registry of collections.
+    """
+
+    def __init__(self, max_collections: int = MAX_COLLECTIONS):
+        self.max_collections = max_collections
+        self._collections: Dict[str, Collection] = {}
+        self._lock = threading.Lock()
+
+    def create(self, name: str, model: str, **kwargs) -> Collection:
+        with self._lock:
+            if name in self._collections:
+                raise ValueError(f"Collection '{name}' already exists.")
+            if len(self._collections) >= self.max_collections:
+                raise ValueError(
+                    f"Cannot create more than {self.max_collections} collections."
+                )
+            collection = Collection(name, model, **kwargs)
+            self._collections[name] = collection
+            return collection
+
+    def get(self, name: str) -> Optional[Collection]:
+        with self._lock:
+            return self._collections.get(name)
+
+    def delete(self, name: str) -> bool:
+        with self._lock:
+            return self._collections.pop(name, None) is not None
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return list(self._collections)
+
+
+collection_store = CollectionStore()
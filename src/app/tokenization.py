@@ -0,0 +1,225 @@
+import hashlib
+import weakref
+from typing import Iterator, List, Optional
+
+import numpy as np
+
+from .cache import LRUCache, text_key
+from .config import TOKEN_CACHE_MAX_TOKENS
+
+# --- Cached Tokenization ---
+# Rerank candidate pools and prefixed document chunks repeat heavily across
+# requests. Token ids are cached per (tokenizer, special tokens, text) as
+# compact int32 arrays rather than Python lists of ints. Tokenizers are keyed
+# by content, so models sharing a tokenizer (ruri-v3-30m and ruri-v3-310m)
+# share cache entries.
+
+token_cache = LRUCache("tokens", TOKEN_CACHE_MAX_TOKENS, weigher=len)
+
+_EMPTY = np.empty(0, dtype=np.int32)
+
+# A tokenizer call holds about 100 bytes per token (ids, offsets, masks) until
+# it returns, so calls are bounded by characters as well as by items: 256
+# inputs of 64K characters in one call peak at about 1.7GB.
+MAX_BATCH_ITEMS = 256
+MAX_BATCH_CHARS = 1024 * 1024
+
+
+_fingerprints = weakref.WeakKeyDictionary()
+
+
+def tokenizer_fingerprint(tokenizer):
+    """
+    Identifies a tokenizer by its serialized vocabulary and normalization
+    rules, so equal tokenizers loaded by different models compare equal.
+    Tokenizers that cannot be serialized are identified by the object itself.
+    """
+    try:
+        return _fingerprints[tokenizer]
+    except (KeyError, TypeError):
+        pass
+
+    key = tokenizer
+    try:
+        serialized = tokenizer.backend_tokenizer.to_str()
+    except Exception:
+        serialized = None
+    if isinstance(serialized, str):
+        digest = hashlib.blake2b(serialized.encode(), digest_size=16).hexdigest()
+        key = (type(tokenizer).__name__, digest)
+    try:
+        _fingerprints[tokenizer] = key
+    except TypeError:
+        pass
+    return key
+
+
+def _batches(items: List, size_of) -> Iterator[List]:
+    """
+    Splits items into batches of at most MAX_BATCH_ITEMS items and
+    MAX_BATCH_CHARS characters (a longer item forms a batch of its own).
+    """
+    batch, chars = [], 0
+    for item in items:
+        size = size_of(item)
+        if batch and (len(batch) == MAX_BATCH_ITEMS or chars + size > MAX_BATCH_CHARS):
+            yield batch
+            batch, chars = [], 0
+        batch.append(item)
+        chars += size
+    if batch:
+        yield batch
+
+
+def tokenize(
+    tokenizer, texts: List[str], add_special_tokens: bool = False
+) -> List[np.ndarray]:
+    """
+    Batch tokenization through the token cache. Only cache misses reach the
+    tokenizer, in a single batched call.
+    """
+    tok_key = tokenizer_fingerprint(tokenizer)
+    keys = [(tok_key, add_special_tokens, text_key(text)) for text in texts]
+    results = [token_cache.get(key) for key in keys]
+
+    # Repeated texts are tokenized once and shared by every position.
+    missing = {}
+    for i, ids in enumerate(results):
+        if ids is None:
+            missing.setdefault(keys[i], []).append(i)
+    missing = list(missing.values())
+
+    # Process in batches to avoid OOM on huge payloads
+    for batch in _batches(missing, lambda positions: len(texts[positions[0]])):
+        encodings = tokenizer(
+            [texts[positions[0]] for positions in batch],
+            add_special_tokens=add_special_tokens,
+        )
+        for positions, ids in zip(batch, encodings["input_ids"]):
+            ids = np.asarray(ids, dtype=np.int32)
+            for i in positions:
+                results[i] = ids
+            token_cache.put(keys[positions[0]], ids)
+
+    return [ids if ids is not None else _EMPTY for ids in results]
+
+
+def tokenize_pairs(tokenizer, query: str, documents: List[str]) -> List[np.ndarray]:
+    """
+    Cached tokenization of (query, document) pairs with special tokens,
+    as a cross-encoder sees them.
+    """
+    tok_key = tokenizer_fingerprint(tokenizer)
+    query_key = text_key(query)
+    keys = [(tok_key, "pair", query_key, text_key(doc)) for doc in documents]
+    results = [token_cache.get(key) for key in keys]
+    missing = [i for i, ids in enumerate(results) if ids is None]
+
+    for batch in _batches(missing, lambda i: len(query) + len(documents[i])):
+        encodings = tokenizer(
+            [query] * len(batch),
+            [documents[i] for i in batch],
+            add_special_tokens=True,
+        )
+        for i, ids in zip(batch, encodings["input_ids"]):
+            ids = np.asarray(ids, dtype=np.int32)
+            results[i] = ids
+            token_cache.put(keys[i], ids)
+
+    return [ids if ids is not None else _EMPTY for ids in results]
+
+
+def truncation_offsets(tokenizer, texts: List[str], limit: int) -> List[Optional[int]]:
+    """
+    Character offset in each text where its first `limit` tokens (special
+    tokens excluded) end. None for slow tokenizers, which have no offsets.
+    """
+    if not getattr(tokenizer, "is_fast", False):
+        return [None] * len(texts)
+    offsets = []
+    for batch in _batches(texts, len):
+        encodings = tokenizer(
+            batch,
+            add_special_tokens=False,
+            truncation=True,
+            max_length=limit,
+            return_offsets_mapping=True,
+        )
+        for mapping in encodings["offset_mapping"]:
+            offsets.append(mapping[-1][1] if mapping else 0)
+    return offsets
+
+
+def pair_truncation_offsets(
+    tokenizer, query: str, documents: List[str], max_length: int
+) -> List[Optional[int]]:
+    """
+    Character offset in each document where the cross-encoder input ends once
+    the (query, document) pair is truncated to `max_length` tokens.
+    """
+    if not getattr(tokenizer, "is_fast", False):
+        return [None] * len(documents)
+    offsets = []
+    for batch in _batches(documents, lambda doc: len(query) + len(doc)):
+        encodings = tokenizer(
+            [query] * len(batch),
+            batch,
+            truncation="longest_first",
+            max_length=max_length,
+            return_offsets_mapping=True,
+        )
+        for j, mapping in enumerate(encodings["offset_mapping"]):
+            ends = [
+                end
+                for (_, end), sequence in zip(mapping, encodings.sequence_ids(j))
+                if sequence == 1
+            ]
+            offsets.append(ends[-1] if ends else 0)
+    return offsets
+
+
+def install_cached_tokenize(model):
+    """
+    Routes SentenceTransformer.tokenize, the model input stage of encode(),
+    through the token cache. Batches the cache cannot serve exactly (pairs,
+    dict inputs, sequences over max_seq_length) use the original method.
+    """
+    original_tokenize = model.tokenize
+    first_module = model._first_module()
+    tokenizer = getattr(first_module, "tokenizer", None)
+    max_seq_length = getattr(first_module, "max_seq_length", None)
+    if tokenizer is None or not hasattr(tokenizer, "pad") or max_seq_length is None:
+        return model
+
+    # pad() receives pre-tokenized ids here, so the "use __call__" advice does not apply.
+    if hasattr(tokenizer, "deprecation_warnings"):
+        tokenizer.deprecation_warnings["Asking-to-pad-a-fast-tokenizer"] = True
+
+    def cached_tokenize(texts, **kwargs):
+        if kwargs or not texts or not isinstance(texts[0], str):
+            return original_tokenize(texts, **kwargs)
+
+        # Mirror the preprocessing of sentence_transformers.models.Transformer.
+        texts = [str(text).strip() for text in texts]
+        if getattr(first_module, "do_lower_case", False):
+            texts = [text.lower() for text in texts]
+
+        ids = tokenize(tokenizer, texts, add_special_tokens=True)
+        if any(len(x) > max_seq_length for x in ids):
+            return original_tokenize(texts)
+
+        features = tokenizer.pad(
+            {"input_ids": [x.tolist() for x in ids]},
+            padding=True,
+            return_tensors="pt",
+        )
+        features = dict(features)
+        if "token_type_ids" in getattr(tokenizer, "model_input_names", ()):
+            features.setdefault(
+                "token_type_ids",
+                features["input_ids"].new_zeros(features["input_ids"].shape),
+            )
+        return features
+
+    model.tokenize = cached_tokenize
+    return model
@@ -0,0 +1,249 @@
+import importlib
+import json
+from typing import List, Optional
+
+import numpy as np
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+
+from .schemas import EmbeddingResponse, MultiModelEmbeddingResponse
+
+# --- Binary Wire Formats ---
+# Request and response bodies may be MessagePack or Arrow IPC instead of JSON,
+# negotiated through Content-Type and Accept. JSON stays the default.
+#
+# Requests: a MessagePack body is the same mapping as the JSON body. An Arrow
+# stream carries list fields (e.g. `input`, `documents`) as columns and every
+# other field as a JSON-encoded value in the schema metadata.
+#
+# Responses: embeddings come back as one contiguous little-endian float32
+# tensor rather than per-row lists. MessagePack encodes it as
+# {"dtype", "shape", "data": bytes}; Arrow as a fixed-size list column. Other
+# responses are the JSON document as MessagePack, or their `data` rows as an
+# Arrow table with the remaining fields in the metadata.
+#
+# msgpack and pyarrow are optional dependencies, imported on first use.
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+
+_MODULES = {MSGPACK: "msgpack", ARROW: "pyarrow"}
+_ALIASES = {"application/x-msgpack": MSGPACK}
+
+
+def _media_type(value: Optional[str]) -> str:
+    media = (value or "").split(";", 1)[0].strip().lower()
+    return _ALIASES.get(media, media)
+
+
+def _require(media_type: str, status_code: int):
+    module = _MODULES[media_type]
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        raise HTTPException(
+            status_code=status_code,
+            detail=f"'{media_type}' requires the optional '{module}' package.",
+        )
+
+
+# --- Requests ---
+
+
+def _decode_arrow(pa, body: bytes) -> dict:
+    table = pa.ipc.open_stream(body).read_all()
+    decoded = {
+        key.decode(): json.loads(value)
+        for key, value in (table.schema.metadata or {}).items()
+    }
+    for name in table.column_names:
+        decoded[name] = table.column(name).to_pylist()
+    return decoded
+
+
+def decode_body(content_type: Optional[str], body: bytes):
+    """
+    The mapping a JSON, MessagePack or Arrow request body holds, or None for
+    other content types. Raises HTTPException (415) if the format's package
+    is missing, and the decoder's own error for a malformed body.
+    """
+    media_type = _media_type(content_type)
+    if media_type in _MODULES:
+        module = _require(media_type, 415)
+        if media_type == MSGPACK:
+            return module.unpackb(body)
+        return _decode_arrow(module, body)
+    if "json" in media_type:
+        return json.loads(body)
+    return None
+
+
+class DecodedRequest(Request):
+    """
+    Presents a MessagePack or Arrow body to FastAPI as already-parsed JSON,
+    so the endpoint's pydantic model validates it as usual.
+    """
+
+    def __init__(self, request: Request, media_type: str):
+        scope = dict(request.scope)
+        scope["headers"] = [
+            (key, value) for key, value in scope["headers"] if key != b"content-type"
+        ] + [(b"content-type", JSON.encode())]
+        super().__init__(scope, request.receive)
+        self.wire_media_type = media_type
+
+    async def json(self):
+        if not hasattr(self, "_decoded"):
+            _require(self.wire_media_type, 415)
+            body = await self.body()
+            try:
+                self._decoded = decode_body(self.wire_media_type, body)
+            except Exception as e:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid '{self.wire_media_type}' body: {e}",
+                )
+        return self._decoded
+
+
+class NegotiatedRoute(APIRoute):
+    """
+    Route class that accepts MessagePack and Arrow request bodies.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request):
+            media_type = _media_type(request.headers.get("content-type"))
+            if media_type in _MODULES:
+                request = DecodedRequest(request, media_type)
+            return await handler(request)
+
+        return route_handler
+
+
+# --- Responses ---
+
+
+def negotiate(request: Request) -> str:
+    """
+    Dependency returning the response media type preferred by the Accept
+    header. Anything other than MessagePack or Arrow gets JSON.
+    """
+    best, best_q = JSON, 0.0
+    for part in request.headers.get("accept", "").split(","):
+        media, *params = part.split(";")
+        media = _media_type(media)
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media in (JSON, MSGPACK, ARROW) and q > best_q:
+            best, best_q = media, q
+    if best in _MODULES:
+        _require(best, 406)
+    return best
+
+
+def _matrix(response: EmbeddingResponse) -> np.ndarray:
+    vectors = response._vectors
+    if vectors is None:
+        vectors = [item.embedding for item in response.data]
+    return np.ascontiguousarray(vectors, dtype="<f4")
+
+
+def _chunks(response: EmbeddingResponse) -> Optional[List]:
+    if not any(item.chunks for item in response.data):
+        return None
+    return [
+        [chunk.model_dump() for chunk in item.chunks] if item.chunks else None
+        for item in response.data
+    ]
+
+
+def _msgpack_embeddings(response: EmbeddingResponse) -> dict:
+    body = response.model_dump(exclude={"data"}, exclude_none=True)
+    matrix = _matrix(response)
+    body["embeddings"] = {
+        "dtype": "float32",
+        "shape": list(matrix.shape),
+        "data": matrix.tobytes(),
+    }
+    chunks = _chunks(response)
+    if chunks is not None:
+        body["chunks"] = chunks
+    return body
+
+
+def _arrow_tensor(pa, matrix: np.ndarray):
+    dim = matrix.shape[1] if matrix.ndim == 2 else 0
+    return pa.FixedSizeListArray.from_arrays(pa.array(matrix.reshape(-1)), dim)
+
+
+def _arrow_metadata(fields: dict) -> dict:
+    return {key: json.dumps(value) for key, value in fields.items()}
+
+
+def _arrow_bytes(pa, table) -> bytes:
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _arrow_table(pa, response: BaseModel, exclude_none: bool):
+    if isinstance(response, EmbeddingResponse):
+        columns = {"embedding": _arrow_tensor(pa, _matrix(response))}
+        chunks = _chunks(response)
+        if chunks is not None:
+            columns["chunks"] = pa.array(chunks)
+        fields = response.model_dump(exclude={"data"}, exclude_none=True)
+        return pa.table(columns, metadata=_arrow_metadata(fields))
+
+    if isinstance(response, MultiModelEmbeddingResponse):
+        # One tensor column per model, named after it.
+        columns = {}
+        fields = response.model_dump(exclude={"data"}, exclude_none=True)
+        for item in response.data:
+            columns[item.model] = _arrow_tensor(pa, _matrix(item))
+            chunks = _chunks(item)
+            if chunks is not None:
+                columns[f"{item.model}:chunks"] = pa.array(chunks)
+            fields[f"usage:{item.model}"] = item.usage.model_dump()
+        return pa.table(columns, metadata=_arrow_metadata(fields))
+
+    rows = [row.model_dump() for row in response.data]
+    fields = response.model_dump(exclude={"data"}, exclude_none=exclude_none)
+    return pa.Table.from_pylist(rows, metadata=_arrow_metadata(fields))
+
+
+def render(response: BaseModel, media_type: str, exclude_none: bool = False):
+    """
+    Returns `response` as is for JSON (FastAPI serializes it with the route's
+    response_model), or encoded in the negotiated binary format.
+    """
+    if media_type == MSGPACK:
+        msgpack = _require(MSGPACK, 406)
+        if isinstance(response, EmbeddingResponse):
+            body = _msgpack_embeddings(response)
+        elif isinstance(response, MultiModelEmbeddingResponse):
+            body = response.model_dump(exclude={"data"}, exclude_none=True)
+            body["data"] = [_msgpack_embeddings(item) for item in response.data]
+        else:
+            body = response.model_dump(exclude_none=exclude_none)
+        return Response(content=msgpack.packb(body), media_type=MSGPACK)
+
+    if media_type == ARROW:
+        pa = _require(ARROW, 406)
+        table = _arrow_table(pa, response, exclude_none)
+        return Response(content=_arrow_bytes(pa, table), media_type=ARROW)
+
+    return response
@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+# Ensure src is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../src")))
+
+from app.index import FlatIndex, IVFIndex, normalize
+
+
+def make_dataset(num_vectors, dim, num_clusters=100, seed=0):
+    """
+    Clustered synthetic data: real embedding collections are far from uniform,
+    and IVF recall on uniform noise is not representative.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(num_clusters, dim))
+    labels = rng.integers(num_clusters, size=num_vectors)
+    data = centers[labels] + 0.5 * rng.normal(size=(num_vectors, dim))
+    return normalize(data)
+
+
+def recall_at_k(exact_ids, approx_ids):
+    hits = [len(set(e) & set(a)) for e, a in zip(exact_ids, approx_ids)]
+    return sum(hits) / exact_ids.size
+
+
+def benchmark_ann(num_vectors=200_000, dim=256, num_queries=200, k=10, nlist=256):
+    print(
+        f"Running ANN Benchmark ({num_vectors} x {dim}, {num_queries} queries, k={k})"
+    )
+
+    data = make_dataset(num_vectors, dim)
+    queries = make_dataset(num_queries, dim, seed=1)
+    ids = np.arange(num_vectors)
+
+    flat = FlatIndex(dim)
+    flat.add(data, ids)
+
+    start_time = time.perf_counter()
+    ivf = IVFIndex(dim, nlist=nlist, nprobe=1, min_train_size=num_vectors)
+    ivf.add(data, ids)
+    build_time = time.perf_counter() - start_time
+    print(f"IVF build (train + insert): {build_time:.2f} s, {len(ivf.centroids)} cells")
+
+    print(
+        f"{'Method':<12} | {'nprobe':<6} | {'Recall@k':<8} | {'ms/query':<8} | {'Speedup':<8}"
+    )
+    print("-" * 56)
+
+    start_time = time.perf_counter()
+    for q in queries:
+        flat.search(q, k)
+    exact_ms = (time.perf_counter() - start_time) / num_queries * 1000
+    _, exact_ids = flat.search(queries, k)
+    print(f"{'Exact':<12} | {'-':<6} | {1.0:<8.3f} | {exact_ms:<8.3f} | {'1.00x':<8}")
+
+    for nprobe in (1, 2, 4, 8, 16, 32, 64):
+        if nprobe > len(ivf.centroids):
+            break
+        start_time = time.perf_counter()
+        approx = [ivf.search(q, k, nprobe=nprobe)[1][0] for q in queries]
+        ivf_ms = (time.perf_counter() - start_time) / num_queries * 1000
+        recall = recall_at_k(exact_ids, np.stack(approx))
+        speedup = exact_ms / ivf_ms if ivf_ms > 0 else 0.0
+        print(
+            f"{'IVF-flat':<12} | {nprobe:<6} | {recall:<8.3f} | {ivf_ms:<8.3f} | {speedup:.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    benchmark_ann()
@@ -0,0 +1,185 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Ensure src is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../src")))
+sys.path.append(os.path.dirname(__file__))
+
+from sentence_transformers import CrossEncoder, SentenceTransformer
+
+from app.precision import BF16, FP32, apply_dtype, bf16_supported
+from tiny_model import build_tiny_model, random_texts
+
+# --- bf16 Parity and Throughput ---
+# Loads each model twice, in fp32 and in bf16, and compares them on the same
+# texts: embedding cosine and nearest-neighbour recall, reranker score drift
+# and rank correlation, then texts/sec. Exits with status 1 when bf16 falls
+# below the parity thresholds, so it can gate enabling `dtype: bf16` for a
+# model; rank correlation is only checked for a real reranker. Without native
+# bf16 the bf16 timings are emulated and meaningless.
+
+
+def best_of(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def _ranks(scores):
+    return np.argsort(np.argsort(scores, axis=-1), axis=-1).astype(np.float64)
+
+
+def spearman(a, b):
+    """
+    Spearman rank correlation per row of two (groups, documents) arrays.
+    """
+    ra, rb = _ranks(a), _ranks(b)
+    ra -= ra.mean(axis=-1, keepdims=True)
+    rb -= rb.mean(axis=-1, keepdims=True)
+    return (ra * rb).sum(axis=-1) / np.sqrt((ra**2).sum(axis=-1) * (rb**2).sum(axis=-1))
+
+
+def neighbour_recall(a, b, k):
+    """
+    Mean overlap of each text's k nearest neighbours under `a` and `b`.
+    """
+    k = min(k, len(a) - 1)
+    top_a = np.argsort(-(a @ a.T), axis=1)[:, 1 : k + 1]
+    top_b = np.argsort(-(b @ b.T), axis=1)[:, 1 : k + 1]
+    return float(np.mean([len(set(x) & set(y)) / k for x, y in zip(top_a, top_b)]))
+
+
+def compare_embedding(model_path, texts, batch_size, k, repeats):
+    models = {}
+    for dtype in (FP32, BF16):
+        models[dtype] = SentenceTransformer(model_path, device="cpu")
+        apply_dtype(models[dtype], "embedding", dtype, "cpu", require_support=False)
+
+    results = {}
+    for dtype, model in models.items():
+        results[dtype] = best_of(
+            lambda model=model: model.encode(
+                texts, batch_size=batch_size, normalize_embeddings=True
+            ),
+            repeats,
+        )
+    (fp32_time, fp32), (bf16_time, bf16) = results[FP32], results[BF16]
+    cosine = np.sum(fp32 * bf16, axis=1)
+    return {
+        "cosine_min": float(cosine.min()),
+        "cosine_mean": float(cosine.mean()),
+        "recall": neighbour_recall(fp32, bf16, k),
+        "fp32_per_sec": len(texts) / fp32_time,
+        "bf16_per_sec": len(texts) / bf16_time,
+    }
+
+
+def compare_rerank(model_path, queries, documents, batch_size, repeats):
+    models = {}
+    for dtype in (FP32, BF16):
+        models[dtype] = CrossEncoder(model_path, device="cpu")
+        apply_dtype(models[dtype], "rerank", dtype, "cpu", require_support=False)
+
+    pairs = [(q, d) for q in queries for d in documents]
+    results = {}
+    for dtype, model in models.items():
+        results[dtype] = best_of(
+            lambda model=model: model.predict(pairs, batch_size=batch_size), repeats
+        )
+    (fp32_time, fp32), (bf16_time, bf16) = results[FP32], results[BF16]
+    shape = (len(queries), len(documents))
+    fp32, bf16 = fp32.reshape(shape), bf16.reshape(shape)
+    return {
+        "max_diff": float(np.max(np.abs(fp32 - bf16))),
+        "spearman_min": float(spearman(fp32, bf16).min()),
+        "top1_agreement": float(np.mean(fp32.argmax(1) == bf16.argmax(1))),
+        "fp32_per_sec": len(pairs) / fp32_time,
+        "bf16_per_sec": len(pairs) / bf16_time,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Accuracy parity and throughput of bf16 against fp32."
+    )
+    parser.add_argument("model", nargs="?", help="Embedding model (default: tiny).")
+    parser.add_argument("--rerank-model", help="Cross-encoder (default: tiny).")
+    parser.add_argument("--num-texts", type=int, default=512)
+    parser.add_argument("--max-chars", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--min-recall", type=float, default=0.9)
+    parser.add_argument("--min-spearman", type=float, default=0.9)
+    args = parser.parse_args(argv)
+
+    bench_dir = os.path.join(tempfile.gettempdir(), "embedding_jp_api_bench_models")
+    embedding = args.model or build_tiny_model(
+        os.path.join(bench_dir, "dtype-embedding"),
+        hidden_size=256,
+        num_layers=4,
+        max_seq_length=512,
+    )
+    rerank = args.rerank_model or build_tiny_model(
+        os.path.join(bench_dir, "dtype-rerank"),
+        hidden_size=256,
+        num_layers=4,
+        max_seq_length=512,
+        kind="rerank",
+    )
+    if not bf16_supported("cpu"):
+        print("warning: this CPU has no native bf16; bf16 timings are emulated.")
+
+    texts = random_texts(args.num_texts, 16, args.max_chars)
+    emb = compare_embedding(embedding, texts, args.batch_size, args.k, args.repeats)
+    print(f"Embedding ({embedding}, {len(texts)} texts)")
+    print(
+        f"  cosine fp32/bf16:  min {emb['cosine_min']:.4f}  mean {emb['cosine_mean']:.4f}"
+    )
+    print(f"  recall@{args.k}:         {emb['recall']:.3f}")
+    print(
+        f"  texts/sec:         fp32 {emb['fp32_per_sec']:8.1f}  "
+        f"bf16 {emb['bf16_per_sec']:8.1f}  "
+        f"speedup {emb['bf16_per_sec'] / emb['fp32_per_sec']:4.2f}x"
+    )
+
+    queries = random_texts(8, 4, 32, seed=1)
+    documents = texts[: max(1, args.num_texts // 8)]
+    rr = compare_rerank(rerank, queries, documents, args.batch_size, args.repeats)
+    print(f"Rerank ({rerank}, {len(queries)} x {len(documents)} pairs)")
+    print(f"  max |score diff|:  {rr['max_diff']:.2e}")
+    print(f"  spearman (min):    {rr['spearman_min']:.4f}")
+    print(f"  top-1 agreement:   {rr['top1_agreement']:.3f}")
+    print(
+        f"  pairs/sec:         fp32 {rr['fp32_per_sec']:8.1f}  "
+        f"bf16 {rr['bf16_per_sec']:8.1f}  "
+        f"speedup {rr['bf16_per_sec'] / rr['fp32_per_sec']:4.2f}x"
+    )
+
+    failures = []
+    if emb["cosine_min"] < args.min_cosine:
+        failures.append(f"embedding cosine {emb['cosine_min']:.4f} < {args.min_cosine}")
+    if emb["recall"] < args.min_recall:
+        failures.append(f"recall@{args.k} {emb['recall']:.3f} < {args.min_recall}")
+    # The tiny reranker's random scores span ~1e-3, below bf16 resolution, so
+    # its ordering is noise: only a real reranker is held to the threshold.
+    if args.rerank_model and rr["spearman_min"] < args.min_spearman:
+        failures.append(
+            f"rerank spearman {rr['spearman_min']:.4f} < {args.min_spearman}"
+        )
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
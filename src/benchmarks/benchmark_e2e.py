@@ -0,0 +1,268 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Ensure src is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../src")))
+sys.path.append(os.path.dirname(__file__))
+
+from fastapi.testclient import TestClient
+
+from app import config, inference
+from app.cache import embedding_cache
+from app.main import (
+    app,
+    _count_pair_tokens,
+    _prepare_embedding_inputs,
+    _rank_results,
+)
+from app.models import get_model
+from app.scheduler import BULK
+from app.schemas import EmbeddingData, EmbeddingResponse, RerankResponse, Usage
+from app.tokenization import token_cache
+from tiny_model import build_tiny_model, random_texts
+
+# --- End-to-End Benchmark Suite ---
+# Builds a tiny randomly initialized BERT embedding model and cross-encoder
+# with a real tokenizer (no network), registers them as served models, and
+# times each stage of /v1/embeddings and /v1/rerank (tokenization and
+# truncation, inference, serialization, and the full HTTP round trip) over a
+# grid of input counts and lengths. Caches are cleared before every run, so
+# each measurement is a cold request.
+#
+# Results are written as JSON. With --baseline, the suite exits with status 1
+# if any throughput falls more than --threshold below the baseline's.
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "e2e.json")
+
+FULL_GRID = {"counts": (1, 16, 64), "lengths": (32, 512)}
+QUICK_GRID = {"counts": (1, 16), "lengths": (32, 512)}
+
+
+def host_info():
+    import torch
+
+    return {
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+    }
+
+
+def setup_models(cache_dir):
+    """
+    Builds (or reuses) the tiny models and serves them under their paths.
+    """
+    embedding = build_tiny_model(
+        os.path.join(cache_dir, "e2e-embedding"),
+        hidden_size=128,
+        num_layers=2,
+        max_seq_length=256,
+    )
+    rerank = build_tiny_model(
+        os.path.join(cache_dir, "e2e-rerank"),
+        hidden_size=128,
+        num_layers=2,
+        max_seq_length=256,
+        kind="rerank",
+    )
+    config.apply_models_config([embedding], [rerank], {})
+    return get_model(embedding), embedding, get_model(rerank), rerank
+
+
+def time_stage(fn, repeats, min_seconds=0.1):
+    """
+    Median per-call time of `repeats` cold runs (token and embedding caches
+    cleared before each call). Sub-millisecond stages are looped until a run
+    lasts `min_seconds`, so timer noise does not trip the regression check.
+    """
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            token_cache.clear()
+            embedding_cache.clear()
+            fn()
+        if time.perf_counter() - start >= min_seconds or calls >= 1024:
+            break
+        calls *= 2
+
+    timings = []
+    for _ in range(repeats):
+        elapsed = 0.0
+        for _ in range(calls):
+            token_cache.clear()
+            embedding_cache.clear()
+            start = time.perf_counter()
+            fn()
+            elapsed += time.perf_counter() - start
+        timings.append(elapsed / calls)
+    return float(np.median(timings))
+
+
+def embedding_stages(client, model, name, texts):
+    processed, total_tokens = _prepare_embedding_inputs(model, texts, "")
+    vectors = np.asarray(inference.encode(model, processed, BULK))
+
+    def serialize():
+        EmbeddingResponse(
+            data=[
+                EmbeddingData(embedding=vector.tolist(), index=i)
+                for i, vector in enumerate(vectors)
+            ],
+            model=name,
+            usage=Usage(prompt_tokens=total_tokens, total_tokens=total_tokens),
+        ).model_dump_json()
+
+    def request():
+        response = client.post("/v1/embeddings", json={"input": texts, "model": name})
+        response.raise_for_status()
+
+    return {
+        "tokenize": lambda: _prepare_embedding_inputs(model, texts, ""),
+        "inference": lambda: inference.encode(model, processed, BULK),
+        "serialize": serialize,
+        "end_to_end": request,
+    }
+
+
+def rerank_stages(client, model, name, query, documents):
+    pairs = [[query, doc] for doc in documents]
+    scores = inference.predict(model, pairs, BULK)
+
+    def serialize():
+        RerankResponse(
+            query=query,
+            data=_rank_results(scores, documents, None, None),
+            model=name,
+        ).model_dump_json()
+
+    def request():
+        response = client.post(
+            "/v1/rerank", json={"query": query, "documents": documents, "model": name}
+        )
+        response.raise_for_status()
+
+    return {
+        "tokenize": lambda: _count_pair_tokens(model.tokenizer, query, documents),
+        "inference": lambda: inference.predict(model, pairs, BULK),
+        "serialize": serialize,
+        "end_to_end": request,
+    }
+
+
+def run_suite(grid, repeats, cache_dir):
+    embedding, embedding_name, rerank, rerank_name = setup_models(cache_dir)
+    client = TestClient(app)
+    results = {}
+    for length in grid["lengths"]:
+        for count in grid["counts"]:
+            texts = random_texts(count, length // 2, length, seed=count + length)
+            query = random_texts(1, 16, 32, seed=length)[0]
+            suites = {
+                "embeddings": embedding_stages(
+                    client, embedding, embedding_name, texts
+                ),
+                "rerank": rerank_stages(client, rerank, rerank_name, query, texts),
+            }
+            for endpoint, stages in suites.items():
+                for stage, fn in stages.items():
+                    fn()  # warm-up
+                    seconds = time_stage(fn, repeats)
+                    key = f"{endpoint}/{stage}/n={count}/len={length}"
+                    results[key] = {
+                        "seconds": round(seconds, 6),
+                        "items_per_second": round(count / seconds, 2),
+                    }
+                    print(
+                        f"{key:42s} {seconds * 1000:9.2f} ms  {count / seconds:10.1f} items/s"
+                    )
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns the keys whose throughput is more than `threshold` (a fraction)
+    below the baseline, as (key, baseline, current) tuples.
+    """
+    regressions = []
+    for key, expected in baseline["results"].items():
+        if key not in results:
+            continue
+        current = results[key]["items_per_second"]
+        if current < expected["items_per_second"] * (1 - threshold):
+            regressions.append((key, expected["items_per_second"], current))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--output", help="Write results to this JSON file.")
+    parser.add_argument(
+        "--baseline",
+        nargs="?",
+        const=BASELINE,
+        help=f"Compare against a baseline JSON file (default: {BASELINE}).",
+    )
+    parser.add_argument(
+        "--update-baseline", action="store_true", help="Overwrite the baseline."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.3,
+        help="Allowed throughput drop as a fraction (default: 0.3).",
+    )
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="Smaller grid.")
+    parser.add_argument(
+        "--cache-dir",
+        default=os.path.join(tempfile.gettempdir(), "embedding_jp_api_bench_models"),
+    )
+    args = parser.parse_args(argv)
+
+    grid = QUICK_GRID if args.quick else FULL_GRID
+    print(f"Running End-to-End Benchmark Suite (repeats={args.repeats})")
+    report = {
+        "host": host_info(),
+        "grid": {k: list(v) for k, v in grid.items()},
+        "results": run_suite(grid, args.repeats, args.cache_dir),
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline or BASELINE), exist_ok=True)
+        with open(args.baseline or BASELINE, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline or BASELINE}")
+        return 0
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("host") != report["host"]:
+            print("Warning: the baseline was recorded on a different host.")
+        regressions = compare(report["results"], baseline, args.threshold)
+        for key, expected, current in regressions:
+            print(
+                f"REGRESSION {key}: {current:.1f} items/s vs baseline "
+                f"{expected:.1f} ({current / expected - 1:+.0%})"
+            )
+        if regressions:
+            return 1
+        print(f"No throughput regression beyond {args.threshold:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+# Ensure src is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../src")))
+sys.path.append(os.path.dirname(__file__))
+
+import numpy as np
+
+from app import inference, memory
+from app.cache import embedding_cache
+from app.main import _count_pair_tokens, _prepare_embedding_inputs
+from app.scheduler import INTERACTIVE
+from app.schemas import EmbeddingData, EmbeddingResponse, Usage
+from app.tokenization import token_cache
+from tiny_model import build_tiny_model, random_texts
+
+# --- Memory Profiling Harness ---
+# Measures the peak memory of each request stage across request shapes (input
+# count x characters per input), up to the MAX_INPUT_ITEMS x MAX_INPUT_LENGTH
+# worst case:
+#   tokenize  token ids of every input and the decoded truncated strings
+#   encode    the forward passes (attention activations)
+#   response  EmbeddingData built with tolist()
+#   serialize the JSON body
+#   rerank tokenize / predict for the same documents against one query
+# For each stage it reports the peak RSS growth (sampled every millisecond,
+# covers torch's native allocations) and the tracemalloc peak (Python and
+# numpy allocations only), next to the memory guard's prediction for the
+# encode/predict call (see app/memory.py).
+#
+# Without a model name, tiny local models (tiny_model.py) are used; pass a
+# real model to measure it, e.g. cl-nagoya/ruri-v3-30m.
+#
+# glibc raises its mmap threshold as large blocks are freed, after which
+# freed memory stays resident and later stages' RSS growth reads low. The
+# script re-executes itself with a fixed threshold so every stage starts
+# from memory returned to the system.
+MALLOC_ENV = {"MALLOC_MMAP_THRESHOLD_": "65536", "MALLOC_TRIM_THRESHOLD_": "0"}
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        import resource
+
+        # Peak, not current, RSS outside Linux; stage deltas are then upper bounds.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class PeakSampler:
+    """
+    Samples RSS from a background thread while a stage runs.
+    """
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self.base = current_rss()
+        self.peak = self.base
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss())
+            time.sleep(self.interval)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+def measure(fn):
+    """
+    Runs fn() and returns (result, peak RSS growth, tracemalloc peak growth).
+    """
+    gc.collect()
+    tracemalloc.reset_peak()
+    traced_base = tracemalloc.get_traced_memory()[0]
+    with PeakSampler() as sampler:
+        result = fn()
+    traced_peak = tracemalloc.get_traced_memory()[1] - traced_base
+    return result, sampler.peak - sampler.base, traced_peak
+
+
+def mb(n):
+    return n / 2**20
+
+
+def profile_shape(embedding, rerank, count, length, results):
+    texts = random_texts(count, length, length, seed=count + length)
+    query = random_texts(1, 32, 32, seed=length)[0]
+    token_cache.clear()
+    embedding_cache.clear()
+
+    stages = {}
+    prepared, rss, traced = measure(
+        lambda: _prepare_embedding_inputs(embedding, texts, "")
+    )
+    stages["tokenize"] = [rss, traced]
+    processed, total_tokens = prepared
+    encoded, rss, traced = measure(
+        lambda: np.asarray(inference.encode(embedding, processed, INTERACTIVE))
+    )
+    stages["encode"] = [rss, traced]
+    response, rss, traced = measure(
+        lambda: EmbeddingResponse(
+            data=[
+                EmbeddingData(embedding=vector.tolist(), index=i)
+                for i, vector in enumerate(encoded)
+            ],
+            model="benchmark",
+            usage=Usage(prompt_tokens=total_tokens, total_tokens=total_tokens),
+        )
+    )
+    stages["response"] = [rss, traced]
+    _, *stages["serialize"] = measure(response.model_dump_json)
+    # Release the embedding results before the rerank stages
+    prepared = processed = encoded = response = None
+    _, *stages["rerank_tokenize"] = measure(
+        lambda: _count_pair_tokens(rerank.tokenizer, query, texts)
+    )
+    pairs = [[query, text] for text in texts]
+    _, *stages["rerank_predict"] = measure(
+        lambda: inference.predict(rerank, pairs, INTERACTIVE)
+    )
+
+    shape = memory.model_shape(embedding)
+    # encode sees the inputs truncated by the tokenize stage
+    input_len = min(
+        memory.input_length(embedding, texts, shape.max_length), shape.max_length
+    )
+    predicted_encode = memory.predicted_peak_bytes(
+        shape, count, inference.DEFAULT_BATCH_SIZE, input_len
+    )
+    rerank_shape = memory.model_shape(rerank)
+    predicted_predict = memory.predicted_peak_bytes(
+        rerank_shape,
+        count,
+        inference.DEFAULT_BATCH_SIZE,
+        memory.input_length(rerank, pairs, rerank_shape.max_length),
+    )
+
+    key = f"n={count}/len={length}"
+    results[key] = {
+        stage: {
+            "peak_rss_mb": round(mb(rss), 1),
+            "tracemalloc_mb": round(mb(traced), 1),
+        }
+        for stage, (rss, traced) in stages.items()
+    }
+    results[key]["predicted_mb"] = {
+        "encode_and_response": round(mb(predicted_encode), 1),
+        "rerank_predict": round(mb(predicted_predict), 1),
+    }
+    row = "  ".join(
+        f"{stage}={mb(rss):.1f}/{mb(traced):.1f}"
+        for stage, (rss, traced) in stages.items()
+    )
+    print(
+        f"{key:18s} {row}  predicted encode+response={mb(predicted_encode):.1f} "
+        f"predict={mb(predicted_predict):.1f}"
+    )
+
+
+def load_models(args):
+    from app.models import load_model
+
+    if args.model:
+        return load_model(args.model, "embedding"), load_model(
+            args.rerank_model or args.model, "rerank"
+        )
+    cache_dir = os.path.join(tempfile.gettempdir(), "embedding_jp_api_bench_models")
+    embedding = build_tiny_model(
+        os.path.join(cache_dir, f"memory-embedding-{args.max_seq_length}"),
+        hidden_size=256,
+        num_layers=4,
+        max_seq_length=args.max_seq_length,
+    )
+    rerank = build_tiny_model(
+        os.path.join(cache_dir, f"memory-rerank-{args.max_seq_length}"),
+        hidden_size=256,
+        num_layers=4,
+        max_seq_length=args.max_seq_length,
+        kind="rerank",
+    )
+    return load_model(embedding, "embedding"), load_model(rerank, "rerank")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Peak memory per request stage across request shapes."
+    )
+    parser.add_argument("model", nargs="?", help="Embedding model (default: tiny).")
+    parser.add_argument("--rerank-model")
+    parser.add_argument("--max-seq-length", type=int, default=1024)
+    parser.add_argument("--counts", default="1,32,256")
+    parser.add_argument("--lengths", default="128,2048,65536")
+    parser.add_argument("--output", help="Write results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    if argv is None and any(os.environ.get(k) != v for k, v in MALLOC_ENV.items()):
+        os.execve(
+            sys.executable, [sys.executable] + sys.argv, {**os.environ, **MALLOC_ENV}
+        )
+
+    embedding, rerank = load_models(args)
+    tracemalloc.start()
+    print("Peak memory per stage, MB (RSS growth / tracemalloc)")
+    results = {}
+    for length in (int(x) for x in args.lengths.split(",")):
+        for count in (int(x) for x in args.counts.split(",")):
+            profile_shape(embedding, rerank, count, length, results)
+    tracemalloc.stop()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
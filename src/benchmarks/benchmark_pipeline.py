@@ -0,0 +1,73 @@
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Ensure src is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../src")))
+sys.path.append(os.path.dirname(__file__))
+
+from sentence_transformers import SentenceTransformer
+
+from app.pipeline import pipelined_encode
+from app.tokenization import install_cached_tokenize, token_cache
+from tiny_model import build_tiny_model, random_texts
+
+
+def best_of(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        token_cache.clear()
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def benchmark_pipeline(
+    model_path=None, num_texts=512, batch_size=32, max_chars=512, repeats=2
+):
+    """
+    Compares SentenceTransformer.encode with pipelined_encode on a large
+    multi-batch request. Pass a model name/path to benchmark a real model;
+    by default a small local BERT is built so the script runs offline.
+    """
+    if model_path is None:
+        model_path = build_tiny_model(
+            os.path.join(tempfile.gettempdir(), "embedding_jp_api_bench_model"),
+            hidden_size=256,
+            num_layers=4,
+            max_seq_length=512,
+        )
+    model = SentenceTransformer(model_path, device="cpu")
+    install_cached_tokenize(model)
+    texts = random_texts(num_texts, 16, max_chars)
+
+    print(
+        f"Running Pipeline Benchmark ({num_texts} texts, batch_size={batch_size}, "
+        f"{len(texts) // batch_size} batches)"
+    )
+
+    sequential, expected = best_of(
+        lambda: model.encode(texts, batch_size=batch_size), repeats
+    )
+    print(f"sequential encode:         {sequential * 1000:8.1f} ms")
+
+    for prefetch in (1, 2, 4):
+        elapsed, vectors = best_of(
+            lambda prefetch=prefetch: pipelined_encode(
+                model, texts, batch_size=batch_size, prefetch=prefetch
+            ),
+            repeats,
+        )
+        max_diff = float(np.max(np.abs(vectors - expected)))
+        print(
+            f"pipelined (prefetch={prefetch}):  {elapsed * 1000:8.1f} ms  "
+            f"speedup {sequential / elapsed:4.2f}x  max |diff| {max_diff:.1e}"
+        )
+
+
+if __name__ == "__main__":
+    benchmark_pipeline(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,174 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+sys.path.append(os.path.dirname(__file__))
+
+from tiny_model import build_tiny_model
+
+# --- Local Load-Test Server ---
+# Serves the API on tiny local models (see tiny_model.py), so load tests run
+# offline and in CI. With --locust, also runs a headless locust test against
+# it, writes the stats CSVs, and compares them with --compare through
+# locust_report.py.
+#
+# With --replicas N, N replicas listen on the ports after --port and the
+# router (app/router.py) on --port, as a local stand-in for a multi-container
+# deployment.
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+
+
+def write_models_config(cache_dir):
+    """
+    Builds (or reuses) the tiny models and returns (models.yml path,
+    embedding model, rerank model).
+    """
+    embedding = build_tiny_model(
+        os.path.join(cache_dir, "load-embedding"), max_seq_length=256
+    )
+    rerank = build_tiny_model(
+        os.path.join(cache_dir, "load-rerank"), max_seq_length=256, kind="rerank"
+    )
+    path = os.path.join(cache_dir, "models.yml")
+    with open(path, "w") as f:
+        f.write(f'embedding_models:\n  - "{embedding}"\n')
+        f.write(f'rerank_models:\n  - "{rerank}"\n')
+    return path, embedding, rerank
+
+
+def wait_until_ready(url, process, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("The server exited during startup.")
+        try:
+            with urllib.request.urlopen(f"{url}/ready", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.5)
+    raise TimeoutError(f"The server at {url} did not start in {timeout}s.")
+
+
+def uvicorn_command(app, port):
+    return [sys.executable, "-m", "uvicorn", app, "--port", str(port)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve the API on tiny local models, optionally under locust."
+    )
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--replicas",
+        type=int,
+        default=1,
+        help="Run this many replicas behind the router (default: 1, no router).",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=os.path.join(tempfile.gettempdir(), "embedding_jp_api_bench_models"),
+    )
+    parser.add_argument(
+        "--locust",
+        metavar="PROFILE",
+        help="Run a headless locust test with this LOAD_PROFILE, then stop.",
+    )
+    parser.add_argument("--replay", help="Recorded traffic for the replay profile.")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--spawn-rate", type=float, default=2)
+    parser.add_argument("--run-time", default="60s")
+    parser.add_argument("--csv", default="local", help="locust --csv prefix.")
+    parser.add_argument("--compare", help="Baseline *_stats.csv to diff against.")
+    args = parser.parse_args(argv)
+
+    models_file, embedding, rerank = write_models_config(args.cache_dir)
+    env = dict(
+        os.environ,
+        MODELS_CONFIG=models_file,
+        PRELOAD_MODELS="all",
+        PYTHONPATH=os.path.join(ROOT, "src"),
+    )
+    print(f"Embedding model: {embedding}\nRerank model: {rerank}")
+
+    if args.replicas <= 1 and not args.locust:
+        os.execve(sys.executable, uvicorn_command("app.main:app", args.port), env)
+
+    url = f"http://127.0.0.1:{args.port}"
+    servers = []
+    try:
+        if args.replicas > 1:
+            replicas = []
+            for i in range(1, args.replicas + 1):
+                replicas.append(f"http://127.0.0.1:{args.port + i}")
+                servers.append(
+                    subprocess.Popen(
+                        uvicorn_command("app.main:app", args.port + i), env=env
+                    )
+                )
+            for replica, server in zip(replicas, servers):
+                wait_until_ready(replica, server)
+            print(f"Replicas: {', '.join(replicas)}\nRouter: {url}")
+            router_env = dict(env, ROUTER_REPLICAS=",".join(replicas))
+            servers.append(
+                subprocess.Popen(
+                    uvicorn_command("app.router:app", args.port), env=router_env
+                )
+            )
+        else:
+            servers.append(
+                subprocess.Popen(uvicorn_command("app.main:app", args.port), env=env)
+            )
+        wait_until_ready(url, servers[-1])
+        if not args.locust:
+            servers[-1].wait()
+            return 0
+        load_env = dict(
+            os.environ,
+            LOAD_PROFILE=args.locust,
+            LOAD_EMBEDDING_MODEL=embedding,
+            LOAD_RERANK_MODEL=rerank,
+        )
+        if args.replay:
+            load_env["LOAD_REPLAY"] = args.replay
+        subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "locust",
+                "-f",
+                os.path.join(ROOT, "locustfile.py"),
+                "--headless",
+                "--host",
+                url,
+                "--users",
+                str(args.users),
+                "--spawn-rate",
+                str(args.spawn_rate),
+                "--run-time",
+                args.run_time,
+                "--csv",
+                args.csv,
+            ],
+            env=load_env,
+            check=True,
+        )
+    finally:
+        for server in servers:
+            server.terminate()
+        for server in servers:
+            server.wait()
+
+    if args.compare:
+        from locust_report import main as report
+
+        return report([args.compare, f"{args.csv}_stats.csv"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
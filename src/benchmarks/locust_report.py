@@ -0,0 +1,125 @@
+import argparse
+import csv
+import sys
+
+# --- Locust Stats Comparison ---
+# Diffs two `locust --csv` *_stats.csv files (e.g. baseline_main_stats.csv and
+# evaluation_optimized_stats.csv) endpoint by endpoint and flags regressions:
+# a p50/p95/p99 response time or failure rate that grew, or a request rate
+# that dropped, by more than the threshold. Exits with status 1 if any
+# endpoint regressed.
+
+# (CSV column, label, True if higher is worse)
+METRICS = [
+    ("50%", "p50 (ms)", True),
+    ("95%", "p95 (ms)", True),
+    ("99%", "p99 (ms)", True),
+    ("Requests/s", "RPS", False),
+    ("Failure Rate", "failures", True),
+]
+
+
+def read_stats(path):
+    """
+    Returns {endpoint name: {metric: value}} from a locust stats CSV.
+    """
+    stats = {}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            values = {}
+            for column, _, _ in METRICS[:-1]:
+                try:
+                    values[column] = float(row[column])
+                except (KeyError, ValueError):
+                    # Locust writes "N/A" for endpoints without samples
+                    values[column] = None
+            requests = float(row.get("Request Count") or 0)
+            failures = float(row.get("Failure Count") or 0)
+            values["Failure Rate"] = failures / requests if requests else None
+            stats[row["Name"]] = values
+    return stats
+
+
+def compare(baseline, current, threshold, min_ms):
+    """
+    Returns (rows, regressions): one row per endpoint and metric as
+    (endpoint, label, baseline, current, relative change, regressed).
+    Response time changes smaller than `min_ms` are not flagged.
+    """
+    rows, regressions = [], []
+    for name in baseline:
+        if name not in current:
+            continue
+        for column, label, higher_is_worse in METRICS:
+            before, after = baseline[name][column], current[name][column]
+            if before is None or after is None:
+                continue
+            if before:
+                change = (after - before) / before
+            else:
+                change = float("inf") if after > 0 else 0.0
+            worse = change > threshold if higher_is_worse else change < -threshold
+            if column.endswith("%") and abs(after - before) < min_ms:
+                worse = False
+            if column == "Failure Rate":
+                # Any new failures count, even from a zero baseline
+                worse = after > before * (1 + threshold) and after - before > 0.001
+            row = (name, label, before, after, change, worse)
+            rows.append(row)
+            if worse:
+                regressions.append(row)
+    return rows, regressions
+
+
+def format_value(label, value):
+    if label == "failures":
+        return f"{value:.2%}"
+    if label == "RPS":
+        return f"{value:.2f}"
+    return f"{value:.0f}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare two locust *_stats.csv files."
+    )
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative change flagged as a regression (default: 0.1).",
+    )
+    parser.add_argument(
+        "--min-ms",
+        type=float,
+        default=5,
+        help="Ignore response time changes below this many ms (default: 5).",
+    )
+    args = parser.parse_args(argv)
+
+    baseline, current = read_stats(args.baseline), read_stats(args.current)
+    rows, regressions = compare(baseline, current, args.threshold, args.min_ms)
+
+    print(f"| Endpoint | Metric | {args.baseline} | {args.current} | Change | |")
+    print("| :--- | :--- | ---: | ---: | ---: | :--- |")
+    for name, label, before, after, change, worse in rows:
+        print(
+            f"| {name} | {label} | {format_value(label, before)} | "
+            f"{format_value(label, after)} | "
+            f"{'new' if change == float('inf') else f'{change:+.1%}'} | "
+            f"{'**REGRESSION**' if worse else ''} |"
+        )
+    for name in sorted(set(baseline) ^ set(current)):
+        print(f"\nEndpoint only in one file: {name}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}.")
+        return 1
+    print(f"\nNo regression beyond {args.threshold:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import os
+import sys
+
+# --- Tiny Local Models ---
+# Randomly initialized BERT models with a character-level WordPiece tokenizer
+# covering kana, ASCII and the Ruri prefixes. They exercise the real
+# sentence-transformers / tokenizers code paths without downloading weights,
+# so benchmarks can run offline. Scores are meaningless; timings are not.
+
+CHARS = (
+    [chr(c) for c in range(0x3041, 0x3097)]
+    + [chr(c) for c in range(0x30A1, 0x30FB)]
+    + list("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789:、。 ")
+    + list("検索クエリ文書東京猫犬天気日本語")
+)
+SPECIAL_TOKENS = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+
+
+def _build_tokenizer():
+    from tokenizers import Regex, Tokenizer, models, normalizers, pre_tokenizers
+    from tokenizers import processors
+    from transformers import PreTrainedTokenizerFast
+
+    vocab = {t: i for i, t in enumerate(SPECIAL_TOKENS + sorted(set(CHARS)))}
+    tokenizer = Tokenizer(models.WordPiece(vocab, unk_token="[UNK]"))
+    tokenizer.normalizer = normalizers.NFKC()
+    tokenizer.pre_tokenizer = pre_tokenizers.Sequence(
+        [
+            pre_tokenizers.WhitespaceSplit(),
+            pre_tokenizers.Split(pattern=Regex("."), behavior="isolated"),
+        ]
+    )
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]",
+        pair="[CLS] $A [SEP] $B [SEP]",
+        special_tokens=[("[CLS]", vocab["[CLS]"]), ("[SEP]", vocab["[SEP]"])],
+    )
+    fast = PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        unk_token="[UNK]",
+        pad_token="[PAD]",
+        cls_token="[CLS]",
+        sep_token="[SEP]",
+        mask_token="[MASK]",
+    )
+    return fast, len(vocab)
+
+
+def build_tiny_model(
+    path,
+    hidden_size=64,
+    num_layers=2,
+    max_seq_length=128,
+    kind="embedding",
+    seed=0,
+):
+    """
+    Saves a tiny model under `path` and returns the path.
+    kind="embedding" builds a SentenceTransformer (mean pooling),
+    kind="rerank" a single-label cross-encoder.
+    """
+    import torch
+    from transformers import BertConfig, BertForSequenceClassification, BertModel
+
+    if os.path.exists(os.path.join(path, "config.json")):
+        return path
+
+    torch.manual_seed(seed)
+    tokenizer, vocab_size = _build_tokenizer()
+    config = BertConfig(
+        vocab_size=vocab_size,
+        hidden_size=hidden_size,
+        num_hidden_layers=num_layers,
+        num_attention_heads=max(1, hidden_size // 32),
+        intermediate_size=hidden_size * 2,
+        max_position_embeddings=max_seq_length + 2,
+        num_labels=1,
+    )
+
+    if kind == "rerank":
+        BertForSequenceClassification(config).save_pretrained(path)
+        tokenizer.model_max_length = max_seq_length
+        tokenizer.save_pretrained(path)
+        return path
+
+    from sentence_transformers import SentenceTransformer, models
+
+    hf_path = os.path.join(path, "hf")
+    BertModel(config).save_pretrained(hf_path)
+    tokenizer.save_pretrained(hf_path)
+    transformer = models.Transformer(hf_path, max_seq_length=max_seq_length)
+    pooling = models.Pooling(hidden_size, "mean")
+    SentenceTransformer(modules=[transformer, pooling]).save(path)
+    return path
+
+
+def random_texts(count, min_length, max_length, seed=0):
+    """
+    Random kana/ASCII strings with lengths spread over [min_length, max_length].
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    alphabet = np.array(CHARS[:-16])
+    lengths = rng.integers(min_length, max_length + 1, size=count)
+    return ["".join(rng.choice(alphabet, size=n)) for n in lengths]
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else "tiny-model"
+    kind = sys.argv[2] if len(sys.argv) > 2 else "embedding"
+    print(build_tiny_model(target, kind=kind))
@@ -0,0 +1,201 @@
+import json
+import random
+from typing import List, NamedTuple, Optional, Tuple
+
+# --- Load-Test Workloads ---
+# Request generators for locustfile.py, kept free of locust so they can be
+# inspected and reused. A profile fixes the endpoint mix, the batch sizes,
+# the length distributions of queries and documents (log-normal in
+# characters, clipped), and the think time between requests. The "replay"
+# workload instead cycles through recorded traffic.
+
+SENTENCES = [
+    "今日の天気は晴れです。",
+    "最新のAI技術について教えてください。",
+    "このドキュメントを要約して。",
+    "自然言語処理とは何ですか？",
+    "日本の首都は東京です。",
+    "猫は一日の大半を寝て過ごします。",
+    "機械学習はAIのサブセットです。",
+    "人工知能は今後の社会を大きく変えるでしょう。",
+    "検索システムでは文書の埋め込みを事前に計算しておきます。",
+    "再ランキングでは、クエリと文書の組をクロスエンコーダーで採点します。",
+    "長い文書はモデルの最大長で切り詰められます。",
+    "犬は人間の最良の友です。",
+]
+
+INPUT_TYPES = ["query", "document", "classification", "clustering", "sts", None]
+
+
+class LengthDistribution(NamedTuple):
+    """
+    Log-normal text length in characters, clipped to [minimum, maximum].
+    """
+
+    median: int
+    sigma: float
+    minimum: int
+    maximum: int
+
+    def sample(self, rng: random.Random) -> int:
+        length = int(rng.lognormvariate(0, self.sigma) * self.median)
+        return max(self.minimum, min(self.maximum, length))
+
+
+class Profile(NamedTuple):
+    """
+    A synthetic workload. Batch sizes are (size, weight) pairs.
+    """
+
+    embedding_weight: float
+    rerank_weight: float
+    query_length: LengthDistribution
+    document_length: LengthDistribution
+    # Share of embedding requests that embed a single query
+    query_share: float
+    embedding_batches: List[Tuple[int, float]]
+    rerank_documents: List[Tuple[int, float]]
+    think_time: Tuple[float, float]
+
+
+PROFILES = {
+    # The original locustfile: a few short sentences, mostly idle users.
+    "smoke": Profile(
+        embedding_weight=3,
+        rerank_weight=1,
+        query_length=LengthDistribution(12, 0.3, 8, 30),
+        document_length=LengthDistribution(16, 0.3, 8, 40),
+        query_share=0.8,
+        embedding_batches=[(3, 1)],
+        rerank_documents=[(3, 1)],
+        think_time=(1, 5),
+    ),
+    # Search traffic: mostly single queries, some document indexing batches,
+    # rerank of a first-stage candidate list.
+    "realistic": Profile(
+        embedding_weight=7,
+        rerank_weight=3,
+        query_length=LengthDistribution(30, 0.5, 4, 200),
+        document_length=LengthDistribution(400, 0.8, 20, 8000),
+        query_share=0.7,
+        embedding_batches=[(8, 4), (32, 3), (64, 2), (256, 1)],
+        rerank_documents=[(10, 3), (20, 3), (50, 2), (100, 1)],
+        think_time=(0.1, 1),
+    ),
+    # Long documents well past the models' maximum sequence length, up to
+    # MAX_INPUT_LENGTH: exercises truncation.
+    "long": Profile(
+        embedding_weight=1,
+        rerank_weight=1,
+        query_length=LengthDistribution(30, 0.5, 4, 200),
+        document_length=LengthDistribution(4000, 1.0, 1000, 65536),
+        query_share=0,
+        embedding_batches=[(1, 2), (8, 1)],
+        rerank_documents=[(5, 1), (20, 1)],
+        think_time=(0.1, 1),
+    ),
+    # Bulk indexing at the MAX_INPUT_ITEMS limit.
+    "batch": Profile(
+        embedding_weight=1,
+        rerank_weight=0,
+        query_length=LengthDistribution(30, 0.5, 4, 200),
+        document_length=LengthDistribution(400, 0.8, 20, 4000),
+        query_share=0,
+        embedding_batches=[(256, 1)],
+        rerank_documents=[(10, 1)],
+        think_time=(0, 0.5),
+    ),
+}
+
+
+def _choose(rng: random.Random, weighted: List[Tuple[int, float]]) -> int:
+    values, weights = zip(*weighted)
+    return rng.choices(values, weights)[0]
+
+
+def make_text(rng: random.Random, length: int) -> str:
+    """
+    Japanese text of exactly `length` characters, made of sample sentences.
+    """
+    parts, size = [], 0
+    while size < length:
+        sentence = rng.choice(SENTENCES)
+        parts.append(sentence)
+        size += len(sentence)
+    return "".join(parts)[:length]
+
+
+def synthetic_request(
+    profile: Profile,
+    rng: random.Random,
+    embedding_model: str,
+    rerank_model: str,
+) -> Tuple[str, dict]:
+    """
+    Returns the (path, JSON body) of the next request of `profile`.
+    """
+    if rng.uniform(0, profile.embedding_weight + profile.rerank_weight) < (
+        profile.embedding_weight
+    ):
+        if rng.random() < profile.query_share:
+            texts = make_text(rng, profile.query_length.sample(rng))
+            input_type = "query"
+        else:
+            count = _choose(rng, profile.embedding_batches)
+            texts = [
+                make_text(rng, profile.document_length.sample(rng))
+                for _ in range(count)
+            ]
+            input_type = rng.choice(INPUT_TYPES)
+        return "/v1/embeddings", {
+            "input": texts,
+            "model": embedding_model,
+            "input_type": input_type,
+        }
+
+    count = _choose(rng, profile.rerank_documents)
+    return "/v1/rerank", {
+        "query": make_text(rng, profile.query_length.sample(rng)),
+        "documents": [
+            make_text(rng, profile.document_length.sample(rng)) for _ in range(count)
+        ],
+        "model": rerank_model,
+        "top_n": rng.choice([None, 1, 5, 10]),
+        "return_documents": rng.choice([True, False]),
+    }
+
+
+def load_recording(
+    filename: str,
+    embedding_model: Optional[str] = None,
+    rerank_model: Optional[str] = None,
+) -> List[Tuple[str, dict]]:
+    """
+    Reads recorded traffic: one JSON object per line with the request "path"
+    (or "endpoint") and its JSON "body". Lines without a path that look like
+    a request body are routed by their fields. Models can be overridden, e.g.
+    to replay production traffic against the tiny local models.
+    """
+    requests = []
+    with open(filename, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            path = record.get("path") or record.get("endpoint")
+            body = record.get("body", record if path is None else None)
+            if not isinstance(body, dict):
+                raise TypeError(
+                    f"{filename}:{line_number}: the request body must be a JSON object"
+                )
+            if path is None:
+                path = "/v1/rerank" if "query" in body else "/v1/embeddings"
+            body = dict(body)
+            if path == "/v1/embeddings" and embedding_model:
+                body["model"] = embedding_model
+            elif path == "/v1/rerank" and rerank_model:
+                body["model"] = rerank_model
+            requests.append((path, body))
+    if not requests:
+        raise ValueError(f"{filename}: no requests recorded")
+    return requests
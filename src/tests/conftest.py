@@ -0,0 +1,47 @@
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+VOCAB = ["猫", "犬", "東京", "AI"]
+
+
+def vocab_encode(texts):
+    # One-hot style vectors over VOCAB, so nearest neighbours are predictable.
+    vectors = np.full((len(texts), len(VOCAB)), 0.01)
+    for i, text in enumerate(texts):
+        for j, word in enumerate(VOCAB):
+            if word in text:
+                vectors[i, j] = 1.0
+    return vectors
+
+
+@pytest.fixture
+def fake_model():
+    """
+    Factory of a MagicMock model that app.main.get_model returns for the rest
+    of the test. `encode` and `predict` are its side effects; its tokenizer
+    gives every text (or pair) `tokens` ids and adds `special_tokens` more.
+    """
+    with patch("app.main.get_model") as get_model:
+
+        def make(
+            encode=vocab_encode,
+            predict=None,
+            tokens=2,
+            special_tokens=0,
+            max_length=512,
+        ):
+            model = MagicMock()
+            model.encode.side_effect = encode
+            if predict is not None:
+                model.predict.side_effect = predict
+            model.tokenizer.side_effect = lambda texts, *args, **kwargs: {
+                "input_ids": [[1] * tokens for _ in texts]
+            }
+            model.tokenizer.num_special_tokens_to_add.return_value = special_tokens
+            model.max_seq_length = max_length
+            get_model.return_value = model
+            return model
+
+        yield make
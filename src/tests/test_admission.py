@@ -0,0 +1,126 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock
+
+from app.main import app
+from app.config import EMBEDDING_MODELS
+from app.admission import AdmissionController, AdmissionTimeout
+
+client = TestClient(app)
+
+SUPPORTED_EMBEDDING_MODEL = EMBEDDING_MODELS[0]
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def hold(controller, tokens, user, release, started=None):
+    with controller.admit(tokens, user):
+        if started is not None:
+            started.set()
+        release.wait(5)
+
+
+def test_budget_limits_inflight_tokens():
+    controller = AdmissionController(max_tokens=100)
+    release = threading.Event()
+    holder = threading.Thread(target=hold, args=(controller, 80, "a", release))
+    holder.start()
+    wait_until(lambda: controller.in_flight == 80)
+
+    admitted = threading.Event()
+    waiter = threading.Thread(
+        target=hold, args=(controller, 50, "b", threading.Event(), admitted)
+    )
+    waiter.start()
+    wait_until(lambda: controller.waiting() == 1)
+    assert not admitted.is_set()
+
+    release.set()
+    assert admitted.wait(5)
+    # Requests above the whole budget are clamped and run alone
+    with controller.admit(10_000, "c"):
+        assert controller.in_flight == 100
+    holder.join(5)
+
+
+def test_fair_queuing_lets_quiet_user_pass_noisy_backlog():
+    controller = AdmissionController(max_tokens=100)
+    release = threading.Event()
+    holder = threading.Thread(target=hold, args=(controller, 100, "noisy", release))
+    holder.start()
+    wait_until(lambda: controller.in_flight == 100)
+
+    order = []
+
+    def run(user, name):
+        with controller.admit(100 if user == "noisy" else 10, user):
+            order.append(name)
+
+    threads = []
+    for name, user in [("n1", "noisy"), ("n2", "noisy"), ("q1", "quiet")]:
+        threads.append(threading.Thread(target=run, args=(user, name)))
+        threads[-1].start()
+        wait_until(lambda: controller.waiting() == len(threads))
+
+    release.set()
+    for thread in [holder] + threads:
+        thread.join(5)
+    assert order == ["q1", "n1", "n2"]
+
+
+def test_admission_timeout():
+    controller = AdmissionController(max_tokens=10, timeout=0.05)
+    release = threading.Event()
+    holder = threading.Thread(target=hold, args=(controller, 10, "a", release))
+    holder.start()
+    wait_until(lambda: controller.in_flight == 10)
+
+    with pytest.raises(AdmissionTimeout):
+        with controller.admit(5, "b"):
+            pass
+    assert controller.waiting() == 0
+    release.set()
+    holder.join(5)
+
+
+def test_embeddings_rejected_with_503_when_budget_exhausted():
+    controller = AdmissionController(max_tokens=10, timeout=0.05)
+    release = threading.Event()
+    holder = threading.Thread(target=hold, args=(controller, 10, "other", release))
+    holder.start()
+    wait_until(lambda: controller.in_flight == 10)
+
+    with patch("app.main.get_model") as mock, patch("app.main.admission", controller):
+        model = MagicMock()
+        model.encode.side_effect = lambda texts: np.ones((len(texts), 3))
+        model.tokenizer.side_effect = lambda texts, **kwargs: {
+            "input_ids": [[1, 2, 3] for _ in texts]
+        }
+        model.tokenizer.num_special_tokens_to_add.return_value = 0
+        model.max_seq_length = 512
+        mock.return_value = model
+
+        response = client.post(
+            "/v1/embeddings",
+            json={"input": "hello", "model": SUPPORTED_EMBEDDING_MODEL, "user": "u1"},
+        )
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        model.encode.assert_not_called()
+
+        release.set()
+        holder.join(5)
+        response = client.post(
+            "/v1/embeddings",
+            json={"input": "hello", "model": SUPPORTED_EMBEDDING_MODEL, "user": "u1"},
+        )
+        assert response.status_code == 200
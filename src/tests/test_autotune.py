@@ -0,0 +1,119 @@
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock
+
+from app.main import app
+from app import autotune, inference
+from app.autotune import TunedTable
+from app.scheduler import INTERACTIVE
+
+client = TestClient(app)
+
+TABLE = {
+    64: {"batch_size": 64, "tokens_per_second": 1000.0, "latency_ms": 50.0},
+    512: {"batch_size": 8, "tokens_per_second": 800.0, "latency_ms": 90.0},
+}
+
+
+def test_tuned_table_bucket_lookup():
+    table = TunedTable("m", "embedding", {}, 500, TABLE)
+    assert table.batch_size_for(10) == 64
+    assert table.batch_size_for(64) == 64
+    assert table.batch_size_for(65) == 8
+    # Past the largest bucket, tokens per batch stay constant
+    assert table.batch_size_for(2048) == 2
+    assert table.batch_size_for(100_000) == 1
+
+
+def test_profile_picks_best_throughput_within_slo():
+    # Fixed per-call overhead, and latency grows super-linearly past 1024
+    # tokens per batch.
+    clock = {"now": 0.0}
+
+    def timed_forward(model, kind, seq_len, batch_size):
+        tokens = seq_len * batch_size
+        clock["now"] += 5e-4 + tokens * 1e-6 * (1 if tokens <= 1024 else 3)
+
+    model = MagicMock()
+    model.max_seq_length = 128
+    with (
+        patch("app.autotune._forward", timed_forward),
+        patch("app.autotune.time.perf_counter", lambda: clock["now"]),
+    ):
+        table = autotune.profile(
+            model,
+            "embedding",
+            seq_buckets=(64, 512),
+            batch_sizes=(1, 8, 16, 32, 64),
+            slo_ms=5,
+        )
+
+    # 512 is clamped to the model's max_seq_length
+    assert sorted(table) == [64, 128]
+    assert table[64]["batch_size"] == 16
+    assert table[128]["batch_size"] == 8
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    with patch("app.autotune.AUTOTUNE_CACHE_DIR", str(tmp_path)):
+        yield tmp_path
+
+
+def test_tune_persists_and_reuses_table(cache_dir):
+    model = MagicMock()
+    with (
+        patch("app.autotune.profile", return_value=TABLE) as profile,
+        patch("app.autotune.host_fingerprint", return_value={"cpu_count": 4}),
+    ):
+        autotune.tune("org/model-a", model, "embedding")
+        assert profile.call_count == 1
+
+        saved = json.loads((cache_dir / "org--model-a.json").read_text())
+        assert saved["buckets"]["512"]["batch_size"] == 8
+        assert saved["host"] == {"cpu_count": 4}
+
+        # A restart on the same host loads the persisted table
+        table = autotune.tune("org/model-a", MagicMock(), "embedding")
+        assert profile.call_count == 1
+        assert table.batch_size_for(100) == 8
+
+    # A different host re-profiles
+    with (
+        patch("app.autotune.profile", return_value=TABLE) as profile,
+        patch("app.autotune.host_fingerprint", return_value={"cpu_count": 64}),
+    ):
+        autotune.tune("org/model-a", MagicMock(), "embedding")
+        assert profile.call_count == 1
+
+
+def test_tuned_batch_size_is_used_and_exposed(cache_dir):
+    model = MagicMock()
+    model.encode.side_effect = lambda texts, **kwargs: np.ones((len(texts), 2))
+    model.tokenizer.side_effect = lambda texts, **kwargs: {
+        "input_ids": [[1] * len(t) for t in texts]
+    }
+    with (
+        patch("app.autotune.profile", return_value=TABLE),
+        patch("app.autotune.host_fingerprint", return_value={}),
+    ):
+        autotune.tune("org/model-b", model, "embedding")
+
+    inference.encode(model, ["short", "x" * 100], INTERACTIVE)
+    model.encode.assert_called_once_with(["short", "x" * 100], batch_size=8)
+
+    # Untuned models keep the library default
+    untuned = MagicMock()
+    inference.encode(untuned, ["a"], INTERACTIVE)
+    untuned.encode.assert_called_once_with(["a"])
+
+    response = client.get("/v1/autotune", params={"model": "org/model-b"})
+    assert response.status_code == 200
+    (entry,) = response.json()["data"]
+    assert entry["model"] == "org/model-b"
+    assert entry["buckets"]["64"]["batch_size"] == 64
+
+    assert client.get("/v1/autotune", params={"model": "unknown"}).status_code == 404
@@ -0,0 +1,199 @@
+import asyncio
+import json
+import threading
+import time
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock
+
+from app.main import app
+from app.config import EMBEDDING_MODELS
+from app import cancellation
+from app.cancellation import CancelToken, RequestCancelled, cancelled_requests
+from app.scheduler import Scheduler, BULK, INTERACTIVE
+
+client = TestClient(app)
+
+SUPPORTED_EMBEDDING_MODEL = EMBEDDING_MODELS[0]
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_cancel_token_reasons():
+    CancelToken().check()
+
+    with pytest.raises(RequestCancelled) as exc:
+        CancelToken(deadline=time.monotonic() - 1).check()
+    assert exc.value.reason == cancellation.DEADLINE
+
+    with pytest.raises(RequestCancelled) as exc:
+        CancelToken(is_disconnected=lambda: True).check()
+    assert exc.value.reason == cancellation.DISCONNECT
+
+
+def test_disconnect_drops_queued_work():
+    sched = Scheduler(max_concurrency=1)
+    release = threading.Event()
+
+    def busy():
+        with sched.slot(BULK):
+            release.wait(5)
+
+    holder = threading.Thread(target=busy)
+    holder.start()
+    wait_until(lambda: sched.running == 1)
+
+    disconnected = threading.Event()
+    errors = []
+    before = cancelled_requests.value(reason="disconnect", stage="queued")
+
+    def queued():
+        token = CancelToken(is_disconnected=disconnected.is_set)
+        with cancellation.bind(token):
+            try:
+                with sched.slot(INTERACTIVE):
+                    pass
+            except RequestCancelled as e:
+                errors.append(e)
+
+    waiter = threading.Thread(target=queued)
+    waiter.start()
+    wait_until(lambda: sched.waiting(INTERACTIVE) == 1)
+    disconnected.set()
+    waiter.join(5)
+
+    assert len(errors) == 1
+    assert sched.waiting(INTERACTIVE) == 0
+    assert cancelled_requests.value(reason="disconnect", stage="queued") == before + 1
+    release.set()
+    holder.join(5)
+
+
+@pytest.fixture
+def slow_model():
+    with patch("app.main.get_model") as mock:
+        model = MagicMock()
+
+        def slow_encode(texts):
+            time.sleep(0.1)
+            return np.ones((len(texts), 3))
+
+        model.encode.side_effect = slow_encode
+        model.tokenizer.side_effect = lambda texts, **kwargs: {
+            "input_ids": [[1] for _ in texts]
+        }
+        model.tokenizer.num_special_tokens_to_add.return_value = 0
+        model.max_seq_length = 512
+        mock.return_value = model
+        yield model
+
+
+def test_request_timeout_aborts_at_sub_batch_boundary(slow_model):
+    before = cancelled_requests.value(reason="deadline", stage="running")
+    with patch("app.inference.SCHEDULER_SUB_BATCH_SIZE", 1):
+        response = client.post(
+            "/v1/embeddings",
+            json={
+                "input": ["a", "b", "c", "d", "e"],
+                "model": SUPPORTED_EMBEDDING_MODEL,
+                "input_type": "document",
+            },
+            headers={"X-Request-Timeout": "0.15"},
+        )
+    assert response.status_code == 504
+    assert slow_model.encode.call_count < 5
+    assert cancelled_requests.value(reason="deadline", stage="running") == before + 1
+
+
+def test_request_timeout_header_validation(slow_model):
+    for value in ["abc", "0", "-1"]:
+        response = client.post(
+            "/v1/embeddings",
+            json={"input": "a", "model": SUPPORTED_EMBEDDING_MODEL},
+            headers={"X-Request-Timeout": value},
+        )
+        assert response.status_code == 400
+
+    response = client.post(
+        "/v1/embeddings",
+        json={"input": "a", "model": SUPPORTED_EMBEDDING_MODEL},
+        headers={"X-Request-Timeout": "30"},
+    )
+    assert response.status_code == 200
+
+
+def test_client_disconnect_cancels_work_on_inference_threads(slow_model):
+    """
+    The disconnect is noticed on the event loop, so work running on the
+    inference pool (the second model of a multi-model request) stops at its
+    next sub-batch too.
+    """
+    fast_model = MagicMock()
+    fast_model.encode.side_effect = lambda texts: np.ones((len(texts), 3))
+    fast_model.tokenizer = slow_model.tokenizer
+    fast_model.max_seq_length = 512
+    models = {EMBEDDING_MODELS[0]: fast_model, EMBEDDING_MODELS[1]: slow_model}
+    body = json.dumps(
+        {
+            "input": list("abcdefghijklmnop"),
+            "model": EMBEDDING_MODELS[:2],
+            "input_type": "document",
+        }
+    ).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/v1/embeddings",
+        "raw_path": b"/v1/embeddings",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json")],
+        "client": ("test", 1),
+        "server": ("test", 80),
+    }
+    statuses = []
+
+    async def run():
+        body_sent = False
+        disconnected = asyncio.Event()
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+
+        request = asyncio.create_task(app(scope, receive, send))
+        # Disconnect once only the pool thread is still working
+        while fast_model.encode.call_count < 16 or slow_model.encode.call_count == 0:
+            await asyncio.sleep(0.005)
+        disconnected.set()
+        await request
+
+    before = cancelled_requests.value(reason="disconnect", stage="running")
+    with (
+        patch("app.main.get_model", side_effect=models.__getitem__),
+        patch("app.inference.SCHEDULER_SUB_BATCH_SIZE", 1),
+        # Let both models run at once, so the fast one finishes first
+        patch("app.inference.scheduler", Scheduler(max_concurrency=2)),
+    ):
+        asyncio.run(run())
+    assert slow_model.encode.call_count < 16
+    assert statuses != [200]
+    assert cancelled_requests.value(reason="disconnect", stage="running") == before + 1
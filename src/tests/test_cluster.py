@@ -0,0 +1,157 @@
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+from app.main import app
+from app.config import EMBEDDING_MODELS
+from app.clustering import VectorBuffer, agglomerative, minibatch_kmeans
+from app.index import normalize
+
+client = TestClient(app)
+
+SUPPORTED_EMBEDDING_MODEL = EMBEDDING_MODELS[0]
+
+# Texts "<topic>-<n>" embed near one of three orthogonal topic vectors.
+TOPICS = {"sports": 0, "food": 1, "music": 2}
+
+
+def embed(text):
+    text = text.split(": ", 1)[-1]
+    topic, n = text.split("-")
+    vector = np.full(3, 0.05 * (int(n) % 3))
+    vector[TOPICS[topic]] = 1.0
+    return vector
+
+
+@pytest.fixture
+def mock_model(fake_model):
+    return fake_model(encode=lambda texts: np.array([embed(t) for t in texts]))
+
+
+def blobs(n_per_cluster, k, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = normalize(rng.normal(size=(k, dim)))
+    vectors = np.repeat(centers, n_per_cluster, axis=0)
+    vectors = normalize(vectors + 0.1 * rng.normal(size=vectors.shape))
+    truth = np.repeat(np.arange(k), n_per_cluster)
+    order = rng.permutation(len(vectors))
+    return vectors[order], truth[order]
+
+
+def assert_same_partition(labels, truth):
+    assert len(set(zip(labels.tolist(), truth.tolist()))) == len(set(truth.tolist()))
+
+
+def test_minibatch_kmeans_recovers_blobs_from_float16():
+    vectors, truth = blobs(300, 6)
+    labels, centroids = minibatch_kmeans(
+        vectors.astype(np.float16), 6, batch_size=128, seed=3
+    )
+    assert_same_partition(labels, truth)
+    assert labels[0] == 0
+    assert centroids.shape == (6, 16)
+    np.testing.assert_allclose(np.linalg.norm(centroids, axis=1), 1.0, rtol=1e-5)
+
+
+def test_agglomerative_recovers_blobs():
+    vectors, truth = blobs(20, 4)
+    labels, centroids = agglomerative(vectors, 4)
+    assert_same_partition(labels, truth)
+    assert centroids.shape == (4, 16)
+    # k larger than n: every input is its own cluster
+    assert agglomerative(vectors[:3], 10)[0].tolist() == [0, 1, 2]
+
+
+def test_vector_buffer_is_bounded():
+    buffer = VectorBuffer(5)
+    buffer.append(np.ones((3, 2)))
+    buffer.append(np.ones((2, 2)))
+    assert buffer.vectors.shape == (5, 2)
+    assert buffer.vectors.dtype == np.float16
+    with pytest.raises(OverflowError):
+        buffer.append(np.ones((1, 2)))
+
+
+def test_cluster_endpoint(mock_model):
+    texts = ["sports-1", "food-1", "sports-2", "music-1", "food-2", "music-2"]
+    response = client.post(
+        "/v1/cluster",
+        json={
+            "input": texts,
+            "model": SUPPORTED_EMBEDDING_MODEL,
+            "n_clusters": 3,
+            "return_centroids": True,
+        },
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["method"] == "agglomerative"
+    assert body["labels"] == [0, 1, 0, 2, 1, 2]
+    assert body["sizes"] == [2, 2, 2]
+    assert np.array(body["centroids"]).shape == (3, 3)
+    assert body["usage"]["total_tokens"] == 12
+
+    encoded = mock_model.encode.call_args[0][0]
+    if "ruri-v3" in SUPPORTED_EMBEDDING_MODEL:
+        assert encoded[0] == "トピック: sports-1"
+
+
+def test_cluster_endpoint_validation(mock_model):
+    response = client.post("/v1/cluster", json={"input": ["sports-1"], "model": "nope"})
+    assert response.status_code == 400
+    response = client.post(
+        "/v1/cluster",
+        json={
+            "input": ["sports-1"],
+            "model": SUPPORTED_EMBEDDING_MODEL,
+            "n_clusters": 0,
+        },
+    )
+    assert response.status_code == 422
+
+
+def test_cluster_stream_beyond_max_input_items(mock_model):
+    topics = list(TOPICS)
+    lines = [
+        json.dumps(f"{topics[i % 3]}-{i}")
+        if i % 2
+        else json.dumps({"input": f"{topics[i % 3]}-{i}"})
+        for i in range(30)
+    ]
+    body = ("\n".join(lines) + "\n").encode()
+    with patch("app.main.MAX_INPUT_ITEMS", 8):
+        response = client.post(
+            "/v1/cluster/stream",
+            params={
+                "model": SUPPORTED_EMBEDDING_MODEL,
+                "n_clusters": 3,
+                "method": "kmeans",
+            },
+            content=body,
+        )
+    assert response.status_code == 200
+    result = response.json()
+    assert result["method"] == "kmeans"
+    assert result["labels"] == [0, 1, 2] * 10
+    assert result["usage"]["total_tokens"] == 60
+    # Embedded MAX_INPUT_ITEMS at a time while the upload is read
+    assert [len(c[0][0]) for c in mock_model.encode.call_args_list] == [8, 8, 8, 6]
+
+
+def test_cluster_stream_limits(mock_model):
+    params = {"model": SUPPORTED_EMBEDDING_MODEL}
+    with patch("app.main.CLUSTER_MAX_INPUTS", 4):
+        response = client.post(
+            "/v1/cluster/stream",
+            params=params,
+            content="\n".join(json.dumps(f"food-{i}") for i in range(5)),
+        )
+    assert response.status_code == 413
+
+    response = client.post("/v1/cluster/stream", params=params, content="[1, 2]\n")
+    assert response.status_code == 422
+    response = client.post("/v1/cluster/stream", params=params, content="")
+    assert response.status_code == 422
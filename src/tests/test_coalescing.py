@@ -0,0 +1,125 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.config import EMBEDDING_MODELS, RERANK_MODELS
+from app.coalesce import SingleFlight, deduplicate, coalesced_requests
+
+client = TestClient(app)
+
+SUPPORTED_EMBEDDING_MODEL = EMBEDDING_MODELS[0]
+SUPPORTED_RERANK_MODEL = RERANK_MODELS[0]
+
+
+@pytest.fixture
+def mock_model(fake_model):
+    return fake_model(
+        encode=lambda texts: np.array([[float(len(t)), 1.0] for t in texts]),
+        predict=lambda pairs: [float(len(d)) for _, d in pairs],
+    )
+
+
+def test_deduplicate():
+    unique, inverse = deduplicate(["a", "b", "a", "c", "b"])
+    assert unique == ["a", "b", "c"]
+    assert inverse.tolist() == [0, 1, 0, 2, 1]
+
+
+def test_single_flight_shares_result_and_error():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", slow)))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(flight.do("k", slow)))
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert len(calls) == 1
+    assert sorted(results) == [("result", False), ("result", True)]
+
+    # Once finished, the key runs again; errors propagate to the caller.
+    with pytest.raises(RuntimeError):
+        flight.do("k", lambda: (_ for _ in ()).throw(RuntimeError("boom")))
+    assert flight.do("k", lambda: "again") == ("again", False)
+
+
+def test_concurrent_identical_embeddings_share_one_encode(mock_model):
+    release = threading.Event()
+    encode = mock_model.encode.side_effect
+
+    def slow_encode(texts):
+        release.wait(5)
+        return encode(texts)
+
+    mock_model.encode.side_effect = slow_encode
+    before = coalesced_requests.value(endpoint="embeddings")
+    payload = {"input": ["same", "payload"], "model": SUPPORTED_EMBEDDING_MODEL}
+
+    responses = []
+    threads = [
+        threading.Thread(
+            target=lambda: responses.append(client.post("/v1/embeddings", json=payload))
+        )
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.3)
+    release.set()
+    for thread in threads:
+        thread.join(10)
+
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert len({r.text for r in responses}) == 1
+    assert mock_model.encode.call_count == 1
+    assert coalesced_requests.value(endpoint="embeddings") == before + 2
+
+
+def test_duplicate_inputs_are_encoded_once(mock_model):
+    response = client.post(
+        "/v1/embeddings",
+        json={"input": ["aa", "b", "aa", "aa"], "model": SUPPORTED_EMBEDDING_MODEL},
+    )
+    assert response.status_code == 200
+    mock_model.encode.assert_called_once_with(["aa", "b"])
+
+    data = response.json()["data"]
+    assert [item["index"] for item in data] == [0, 1, 2, 3]
+    assert data[0]["embedding"] == data[2]["embedding"] == data[3]["embedding"]
+    assert data[1]["embedding"] != data[0]["embedding"]
+    # Usage still counts every input
+    assert response.json()["usage"]["total_tokens"] == 8
+
+
+def test_duplicate_rerank_documents_are_scored_once(mock_model):
+    response = client.post(
+        "/v1/rerank",
+        json={
+            "query": "q",
+            "documents": ["long doc", "x", "long doc"],
+            "model": SUPPORTED_RERANK_MODEL,
+        },
+    )
+    assert response.status_code == 200
+    mock_model.predict.assert_called_once_with([["q", "long doc"], ["q", "x"]])
+    data = response.json()["data"]
+    assert [item["document"] for item in data] == [0, 2, 1]
+    assert data[0]["score"] == data[1]["score"] == 8.0
@@ -0,0 +1,172 @@
+import threading
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+from app.main import app
+from app.config import EMBEDDING_MODELS
+from app.index import FlatIndex, IVFIndex, kmeans, normalize
+from app.store import Collection, collection_store
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def mock_embedding_model(fake_model):
+    return fake_model(tokens=3, special_tokens=2, max_length=8192)
+
+
+@pytest.fixture
+def collection_name():
+    name = "test-collection"
+    yield name
+    collection_store.delete(name)
+
+
+def test_kmeans_separates_clusters():
+    rng = np.random.default_rng(0)
+    centers = normalize(rng.normal(size=(4, 16)))
+    points = normalize(
+        np.repeat(centers, 50, axis=0) + 0.01 * rng.normal(size=(200, 16))
+    )
+    centroids = kmeans(points, 4)
+    # Every true center should have a learned centroid next to it.
+    assert np.all((centers @ centroids.T).max(axis=1) > 0.99)
+
+
+def test_ivf_full_probe_matches_exact_search():
+    rng = np.random.default_rng(1)
+    data = rng.normal(size=(2000, 32)).astype(np.float32)
+    queries = rng.normal(size=(5, 32)).astype(np.float32)
+    ids = np.arange(len(data))
+
+    flat = FlatIndex(32)
+    flat.add(data, ids)
+    ivf = IVFIndex(32, nlist=16, nprobe=4, min_train_size=500)
+    # Incremental inserts: the index trains itself once it has enough vectors.
+    for start in range(0, len(data), 250):
+        ivf.add(data[start : start + 250], ids[start : start + 250])
+
+    assert ivf.is_trained
+    assert len(ivf) == len(data)
+
+    _, exact_ids = flat.search(queries, 10)
+    _, ivf_ids = ivf.search(queries, 10, nprobe=len(ivf.centroids))
+    np.testing.assert_array_equal(exact_ids, ivf_ids)
+
+
+def test_ivf_untrained_falls_back_to_exact():
+    ivf = IVFIndex(4, nlist=8, nprobe=1, min_train_size=100)
+    ivf.add(np.eye(4), np.arange(4))
+    scores, ids = ivf.search(np.array([[0.0, 1.0, 0.0, 0.0]]), 6)
+    assert not ivf.is_trained
+    assert ids[0][0] == 1
+    assert ids[0][-1] == -1  # Unfilled slots are padded
+    assert scores[0][-1] == -np.inf
+
+
+def test_collection_reports_training_state():
+    ivf = Collection("c", "m", "ivf")
+    assert ivf.info()["trained"] is False
+    ivf.add(np.eye(4), ["a", "b", "c", "d"])
+    assert ivf.info()["trained"] is False
+    assert Collection("c", "m", "flat").info()["trained"] is True
+
+
+def test_collection_trains_without_blocking_adds_and_searches():
+    rng = np.random.default_rng(2)
+    data = rng.normal(size=(300, 8)).astype(np.float32)
+    collection = Collection("c", "m", "ivf", nlist=4, nprobe=4)
+    fitting, release = threading.Event(), threading.Event()
+    fit = IVFIndex.fit
+
+    def slow_fit(index, vectors):
+        fitting.set()
+        release.wait(5)
+        return fit(index, vectors)
+
+    with (
+        patch("app.store.ANN_IVF_MIN_TRAIN_SIZE", 200),
+        patch.object(IVFIndex, "fit", slow_fit),
+    ):
+        collection.add(data[:100], ["x"] * 100)
+        trainer = threading.Thread(
+            target=collection.add, args=(data[100:200], ["x"] * 100)
+        )
+        trainer.start()
+        assert fitting.wait(5)
+
+        # k-means runs outside the collection lock
+        assert collection.add(data[200:], ["x"] * 100)[0] == 200
+        assert len(collection.search(data[:1], 5)) == 5
+        assert collection.info()["trained"] is False
+
+        release.set()
+        trainer.join(5)
+    assert collection.info()["trained"] is True
+    # Vectors added while training were bucketed under the new quantizer
+    _, ids = collection.index.search(data[250:251], 1, nprobe=4)
+    assert ids[0][0] == 250
+
+
+def test_collection_add_and_search(mock_embedding_model, collection_name):
+    response = client.post(
+        "/v1/collections",
+        json={"name": collection_name, "model": EMBEDDING_MODELS[0]},
+    )
+    assert response.status_code == 200
+    assert response.json()["count"] == 0
+    assert response.json()["trained"] is False
+
+    response = client.post(
+        f"/v1/collections/{collection_name}/documents",
+        json={"documents": ["猫の生態", "犬の散歩", "東京の天気", "AIの未来"]},
+    )
+    assert response.status_code == 200
+    assert response.json()["ids"] == [0, 1, 2, 3]
+    # Documents are embedded with the document prefix for ruri-v3 models
+    mock_embedding_model.encode.assert_called_with(
+        [
+            "検索文書: 猫の生態",
+            "検索文書: 犬の散歩",
+            "検索文書: 東京の天気",
+            "検索文書: AIの未来",
+        ]
+    )
+
+    response = client.post(
+        f"/v1/collections/{collection_name}/search",
+        json={"query": "東京", "top_k": 2},
+    )
+    assert response.status_code == 200
+    mock_embedding_model.encode.assert_called_with(["検索クエリ: 東京"])
+    data = response.json()["data"]
+    assert len(data) == 2
+    assert data[0]["document"] == 2
+    assert data[0]["text"] == "東京の天気"
+
+
+def test_collection_errors(mock_embedding_model, collection_name):
+    response = client.post(
+        "/v1/collections", json={"name": collection_name, "model": "unknown-model"}
+    )
+    assert response.status_code == 400
+
+    response = client.post(
+        f"/v1/collections/{collection_name}/search", json={"query": "東京"}
+    )
+    assert response.status_code == 404
+
+    client.post(
+        "/v1/collections", json={"name": collection_name, "model": EMBEDDING_MODELS[0]}
+    )
+    response = client.post(
+        "/v1/collections", json={"name": collection_name, "model": EMBEDDING_MODELS[0]}
+    )
+    assert response.status_code == 400
+    assert "already exists" in response.json()["detail"]
+
+    assert client.delete(f"/v1/collections/{collection_name}").status_code == 200
+    assert client.get(f"/v1/collections/{collection_name}").status_code == 404
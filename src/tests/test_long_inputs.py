@@ -0,0 +1,148 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock
+
+from app.main import app
+
+client = TestClient(app)
+
+RURI_MODEL = "cl-nagoya/ruri-v3-30m"
+
+
+def char_tokenizer(texts, **kwargs):
+    return {"input_ids": [[ord(c) for c in t] for t in texts]}
+
+
+def fake_encode(texts):
+    # Each window's vector counts its "A" and "B" characters.
+    return np.array([[t.count("A"), t.count("B")] for t in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def mock_model():
+    with patch("app.main.get_model") as mock:
+        model = MagicMock()
+        model.encode.side_effect = fake_encode
+        model.tokenizer.side_effect = char_tokenizer
+        model.tokenizer.decode.side_effect = lambda ids: "".join(chr(i) for i in ids)
+        model.tokenizer.num_special_tokens_to_add.return_value = 0
+        model.max_seq_length = 10
+        mock.return_value = model
+        yield model
+
+
+def test_truncate_is_default(mock_model):
+    response = client.post(
+        "/v1/embeddings", json={"input": "A" * 12 + "B" * 8, "model": RURI_MODEL}
+    )
+    assert response.status_code == 200
+    mock_model.encode.assert_called_once_with(["A" * 10])
+    assert "chunks" not in response.json()["data"][0]
+
+
+def test_chunk_all_embeds_every_window_in_one_pass(mock_model):
+    response = client.post(
+        "/v1/embeddings",
+        json={
+            "input": ["A" * 10 + "B" * 10, "short"],
+            "model": RURI_MODEL,
+            "long_input_strategy": "chunk_all",
+            "chunk_overlap": 0,
+        },
+    )
+    assert response.status_code == 200
+    mock_model.encode.assert_called_once_with(["A" * 10, "B" * 10, "short"])
+
+    data = response.json()["data"]
+    assert len(data) == 2
+    assert data[0]["chunks"] == [
+        {"embedding": [10.0, 0.0], "start": 0, "end": 10},
+        {"embedding": [0.0, 10.0], "start": 10, "end": 20},
+    ]
+    # Pooled vector is the token-weighted mean of the windows
+    assert data[0]["embedding"] == [5.0, 5.0]
+    assert data[1]["chunks"] == [{"embedding": [0.0, 0.0], "start": 0, "end": 5}]
+    # No tokens are dropped: 20 + 5
+    assert response.json()["usage"]["total_tokens"] == 25
+
+
+def test_chunk_mean_repeats_prefix_per_window(mock_model):
+    response = client.post(
+        "/v1/embeddings",
+        json={
+            "input": "A" * 8,
+            "model": RURI_MODEL,
+            "input_type": "sts",
+            "long_input_strategy": "chunk_mean",
+        },
+    )
+    assert response.status_code == 200
+    assert "chunks" not in response.json()["data"][0]
+
+    # "検索クエリ: " is 7 chars, leaving 3 content tokens per window
+    mock_model.encode.reset_mock()
+    client.post(
+        "/v1/embeddings",
+        json={
+            "input": "ABCDE",
+            "model": RURI_MODEL,
+            "input_type": "query",
+            "long_input_strategy": "chunk_mean",
+            "chunk_overlap": 1,
+        },
+    )
+    mock_model.encode.assert_called_once_with(["検索クエリ: ABC", "検索クエリ: CDE"])
+
+
+def test_empty_input_with_chunking_matches_truncate(mock_model):
+    expected = client.post("/v1/embeddings", json={"input": [], "model": RURI_MODEL})
+    assert expected.status_code == 200
+    for strategy in ("chunk_mean", "chunk_all"):
+        response = client.post(
+            "/v1/embeddings",
+            json={"input": [], "model": RURI_MODEL, "long_input_strategy": strategy},
+        )
+        assert response.status_code == 200
+        assert response.json() == expected.json()
+
+
+def test_default_overlap_is_kept_within_the_window(mock_model):
+    response = client.post(
+        "/v1/embeddings",
+        json={
+            "input": "A" * 20,
+            "model": RURI_MODEL,
+            "long_input_strategy": "chunk_all",
+        },
+    )
+    assert response.status_code == 200
+    # CHUNK_OVERLAP (64) is cut to half of the 10-token window
+    spans = [(c["start"], c["end"]) for c in response.json()["data"][0]["chunks"]]
+    assert spans == [(0, 10), (5, 15), (10, 20)]
+
+
+def test_chunking_rejects_overlap_and_window_blowup(mock_model):
+    def embed(overlap):
+        return client.post(
+            "/v1/embeddings",
+            json={
+                "input": "A" * 40,
+                "model": RURI_MODEL,
+                "long_input_strategy": "chunk_mean",
+                "chunk_overlap": overlap,
+            },
+        )
+
+    # The overlap must leave a stride within the model's 10-token window
+    for overlap in (10, 10000):
+        response = embed(overlap)
+        assert response.status_code == 422
+        assert "chunk_overlap" in response.json()["detail"]
+
+    with patch("app.main.MAX_CHUNK_WINDOWS", 5):
+        assert embed(0).status_code == 200
+        response = embed(5)
+    assert response.status_code == 422
+    assert "7 windows" in response.json()["detail"]
+    mock_model.encode.assert_called_once()
@@ -0,0 +1,122 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock
+
+from app import memory
+from app.config import EMBEDDING_MODELS
+from app.main import app
+from app.memory import MemoryBudgetExceeded, fit_batch_size, model_shape
+
+client = TestClient(app)
+
+MB = 1024 * 1024
+
+
+def make_model(attn_implementation="sdpa"):
+    """
+    Embedding model mock with a BERT config; one token per character.
+    """
+    model = MagicMock()
+    model._first_module.return_value.auto_model.config = SimpleNamespace(
+        hidden_size=256,
+        num_hidden_layers=4,
+        num_attention_heads=8,
+        intermediate_size=1024,
+        _attn_implementation=attn_implementation,
+    )
+    model.max_seq_length = 512
+    model.get_sentence_embedding_dimension.return_value = 256
+    model.tokenizer.side_effect = lambda texts, *args, **kwargs: {
+        "input_ids": [[ord(c) for c in t] for t in texts]
+    }
+    model.tokenizer.num_special_tokens_to_add.return_value = 2
+    model.encode.side_effect = lambda texts, **kwargs: np.ones((len(texts), 256))
+    return model
+
+
+def test_model_shape_reads_config():
+    shape = model_shape(make_model())
+    assert shape.hidden_size == 256
+    assert shape.intermediate_size == 1024
+    assert shape.output_dim == 256
+    assert shape.max_length == 512
+    assert not shape.eager_attention
+    assert model_shape(make_model("eager")).eager_attention
+
+    # Unreadable configs fall back to BERT-base dimensions
+    assert model_shape(MagicMock()).hidden_size == memory.DEFAULT_SHAPE.hidden_size
+
+
+def test_prediction_grows_with_batch_and_sequence():
+    shape = model_shape(make_model())
+    assert memory.forward_bytes(shape, 2, 512) == 2 * memory.forward_bytes(
+        shape, 1, 512
+    )
+    # Inputs are truncated to max_length; only the tokenizer sees the rest
+    long = memory.forward_bytes(shape, 1, 4096)
+    assert long - memory.forward_bytes(shape, 1, 512) == (
+        (4096 - 512) * memory.TOKENIZER_BYTES_PER_TOKEN
+    )
+    # Eager attention materializes (seq x seq) scores
+    eager = model_shape(make_model("eager"))
+    assert memory.forward_bytes(eager, 1, 512) > memory.forward_bytes(shape, 1, 512)
+
+
+def test_fit_batch_size_splits_then_rejects():
+    model = make_model()
+    texts = ["x" * 500] * 64
+    shape = model_shape(model)
+    full = memory.predicted_peak_bytes(shape, 64, 32, 502)
+
+    assert fit_batch_size(model, texts, 32, budget_bytes=0) == 32
+    assert fit_batch_size(model, texts, 32, budget_bytes=full) == 32
+
+    budget = memory.predicted_peak_bytes(shape, 64, 8, 502)
+    assert fit_batch_size(model, texts, 32, budget_bytes=budget) == 8
+
+    with pytest.raises(MemoryBudgetExceeded):
+        fit_batch_size(model, texts, 32, budget_bytes=memory.output_bytes(shape, 64))
+
+
+@patch("app.main.get_model")
+def test_embeddings_split_or_rejected_by_budget(mock_get_model):
+    model = make_model()
+    mock_get_model.return_value = model
+    # Distinct inputs, so deduplication does not shrink the call
+    payload = {
+        "input": [chr(0x3041 + i) * 500 for i in range(16)],
+        "model": EMBEDDING_MODELS[0],
+    }
+
+    # Encoding all 16 inputs in one batch needs about 100MB with this model
+    with patch("app.memory.MEMORY_BUDGET_MB", 20):
+        response = client.post("/v1/embeddings", json=payload)
+    assert response.status_code == 200
+    assert model.encode.call_args.kwargs["batch_size"] < 16
+    assert memory.memory_guard.value(action="split") >= 1
+
+    with patch("app.memory.MEMORY_BUDGET_MB", 1):
+        response = client.post(
+            "/v1/embeddings",
+            json={**payload, "input": [chr(0x30A1 + i) * 500 for i in range(16)]},
+        )
+    assert response.status_code == 413
+    assert "memory budget" in response.json()["detail"]
+
+
+@patch("app.main.get_model")
+def test_no_budget_keeps_default_batch_size(mock_get_model):
+    model = make_model()
+    mock_get_model.return_value = model
+    response = client.post(
+        "/v1/embeddings",
+        json={
+            "input": [chr(0x3061 + i) * 500 for i in range(16)],
+            "model": EMBEDDING_MODELS[0],
+        },
+    )
+    assert response.status_code == 200
+    assert "batch_size" not in model.encode.call_args.kwargs
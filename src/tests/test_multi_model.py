@@ -0,0 +1,124 @@
+import threading
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock
+
+from app.main import app
+from app.tokenization import token_cache, tokenize, tokenizer_fingerprint
+
+client = TestClient(app)
+
+MODELS = ["cl-nagoya/ruri-v3-30m", "cl-nagoya/ruri-v3-310m"]
+
+
+def make_model(tokenizer, dim, threads):
+    model = MagicMock()
+
+    def encode(texts):
+        threads.append(threading.current_thread().name)
+        return np.full((len(texts), dim), float(dim))
+
+    model.encode.side_effect = encode
+    model.tokenizer = tokenizer
+    model.max_seq_length = 512
+    return model
+
+
+def make_tokenizer():
+    tokenizer = MagicMock()
+    tokenizer.side_effect = lambda texts, **kwargs: {
+        "input_ids": [[1, 2, 3] for _ in texts]
+    }
+    tokenizer.num_special_tokens_to_add.return_value = 2
+    return tokenizer
+
+
+@pytest.fixture
+def models():
+    token_cache.clear()
+    threads = []
+    tokenizer = make_tokenizer()
+    loaded = {
+        MODELS[0]: make_model(tokenizer, 2, threads),
+        MODELS[1]: make_model(tokenizer, 3, threads),
+    }
+    with (
+        patch("app.main.EMBEDDING_MODELS", MODELS),
+        patch("app.main.get_model", side_effect=loaded.__getitem__),
+    ):
+        yield loaded, tokenizer, threads
+
+
+def test_tokenizer_fingerprint_by_content():
+    first, second, other = MagicMock(), MagicMock(), MagicMock()
+    first.backend_tokenizer.to_str.return_value = '{"vocab": ["a", "b"]}'
+    second.backend_tokenizer.to_str.return_value = '{"vocab": ["a", "b"]}'
+    other.backend_tokenizer.to_str.return_value = '{"vocab": ["a", "c"]}'
+    assert tokenizer_fingerprint(first) == tokenizer_fingerprint(second)
+    assert tokenizer_fingerprint(first) != tokenizer_fingerprint(other)
+
+    # Equal tokenizers share token cache entries
+    token_cache.clear()
+    first.side_effect = lambda texts, **kwargs: {"input_ids": [[7] for _ in texts]}
+    tokenize(first, ["shared text"])
+    assert tokenize(second, ["shared text"])[0].tolist() == [7]
+    second.assert_not_called()
+
+    # Tokenizers that cannot be serialized are keyed by identity
+    plain = MagicMock()
+    assert tokenizer_fingerprint(plain) is plain
+
+
+def test_multi_model_embeddings_share_tokenization(models):
+    loaded, tokenizer, threads = models
+    response = client.post(
+        "/v1/embeddings",
+        json={"input": ["一つ目", "二つ目"], "model": MODELS, "input_type": "document"},
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["model"] == MODELS
+
+    first, second = body["data"]
+    assert first["model"] == MODELS[0]
+    assert first["data"][1]["embedding"] == [2.0, 2.0]
+    assert second["model"] == MODELS[1]
+    assert second["data"][0]["embedding"] == [3.0, 3.0, 3.0]
+    assert first["usage"]["total_tokens"] == 10
+    assert body["usage"]["total_tokens"] == 20
+
+    # One tokenization for both models, and both see the same prefixed texts
+    assert tokenizer.call_count == 1
+    expected = ["検索文書: 一つ目", "検索文書: 二つ目"]
+    loaded[MODELS[0]].encode.assert_called_once_with(expected)
+    loaded[MODELS[1]].encode.assert_called_once_with(expected)
+
+    # The second encode ran on the inference pool
+    assert any(name.startswith("inference") for name in threads)
+
+
+def test_multi_model_embeddings_separate_tokenizers(models):
+    loaded, tokenizer, _ = models
+    other = make_tokenizer()
+    loaded[MODELS[1]].tokenizer = other
+    response = client.post(
+        "/v1/embeddings", json={"input": "テキスト", "model": MODELS}
+    )
+    assert response.status_code == 200
+    assert tokenizer.call_count == 1
+    assert other.call_count == 1
+
+
+def test_multi_model_embeddings_validation(models):
+    response = client.post(
+        "/v1/embeddings", json={"input": "x", "model": [MODELS[0], MODELS[0]]}
+    )
+    assert response.status_code == 422
+    response = client.post("/v1/embeddings", json={"input": "x", "model": []})
+    assert response.status_code == 422
+    response = client.post(
+        "/v1/embeddings", json={"input": "x", "model": [MODELS[0], "unknown"]}
+    )
+    assert response.status_code == 400
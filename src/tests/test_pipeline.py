@@ -0,0 +1,112 @@
+import threading
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import torch
+
+from app import inference
+from app.pipeline import pipelined_encode, install_pipelined_encode
+from app.scheduler import BULK, scheduler
+
+
+class FakeSentenceModel:
+    """
+    Minimal stand-in for SentenceTransformer: "tokenizes" to character
+    codes and embeds a text as (length, sum of codes).
+    """
+
+    device = torch.device("cpu")
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.tokenize_threads = set()
+        self.forward_batches = []
+
+    def _text_length(self, text):
+        return len(text)
+
+    def tokenize(self, texts):
+        self.tokenize_threads.add(threading.current_thread().name)
+        if self.fail_on in texts:
+            raise RuntimeError("tokenizer failed")
+        width = max(len(t) for t in texts)
+        ids = torch.zeros((len(texts), width))
+        for i, t in enumerate(texts):
+            ids[i, : len(t)] = torch.tensor([float(ord(c)) for c in t])
+        lengths = torch.tensor([[float(len(t))] for t in texts])
+        return {"ids": ids, "lengths": lengths}
+
+    def forward(self, features):
+        self.forward_batches.append(len(features["ids"]))
+        embedding = torch.cat(
+            [features["lengths"], features["ids"].sum(dim=1, keepdim=True)], dim=1
+        )
+        return {"sentence_embedding": embedding}
+
+    def encode(self, sentences, batch_size=32, **kwargs):
+        return np.array(
+            [[len(s), sum(map(ord, s))] for s in sentences], dtype=np.float32
+        )
+
+
+TEXTS = ["a" * (i % 7 + 1) + chr(65 + i % 26) for i in range(50)]
+
+
+def test_pipelined_encode_matches_sequential_order():
+    model = FakeSentenceModel()
+    vectors = pipelined_encode(model, TEXTS, batch_size=8, prefetch=2)
+    np.testing.assert_allclose(vectors, model.encode(TEXTS))
+    # Batches are tokenized on the prefetch thread
+    assert model.tokenize_threads == {"tokenize-prefetch"}
+    assert sum(model.forward_batches) == len(TEXTS)
+    assert len(model.forward_batches) == 7
+
+
+def test_pipelined_encode_normalize():
+    vectors = pipelined_encode(
+        FakeSentenceModel(), TEXTS, batch_size=8, normalize_embeddings=True
+    )
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-5)
+
+
+def test_pipelined_encode_propagates_tokenizer_errors():
+    with pytest.raises(RuntimeError, match="tokenizer failed"):
+        pipelined_encode(
+            FakeSentenceModel(fail_on=TEXTS[-1]), TEXTS, batch_size=4, prefetch=1
+        )
+
+
+def test_install_pipelined_encode_only_for_multi_batch_calls():
+    model = FakeSentenceModel()
+    install_pipelined_encode(model, prefetch=2)
+
+    model.encode(TEXTS[:4], batch_size=8)
+    assert model.forward_batches == []
+    model.encode(TEXTS[:4], batch_size=2, convert_to_tensor=True)
+    assert model.forward_batches == []
+
+    vectors = model.encode(TEXTS, batch_size=16)
+    assert len(model.forward_batches) == 4
+    assert vectors.shape == (len(TEXTS), 2)
+
+
+def test_bulk_encode_is_pipelined_across_sub_batches():
+    model = install_pipelined_encode(FakeSentenceModel(), prefetch=2)
+    texts = [f"text {i}" * (i % 5 + 1) for i in range(256)]
+    slots = []
+    slot = scheduler.slot
+
+    def counting_slot(lane):
+        slots.append(lane)
+        return slot(lane)
+
+    with patch.object(scheduler, "slot", side_effect=counting_slot):
+        vectors = inference.encode(model, texts, BULK)
+
+    np.testing.assert_allclose(vectors, FakeSentenceModel().encode(texts))
+    # Sub-batches are tokenized ahead on the prefetch thread...
+    assert model.tokenize_threads == {"tokenize-prefetch"}
+    # ...and each forward batch of at most one sub-batch takes its own slot
+    assert model.forward_batches == [inference.SCHEDULER_SUB_BATCH_SIZE] * 8
+    assert slots == [BULK] * 8
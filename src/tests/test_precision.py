@@ -0,0 +1,148 @@
+import copy
+from unittest.mock import patch
+
+import pytest
+import torch
+from torch import nn
+
+from app import autotune, precision
+from app.config import load_models_config
+from app.precision import apply_dtype
+
+
+class FakeTransformer(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.linear = nn.Linear(8, 8)
+
+    def forward(self, features):
+        features["token_embeddings"] = self.linear(features["inputs"])
+        return features
+
+
+class FakePooling(nn.Module):
+    def forward(self, features):
+        features["sentence_embedding"] = features["token_embeddings"].mean(dim=1)
+        return features
+
+
+class FakeDense(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.linear = nn.Linear(8, 4)
+
+    def forward(self, features):
+        features["sentence_embedding"] = self.linear(features["sentence_embedding"])
+        return features
+
+
+class FakeSentenceModel(nn.Sequential):
+    """
+    Minimal stand-in for SentenceTransformer: a transformer module passing a
+    features dict on to a pooling module.
+    """
+
+    def _first_module(self):
+        return self[0]
+
+
+class FakeClassifier(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.linear = nn.Linear(8, 1)
+
+    def forward(self, inputs):
+        return {"logits": self.linear(inputs).mean(dim=1)}
+
+
+class FakeCrossEncoder:
+    def __init__(self):
+        self.model = FakeClassifier()
+
+
+def make_embedding_model(*modules):
+    torch.manual_seed(0)
+    return FakeSentenceModel(FakeTransformer(), FakePooling(), *modules)
+
+
+INPUTS = torch.randn(4, 6, 8, generator=torch.Generator().manual_seed(1))
+
+
+def test_falls_back_to_fp32_without_native_bf16(caplog):
+    model = make_embedding_model()
+    with patch("app.precision._cpu_flags", return_value=frozenset({"avx2"})):
+        assert apply_dtype(model, "embedding", "bf16", "cpu") == "fp32"
+    assert "no native bf16" in caplog.text
+    assert all(p.dtype == torch.float32 for p in model.parameters())
+
+
+def test_embedding_model_runs_in_bf16_with_float32_outputs():
+    model = make_embedding_model()
+    reference = copy.deepcopy(model)
+    with patch("app.precision._cpu_flags", return_value=frozenset({"amx_bf16"})):
+        assert apply_dtype(model, "embedding", "bf16", "cpu") == "bf16"
+    assert all(p.dtype == torch.bfloat16 for p in model[0].parameters())
+
+    with torch.no_grad():
+        out = model({"inputs": INPUTS.bfloat16()})["sentence_embedding"]
+        expected = reference({"inputs": INPUTS})["sentence_embedding"]
+    # Pooling and everything after the transformer stay in float32
+    assert out.dtype == torch.float32
+    torch.testing.assert_close(out, expected, atol=0.05, rtol=0.05)
+
+
+def test_modules_after_pooling_stay_float32():
+    model = make_embedding_model(FakeDense())
+    reference = copy.deepcopy(model)
+    apply_dtype(model, "embedding", "bf16", "cpu", require_support=False)
+    assert all(p.dtype == torch.bfloat16 for p in model[0].parameters())
+    assert all(p.dtype == torch.float32 for p in model[2].parameters())
+
+    with torch.no_grad():
+        out = model({"inputs": INPUTS.bfloat16()})["sentence_embedding"]
+        expected = reference({"inputs": INPUTS})["sentence_embedding"]
+    assert out.shape == (4, 4) and out.dtype == torch.float32
+    torch.testing.assert_close(out, expected, atol=0.05, rtol=0.05)
+
+
+def test_cross_encoder_logits_are_float32():
+    model = FakeCrossEncoder()
+    reference = copy.deepcopy(model.model)
+    apply_dtype(model, "rerank", "bf16", "cpu", require_support=False)
+    assert all(p.dtype == torch.bfloat16 for p in model.model.parameters())
+
+    with torch.no_grad():
+        logits = model.model(INPUTS.bfloat16())["logits"]
+        expected = reference(INPUTS)["logits"]
+    assert logits.dtype == torch.float32
+    torch.testing.assert_close(logits, expected, atol=0.05, rtol=0.05)
+
+
+def test_fp32_leaves_the_model_untouched():
+    model = make_embedding_model()
+    assert apply_dtype(model, "embedding", "fp32", "cpu") == "fp32"
+    assert all(p.dtype == torch.float32 for p in model.parameters())
+    assert not model[0]._forward_hooks
+
+
+def test_bf16_support_is_read_from_cpu_flags():
+    with patch("app.precision._cpu_flags", return_value=frozenset({"avx512_bf16"})):
+        assert precision.bf16_supported("cpu")
+    with patch("app.precision._cpu_flags", return_value=frozenset()):
+        assert not precision.bf16_supported("cpu")
+
+
+def test_models_config_validates_dtype(tmp_path):
+    path = tmp_path / "models.yml"
+    path.write_text('embedding_models:\n  - name: "org/a"\n    dtype: bf16\n')
+    _, _, options = load_models_config(path)
+    assert options["org/a"]["dtype"] == "bf16"
+
+    path.write_text('embedding_models:\n  - name: "org/a"\n    dtype: fp16\n')
+    with pytest.raises(ValueError):
+        load_models_config(path)
+
+
+def test_autotune_tables_are_kept_per_dtype():
+    assert autotune._table_path("org/a") == autotune._table_path("org/a", "fp32")
+    assert autotune._table_path("org/a", "bf16") != autotune._table_path("org/a")
@@ -0,0 +1,219 @@
+import asyncio
+import os
+import signal
+import threading
+import time
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock
+
+from app import config, models
+from app.main import app
+from app.reload import ConfigWatcher, install_sighup_handler, remove_sighup_handler
+
+client = TestClient(app)
+
+BASE = """
+embedding_models:
+  - "emb-a"
+rerank_models:
+  - "rr-a"
+"""
+
+
+@pytest.fixture
+def models_file(tmp_path):
+    """
+    Points the models config at a temporary file and restores the original
+    lists, options and loaded models afterwards.
+    """
+    saved = (
+        list(config.EMBEDDING_MODELS),
+        list(config.RERANK_MODELS),
+        dict(config.MODEL_OPTIONS),
+    )
+    saved_cache = dict(models._model_cache)
+    path = tmp_path / "models.yml"
+    path.write_text(BASE)
+    with patch("app.models.MODELS_FILE", path):
+        config.apply_models_config(*config.load_models_config(path))
+        models._model_cache.clear()
+        yield path
+    config.apply_models_config(*saved)
+    models._model_cache.clear()
+    models._model_cache.update(saved_cache)
+
+
+@pytest.fixture
+def loader():
+    """
+    Fake load_model returning a new MagicMock per call, recording (name, kind).
+    """
+    loads = []
+
+    def load(name, kind, options=None):
+        loads.append((name, kind))
+        model = MagicMock(name=name)
+        model.encode.side_effect = lambda texts: np.ones((len(texts), 2))
+        return model
+
+    with patch("app.models.load_model", side_effect=load):
+        yield loads
+
+
+def test_reload_adds_swaps_and_removes(models_file, loader):
+    old = models.get_model("emb-a")
+    assert models.get_model("rr-a") is not None
+
+    models_file.write_text(
+        """
+embedding_models:
+  - name: "emb-a"
+    cascade_hint: 1
+  - "emb-b"
+rerank_models: []
+"""
+    )
+    result = models.reload_models()
+    assert result == {"added": ["emb-b"], "removed": ["rr-a"], "reloaded": ["emb-a"]}
+
+    # Lists imported elsewhere see the new config
+    from app.main import EMBEDDING_MODELS, RERANK_MODELS
+
+    assert EMBEDDING_MODELS == ["emb-a", "emb-b"]
+    assert RERANK_MODELS == []
+    assert config.MODEL_OPTIONS == {"emb-a": {"cascade_hint": 1}}
+
+    # New and changed models were loaded and warmed before the swap
+    assert ("emb-b", "embedding") in loader
+    new = models.get_model("emb-a")
+    assert new is not old
+    new.encode.assert_called_once_with(["warm up"])
+    # A request still holding the old instance can finish on it
+    old.encode(["still works"])
+
+    with pytest.raises(ValueError):
+        models.get_model("rr-a")
+
+
+def test_reload_loads_models_with_their_new_dtype(models_file):
+    models._model_cache["emb-a"] = MagicMock()
+    models_file.write_text(
+        """
+embedding_models:
+  - name: "emb-a"
+    dtype: bf16
+rerank_models:
+  - "rr-a"
+"""
+    )
+    with (
+        patch("sentence_transformers.SentenceTransformer"),
+        patch("app.models.install_cached_tokenize"),
+        patch("app.models.install_pipelined_encode"),
+        patch("app.models.AUTOTUNE", False),
+        patch("app.models.precision.apply_dtype", return_value="bf16") as apply,
+    ):
+        result = models.reload_models()
+
+    assert result["reloaded"] == ["emb-a"]
+    assert apply.call_args.args[1:3] == ("embedding", "bf16")
+
+
+def test_failed_reload_changes_nothing(models_file, loader):
+    models_file.write_text('embedding_models: ["emb-a", "emb-broken"]\n')
+    with patch("app.models.load_model", side_effect=OSError("download failed")):
+        with pytest.raises(OSError):
+            models.reload_models()
+    assert config.EMBEDDING_MODELS == ["emb-a"]
+    assert config.RERANK_MODELS == ["rr-a"]
+
+    models_file.write_text("embedding_models: [")
+    with pytest.raises(ValueError):
+        models.reload_models()
+    assert config.EMBEDDING_MODELS == ["emb-a"]
+
+
+def test_requests_are_not_blocked_while_loading(models_file, loader):
+    current = models.get_model("emb-a")
+    loading, release = threading.Event(), threading.Event()
+
+    def slow_load(name, kind, options=None):
+        loading.set()
+        release.wait(5)
+        return MagicMock()
+
+    models_file.write_text('embedding_models: ["emb-a", "emb-new"]\n')
+    with patch("app.models.load_model", side_effect=slow_load):
+        thread = threading.Thread(target=models.reload_models)
+        thread.start()
+        assert loading.wait(5)
+        # The new model is not served before it is ready...
+        with pytest.raises(ValueError):
+            models.get_model("emb-new")
+        # ...and loaded models are served without waiting for it.
+        start = time.perf_counter()
+        assert models.get_model("emb-a") is current
+        assert time.perf_counter() - start < 0.5
+        release.set()
+        thread.join(5)
+    assert models.get_model("emb-new") is not None
+
+
+def test_config_watcher_detects_changes(tmp_path):
+    path = tmp_path / "models.yml"
+    path.write_text(BASE)
+    changes = []
+    watcher = ConfigWatcher(path, 60, lambda: changes.append(1))
+    assert not watcher.check()
+
+    path.write_text(BASE + "\n# touched\n")
+    assert watcher.check()
+    assert not watcher.check()
+
+    # A failing callback is not retried until the next change
+    watcher.on_change = MagicMock(side_effect=RuntimeError("boom"))
+    path.write_text(BASE)
+    assert watcher.check()
+    assert not watcher.check()
+    assert changes == [1]
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGHUP"), reason="no SIGHUP")
+def test_sighup_requests_reload():
+    with patch("app.reload.request_reload") as request_reload:
+
+        async def main():
+            assert install_sighup_handler()
+            os.kill(os.getpid(), signal.SIGHUP)
+            await asyncio.sleep(0.1)
+            remove_sighup_handler()
+
+        asyncio.run(main())
+    request_reload.assert_called_once_with("signal")
+
+
+def test_admin_reload_endpoint(models_file, loader):
+    models_file.write_text('embedding_models: ["emb-a"]\nrerank_models: ["rr-b"]\n')
+    headers = {"X-Admin-Token": "secret"}
+    # Without ADMIN_TOKEN the endpoint is disabled
+    assert client.post("/admin/reload", headers=headers).status_code == 403
+    with patch("app.main.ADMIN_TOKEN", "secret"):
+        assert client.post("/admin/reload").status_code == 401
+        response = client.post("/admin/reload", headers=headers)
+        assert response.status_code == 200
+        body = response.json()
+        assert body["added"] == ["rr-b"]
+        assert body["removed"] == ["rr-a"]
+        assert body["rerank_models"] == ["rr-b"]
+
+        models_file.write_text("- not a mapping\n")
+        assert client.post("/admin/reload", headers=headers).status_code == 400
+
+        # Internal errors are logged, not returned
+        with patch("app.main.reload", side_effect=RuntimeError("/secret/path")):
+            response = client.post("/admin/reload", headers=headers)
+        assert response.status_code == 500
+        assert "/secret/path" not in response.text
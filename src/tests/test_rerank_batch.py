@@ -0,0 +1,153 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock
+
+from app import autotune
+from app.autotune import TunedTable
+from app.config import RERANK_MODELS
+from app.main import _top_indices, app
+from app.tokenization import token_cache
+
+client = TestClient(app)
+
+MODEL = RERANK_MODELS[0]
+
+
+def make_model():
+    """
+    Cross-encoder mock: one token per character, [CLS] q [SEP] d [SEP] for
+    pairs, and a score that depends on both texts.
+    """
+    model = MagicMock()
+    model.max_length = 512
+
+    def tokenizer(texts, pairs=None, add_special_tokens=False, **kwargs):
+        if pairs is not None:
+            return {
+                "input_ids": [[0] * (len(q) + len(d) + 3) for q, d in zip(texts, pairs)]
+            }
+        return {"input_ids": [[0] * len(t) for t in texts]}
+
+    model.tokenizer.side_effect = tokenizer
+    model.tokenizer.num_special_tokens_to_add.return_value = 3
+    model.predict.side_effect = lambda pairs, **kwargs: np.asarray(
+        [(sum(map(ord, q)) * 7 + sum(map(ord, d))) % 101 / 100 for q, d in pairs]
+    )
+    return model
+
+
+@pytest.fixture
+def model():
+    token_cache.clear()
+    model = make_model()
+    with patch("app.main.get_model", return_value=model):
+        yield model
+
+
+GROUPS = [
+    {
+        "query": "東京の天気",
+        "documents": ["晴れ", "雨が降る" * 10, "くもり", "晴れ"],
+        "top_n": 2,
+    },
+    {"query": "猫", "documents": ["ねこ", "いぬ" * 40, "晴れ"]},
+    {"query": "東京の天気", "documents": ["くもり", "雪"]},
+]
+
+
+def test_batch_matches_single_rerank(model):
+    response = client.post(
+        "/v1/rerank/batch",
+        json={"model": MODEL, "groups": GROUPS, "return_documents": True},
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert [result["index"] for result in body["data"]] == [0, 1, 2]
+
+    total_tokens = 0
+    for group, result in zip(GROUPS, body["data"]):
+        single = client.post(
+            "/v1/rerank", json={"model": MODEL, "return_documents": True, **group}
+        ).json()
+        assert result["query"] == group["query"]
+        assert result["data"] == single["data"]
+        total_tokens += single["usage"]["total_tokens"]
+    assert body["usage"]["total_tokens"] == total_tokens
+
+
+def test_pairs_scored_once_in_length_buckets(model):
+    with patch("app.main.AUTOTUNE_SEQ_BUCKETS", (16, 64, 256)):
+        client.post("/v1/rerank/batch", json={"model": MODEL, "groups": GROUPS})
+
+    calls = [call.args[0] for call in model.predict.call_args_list]
+    scored = [tuple(pair) for pairs in calls for pair in pairs]
+    # ("東京の天気", "くもり") and ("東京の天気", "晴れ") repeat across groups
+    assert len(scored) == len(set(scored)) == 7
+    # One call per length bucket, shortest first
+    lengths = [[len(q) + len(d) + 3 for q, d in pairs] for pairs in calls]
+    assert len(calls) == 3
+    assert all(max(a) <= min(b) for a, b in zip(lengths, lengths[1:]))
+    assert max(lengths[0]) <= 16 < min(lengths[1])
+
+    # Distinct documents and queries were each tokenized once
+    tokenized = [
+        text
+        for call in model.tokenizer.call_args_list
+        if len(call.args) == 1
+        for text in call.args[0]
+    ]
+    assert sorted(tokenized) == sorted(
+        {g["query"] for g in GROUPS} | {d for g in GROUPS for d in g["documents"]}
+    )
+
+
+def test_buckets_use_their_tuned_batch_size(model):
+    buckets = {
+        16: {"batch_size": 4, "tokens_per_second": 1.0, "latency_ms": 1.0},
+        64: {"batch_size": 2, "tokens_per_second": 1.0, "latency_ms": 1.0},
+        256: {"batch_size": 1, "tokens_per_second": 1.0, "latency_ms": 1.0},
+    }
+    autotune.register(MODEL, model, TunedTable(MODEL, "rerank", {}, 500, buckets))
+    try:
+        with patch("app.main.AUTOTUNE_SEQ_BUCKETS", (16, 64, 256)):
+            response = client.post(
+                "/v1/rerank/batch", json={"model": MODEL, "groups": GROUPS}
+            )
+    finally:
+        autotune.unregister(MODEL)
+    assert response.status_code == 200
+
+    # Buckets mix queries, yet each gets its own tuned batch size
+    batch_sizes = [call.kwargs["batch_size"] for call in model.predict.call_args_list]
+    assert batch_sizes == [4, 2, 1]
+    # The pair lengths come from the per-text tokenization; pairs are not
+    # tokenized again to look the batch sizes up
+    assert all(len(call.args) == 1 for call in model.tokenizer.call_args_list)
+
+
+def test_top_indices_matches_heap_selection():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        scores = rng.integers(0, 5, size=rng.integers(1, 30)).astype(float)
+        for top_n in (None, 0, 1, 3, len(scores), len(scores) + 2):
+            expected = sorted(range(len(scores)), key=lambda i: (-scores[i], i))
+            if top_n is not None:
+                expected = expected[:top_n]
+            assert _top_indices(scores, top_n).tolist() == expected
+
+
+def test_batch_rerank_validation(model):
+    response = client.post(
+        "/v1/rerank/batch", json={"model": "unknown/model", "groups": GROUPS}
+    )
+    assert response.status_code == 400
+
+    response = client.post("/v1/rerank/batch", json={"model": MODEL, "groups": []})
+    assert response.status_code == 422
+
+    with patch("app.schemas.MAX_RERANK_BATCH_PAIRS", 5):
+        response = client.post(
+            "/v1/rerank/batch", json={"model": MODEL, "groups": GROUPS}
+        )
+    assert response.status_code == 422
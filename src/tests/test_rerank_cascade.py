@@ -0,0 +1,159 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+from app.main import app, _calibrated_fallback, rerank_cascade_pairs
+from app.config import EMBEDDING_MODELS, RERANK_MODELS, MODEL_OPTIONS
+from app.cache import embedding_cache
+
+client = TestClient(app)
+
+SUPPORTED_RERANK_MODEL = RERANK_MODELS[0]
+
+
+@pytest.fixture
+def mock_models(fake_model):
+    embedding_cache.clear()
+    yield fake_model(
+        predict=lambda pairs: [10.0 - i for i in range(len(pairs))], max_length=8192
+    )
+    embedding_cache.clear()
+
+
+DOCUMENTS = ["猫の話", "東京の話", "犬の話", "東京とAIの話", "AIの話"]
+
+
+def test_cascade_scores_only_top_m(mock_models):
+    skipped_before = rerank_cascade_pairs.value(
+        model=SUPPORTED_RERANK_MODEL, outcome="skipped"
+    )
+    response = client.post(
+        "/v1/rerank",
+        json={
+            "query": "東京",
+            "documents": DOCUMENTS,
+            "model": SUPPORTED_RERANK_MODEL,
+            "cascade": {"embedding_model": EMBEDDING_MODELS[0], "top_m": 2},
+        },
+    )
+    assert response.status_code == 200
+
+    # Only the two documents mentioning the query reach the cross-encoder
+    mock_models.predict.assert_called_once_with(
+        [["東京", "東京の話"], ["東京", "東京とAIの話"]]
+    )
+
+    body = response.json()
+    assert body["cascade"] == {
+        "embedding_model": EMBEDDING_MODELS[0],
+        "scored": 2,
+        "skipped": 3,
+    }
+    data = body["data"]
+    assert len(data) == len(DOCUMENTS)
+    assert [item["document"] for item in data[:2]] == [1, 3]
+    # Skipped documents rank strictly below every scored one
+    assert all(item["score"] < data[1]["score"] for item in data[2:])
+    assert (
+        rerank_cascade_pairs.value(model=SUPPORTED_RERANK_MODEL, outcome="skipped")
+        == skipped_before + 3
+    )
+
+
+def test_cascade_reuses_cached_document_embeddings(mock_models):
+    payload = {
+        "query": "東京",
+        "documents": DOCUMENTS,
+        "model": SUPPORTED_RERANK_MODEL,
+        "cascade": {"top_m": 2},
+    }
+    client.post("/v1/rerank", json=payload)
+    mock_models.encode.reset_mock()
+
+    client.post("/v1/rerank", json={**payload, "query": "猫"})
+    # Second request only embeds the query
+    mock_models.encode.assert_called_once_with(["検索クエリ: 猫"])
+
+
+def test_cascade_from_model_options_and_opt_out(mock_models):
+    with patch.dict(MODEL_OPTIONS, {SUPPORTED_RERANK_MODEL: {"cascade": {"top_m": 3}}}):
+        response = client.post(
+            "/v1/rerank",
+            json={
+                "query": "東京",
+                "documents": DOCUMENTS,
+                "model": SUPPORTED_RERANK_MODEL,
+            },
+        )
+        assert response.json()["cascade"]["scored"] == 3
+
+        mock_models.predict.reset_mock()
+        response = client.post(
+            "/v1/rerank",
+            json={
+                "query": "東京",
+                "documents": DOCUMENTS,
+                "model": SUPPORTED_RERANK_MODEL,
+                "cascade": {"enabled": False},
+            },
+        )
+        assert "cascade" not in response.json()
+        assert len(mock_models.predict.call_args[0][0]) == len(DOCUMENTS)
+
+
+def test_cascade_not_applied_to_small_requests(mock_models):
+    response = client.post(
+        "/v1/rerank",
+        json={
+            "query": "東京",
+            "documents": DOCUMENTS[:2],
+            "model": SUPPORTED_RERANK_MODEL,
+            "cascade": {"top_m": 4},
+        },
+    )
+    assert "cascade" not in response.json()
+    mock_models.encode.assert_not_called()
+
+
+def test_default_rerank_response_shape_is_unchanged(mock_models):
+    response = client.post(
+        "/v1/rerank",
+        json={
+            "query": "東京",
+            "documents": DOCUMENTS[:2],
+            "model": SUPPORTED_RERANK_MODEL,
+        },
+    )
+    body = response.json()
+    assert set(body) == {"query", "data", "model", "usage"}
+    assert body["data"][0]["text"] is None
+
+
+def test_calibrated_fallback_preserves_order():
+    kept_similarities = np.array([0.9, 0.8, 0.7])
+    kept_scores = np.array([3.0, 2.0, 1.0])
+    fallback = _calibrated_fallback(
+        kept_similarities, kept_scores, np.array([0.6, 0.1])
+    )
+    assert np.all(fallback < kept_scores.min())
+    assert fallback[0] > fallback[1]
+
+
+def test_metrics_endpoint_exposes_cascade_counters(mock_models):
+    client.post(
+        "/v1/rerank",
+        json={
+            "query": "東京",
+            "documents": DOCUMENTS,
+            "model": SUPPORTED_RERANK_MODEL,
+            "cascade": {"top_m": 1},
+        },
+    )
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "# TYPE rerank_cascade_pairs_total counter" in response.text
+    assert (
+        f'rerank_cascade_pairs_total{{model="{SUPPORTED_RERANK_MODEL}",outcome="skipped"}}'
+        in response.text
+    )
@@ -0,0 +1,149 @@
+import string
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock
+
+from app.main import app
+from app.config import RERANK_MODELS
+from app.chunking import window_spans, aggregate_scores
+
+client = TestClient(app)
+
+SUPPORTED_RERANK_MODEL = RERANK_MODELS[0]
+
+
+def char_tokenizer(texts, pair_texts=None, **kwargs):
+    # 1 char = 1 token; pairs are the concatenation of both sides.
+    if isinstance(texts, str):
+        return {"input_ids": [ord(c) for c in texts]}
+    if pair_texts is not None:
+        return {
+            "input_ids": [[ord(c) for c in q + d] for q, d in zip(texts, pair_texts)]
+        }
+    return {"input_ids": [[ord(c) for c in t] for t in texts]}
+
+
+@pytest.fixture
+def mock_reranker():
+    with patch("app.main.get_model") as mock:
+        model = MagicMock()
+        # Relevance is the number of "X" characters the window contains.
+        model.predict.side_effect = lambda pairs: [
+            float(doc.count("X")) for _, doc in pairs
+        ]
+        model.tokenizer.side_effect = char_tokenizer
+        model.tokenizer.decode.side_effect = lambda ids: "".join(chr(i) for i in ids)
+        model.tokenizer.num_special_tokens_to_add.return_value = 0
+        model.max_length = 1000
+        mock.return_value = model
+        yield model
+
+
+def test_window_spans_cover_all_tokens():
+    assert window_spans(5, 10, 2) == [(0, 5)]
+    assert window_spans(10, 4, 1) == [(0, 4), (3, 7), (6, 10)]
+    spans = window_spans(1000, 128, 32)
+    assert spans[0][0] == 0 and spans[-1][1] == 1000
+    assert all(end - start <= 128 for start, end in spans)
+
+
+def test_aggregate_scores():
+    owners = np.array([0, 0, 1, 2, 2, 2])
+    scores = np.array([1.0, 3.0, 2.0, 0.0, 3.0, 6.0])
+    np.testing.assert_allclose(aggregate_scores(scores, owners, 3, "max"), [3, 2, 6])
+    np.testing.assert_allclose(aggregate_scores(scores, owners, 3, "mean"), [2, 2, 3])
+
+
+def test_rerank_chunking_scores_past_truncation_point(mock_reranker):
+    # The relevant passage of doc 1 sits at the end of a long document.
+    documents = ["X" + "a" * 10, string.ascii_letters[:40] + "XXX", "short"]
+    response = client.post(
+        "/v1/rerank",
+        json={
+            "query": "q",
+            "documents": documents,
+            "model": SUPPORTED_RERANK_MODEL,
+            "chunking": {"window_size": 16, "overlap": 4, "aggregation": "max"},
+        },
+    )
+    assert response.status_code == 200
+
+    # One batched predict call covering every window of every document
+    mock_reranker.predict.assert_called_once()
+    (pairs,), _ = mock_reranker.predict.call_args
+    assert len(pairs) == 1 + 4 + 1
+    assert all(len(doc) <= 16 for _, doc in pairs)
+
+    data = response.json()["data"]
+    assert [item["document"] for item in data] == [1, 0, 2]
+    assert data[0]["score"] == 3.0
+
+
+def test_rerank_chunking_mean_and_max_length_clamp(mock_reranker):
+    # 4-char query leaves room for 20 document tokens per window.
+    mock_reranker.max_length = 24
+    response = client.post(
+        "/v1/rerank",
+        json={
+            "query": "qqqq",
+            "documents": ["X" * 20 + "a" * 20],
+            "model": SUPPORTED_RERANK_MODEL,
+            "chunking": {"window_size": 64, "overlap": 0, "aggregation": "mean"},
+        },
+    )
+    assert response.status_code == 200
+    (pairs,), _ = mock_reranker.predict.call_args
+    assert [doc for _, doc in pairs] == ["X" * 20, "a" * 20]
+    assert response.json()["data"][0]["score"] == 10.0
+
+
+def test_rerank_chunking_scales_overlap_with_the_clamped_window(mock_reranker):
+    # The 20-token window left by the query keeps half of it as overlap
+    mock_reranker.max_length = 24
+    body = {
+        "query": "qqqq",
+        "documents": ["X" * 20 + "a" * 20],
+        "model": SUPPORTED_RERANK_MODEL,
+        "chunking": {"window_size": 64, "overlap": 32},
+    }
+    response = client.post("/v1/rerank", json=body)
+    assert response.status_code == 200
+    (pairs,), _ = mock_reranker.predict.call_args
+    assert [doc for _, doc in pairs] == ["X" * 20, "X" * 10 + "a" * 10, "a" * 20]
+
+    mock_reranker.predict.reset_mock()
+    with patch("app.main.MAX_CHUNK_WINDOWS", 2):
+        response = client.post("/v1/rerank", json=body)
+    assert response.status_code == 422
+    mock_reranker.predict.assert_not_called()
+
+
+def test_rerank_chunking_rejects_query_that_fills_the_window(mock_reranker):
+    # 20-char query leaves 4 tokens per window, below the 16-token minimum.
+    mock_reranker.max_length = 24
+    response = client.post(
+        "/v1/rerank",
+        json={
+            "query": "q" * 20,
+            "documents": ["X" * 100],
+            "model": SUPPORTED_RERANK_MODEL,
+            "chunking": {"window_size": 64, "overlap": 0},
+        },
+    )
+    assert response.status_code == 400
+    mock_reranker.predict.assert_not_called()
+
+
+def test_rerank_chunking_validation():
+    response = client.post(
+        "/v1/rerank",
+        json={
+            "query": "q",
+            "documents": ["d"],
+            "model": SUPPORTED_RERANK_MODEL,
+            "chunking": {"window_size": 32, "overlap": 32},
+        },
+    )
+    assert response.status_code == 422
@@ -0,0 +1,111 @@
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+from app.main import app
+from app.config import EMBEDDING_MODELS, RERANK_MODELS
+from app.store import collection_store
+
+client = TestClient(app)
+
+
+def fake_predict(pairs):
+    # Prefer longer documents so the second stage visibly reorders candidates.
+    return [float(len(doc)) for _, doc in pairs]
+
+
+@pytest.fixture
+def mock_models(fake_model):
+    return fake_model(predict=fake_predict, tokens=3, special_tokens=2, max_length=8192)
+
+
+def test_retrieve_rerank_with_documents(mock_models):
+    documents = ["猫", "東京の天気", "犬", "東京タワーの歴史について", "AI"]
+    response = client.post(
+        "/v1/retrieve_rerank",
+        json={
+            "query": "東京",
+            "documents": documents,
+            "model": RERANK_MODELS[0],
+            "embedding_model": EMBEDDING_MODELS[0],
+            "top_m": 2,
+            "top_n": 1,
+            "return_documents": True,
+        },
+    )
+    assert response.status_code == 200
+
+    # Query and documents are embedded in a single call with their own prefixes
+    mock_models.encode.assert_called_once()
+    (texts,), _ = mock_models.encode.call_args
+    assert texts[0] == "検索クエリ: 東京"
+    assert texts[1] == "検索文書: 猫"
+
+    # Only the top_m candidates reach the cross-encoder
+    mock_models.predict.assert_called_once_with(
+        [["東京", "東京の天気"], ["東京", "東京タワーの歴史について"]]
+    )
+
+    body = response.json()
+    assert body["candidates"] == 2
+    assert body["embedding_model"] == EMBEDDING_MODELS[0]
+    assert "cascade" not in body
+    assert body["data"] == [
+        {"document": 3, "score": float(len(documents[3])), "text": documents[3]}
+    ]
+    # (query + 5 documents) * (3 + 2 special) tokens + 2 rerank pairs * 3 tokens
+    assert body["usage"]["total_tokens"] == 36
+
+
+def test_retrieve_rerank_with_collection(mock_models):
+    name = "pipeline-collection"
+    collection = collection_store.create(name, EMBEDDING_MODELS[0], index_type="flat")
+    documents = ["猫の話", "東京の話", "東京と犬の長い話"]
+    collection.add(mock_models.encode.side_effect(documents), documents)
+
+    try:
+        response = client.post(
+            "/v1/retrieve_rerank",
+            json={
+                "query": "東京",
+                "collection": name,
+                "model": RERANK_MODELS[0],
+                "top_m": 2,
+            },
+        )
+    finally:
+        collection_store.delete(name)
+
+    assert response.status_code == 200
+    mock_models.encode.assert_called_once_with(["検索クエリ: 東京"])
+    data = response.json()["data"]
+    assert [item["document"] for item in data] == [2, 1]
+
+
+def test_retrieve_rerank_requires_one_source():
+    response = client.post(
+        "/v1/retrieve_rerank",
+        json={"query": "東京", "model": RERANK_MODELS[0]},
+    )
+    assert response.status_code == 422
+
+    response = client.post(
+        "/v1/retrieve_rerank",
+        json={
+            "query": "東京",
+            "documents": ["a"],
+            "collection": "c",
+            "model": RERANK_MODELS[0],
+        },
+    )
+    assert response.status_code == 422
+
+
+def test_retrieve_rerank_without_embedding_models():
+    with patch("app.main.EMBEDDING_MODELS", []):
+        response = client.post(
+            "/v1/retrieve_rerank",
+            json={"query": "東京", "documents": ["a"], "model": RERANK_MODELS[0]},
+        )
+    assert response.status_code == 400
+    assert "embedding_model" in response.json()["detail"]
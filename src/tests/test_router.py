@@ -0,0 +1,227 @@
+import asyncio
+from unittest.mock import patch
+
+import httpx
+import msgpack
+import pyarrow as pa
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from app import router as router_module
+from app.main import app as api_app
+from app.router import HashRing, Router, create_app
+
+REPLICAS = ["http://replica-0", "http://replica-1", "http://replica-2"]
+
+
+def make_replica(name):
+    """
+    Stand-in replica: answers with its name and reports a settable queue depth.
+    """
+    replica = FastAPI()
+    replica.state.queue_depth = 0
+    replica.state.delay = 0.0
+    replica.state.status = 200
+    replica.state.calls = 0
+
+    @replica.get("/ready")
+    def ready():
+        return {
+            "status": "ready",
+            "models": ["model-a"],
+            "queue_depth": replica.state.queue_depth,
+            "running": 0,
+        }
+
+    @replica.post("/v1/{path:path}")
+    async def handle(path: str, request: Request):
+        replica.state.calls += 1
+        await asyncio.sleep(replica.state.delay)
+        return JSONResponse(
+            status_code=replica.state.status,
+            content={
+                "replica": name,
+                "path": path,
+                "body": await request.json()
+                if "json" in request.headers.get("content-type", "")
+                else None,
+            },
+        )
+
+    return replica
+
+
+def make_router(**kwargs):
+    replicas = {url: make_replica(url) for url in REPLICAS}
+    mounts = {url: httpx.ASGITransport(app=app) for url, app in replicas.items()}
+    router = Router(REPLICAS, mounts=mounts, **kwargs)
+    return router, replicas, TestClient(create_app(router))
+
+
+def embed(client, text, model="model-a"):
+    return client.post("/v1/embeddings", json={"input": [text], "model": model})
+
+
+def test_hash_ring_moves_few_keys_when_a_replica_is_added():
+    keys = [f"model:{i}" for i in range(500)]
+    before = HashRing(REPLICAS, 64)
+    after = HashRing(REPLICAS + ["http://replica-3"], 64)
+    moved = sum(before.walk(k)[0] != after.walk(k)[0] for k in keys)
+    # About a quarter of the keys move to the new replica, none elsewhere
+    assert 0 < moved < len(keys) / 2
+    assert all(
+        after.walk(k)[0] in (before.walk(k)[0], "http://replica-3") for k in keys
+    )
+
+
+def test_requests_stick_to_the_models_replicas():
+    router, _, client = make_router(replicas_per_model=2)
+    with client:
+        seen = {embed(client, f"text {i}").headers["x-replica"] for i in range(40)}
+        # Repeats of a request go to the replica that served it
+        first = embed(client, "text 0").headers["x-replica"]
+        assert all(
+            embed(client, "text 0").headers["x-replica"] == first for _ in range(5)
+        )
+
+    assert seen == set(router.ring.walk("model:model-a")[:2])
+
+
+def test_binary_bodies_stick_to_the_models_replica():
+    router, _, client = make_router(replicas_per_model=1)
+    home = router.ring.walk("model:model-a")[0]
+
+    def arrow_body(text):
+        table = pa.table({"input": [text]}, metadata={"model": '"model-a"'})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    with client:
+        for i in range(20):
+            packed = msgpack.packb({"input": [f"text {i}"], "model": "model-a"})
+            response = client.post(
+                "/v1/embeddings",
+                content=packed,
+                headers={"Content-Type": "application/msgpack"},
+            )
+            assert response.headers["x-replica"] == home
+            response = client.post(
+                "/v1/embeddings",
+                content=arrow_body(f"text {i}"),
+                headers={"Content-Type": "application/vnd.apache.arrow.stream"},
+            )
+            assert response.headers["x-replica"] == home
+
+
+def test_undecodable_bodies_are_routed_by_hash_and_logged(caplog):
+    router, _, client = make_router()
+    with client:
+        response = client.post(
+            "/v1/embeddings",
+            content=b"\xc1",
+            headers={"Content-Type": "application/msgpack"},
+        )
+    assert response.status_code == 200
+    assert "cannot decode its application/msgpack body" in caplog.text
+
+
+def test_queue_depth_moves_requests_to_a_less_loaded_replica():
+    router, replicas, client = make_router(replicas_per_model=2)
+    with client:
+        preferred = embed(client, "hello").headers["x-replica"]
+        replicas[preferred].state.queue_depth = 10
+        client.portal.call(router.poll)
+        moved = embed(client, "hello").headers["x-replica"]
+        assert moved != preferred
+        assert moved in router.ring.walk("model:model-a")[:2]
+
+        # The whole home set is backed up: spill to the remaining replica
+        replicas[moved].state.queue_depth = 20
+        with patch.object(router_module, "ROUTER_SPILL_QUEUE_DEPTH", 5):
+            client.portal.call(router.poll)
+            spilled = embed(client, "hello").headers["x-replica"]
+        assert spilled == router.ring.walk("model:model-a")[2]
+
+
+def test_slow_replica_is_hedged():
+    router, replicas, client = make_router(replicas_per_model=2)
+    with client:
+        preferred = embed(client, "slow").headers["x-replica"]
+        for _ in range(50):
+            router.observe("/v1/embeddings", 0.01)
+        replicas[preferred].state.delay = 5
+        router._requests = 100
+
+        with patch.object(router_module, "ROUTER_HEDGE_MIN_DELAY_MS", 50):
+            response = embed(client, "slow")
+        assert response.status_code == 200
+        assert response.headers["x-replica"] != preferred
+        assert router_module.hedged_requests.value(outcome="won") >= 1
+
+
+def test_hedging_is_off_without_latency_history():
+    router = Router(REPLICAS)
+    assert router.hedge_delay("/v1/embeddings") is None
+    for _ in range(50):
+        router.observe("/v1/embeddings", 0.2)
+    assert router.hedge_delay("/v1/embeddings") == 0.2
+    with patch.object(router_module, "ROUTER_HEDGE_PERCENTILE", 0):
+        assert router.hedge_delay("/v1/embeddings") is None
+
+
+def test_failed_replica_is_retried_elsewhere():
+    _, replicas, client = make_router(replicas_per_model=2)
+    with client:
+        preferred = embed(client, "retry").headers["x-replica"]
+        replicas[preferred].state.status = 503
+        response = embed(client, "retry")
+        assert response.status_code == 200
+        assert response.headers["x-replica"] != preferred
+
+
+def test_unreachable_replica_is_skipped():
+    def refuse(request):
+        raise httpx.ConnectError("connection refused", request=request)
+
+    replicas = {url: make_replica(url) for url in REPLICAS}
+    mounts = {url: httpx.ASGITransport(app=app) for url, app in replicas.items()}
+    down = Router(REPLICAS).ring.walk("model:model-a")[0]
+    mounts[down] = httpx.MockTransport(refuse)
+    router = Router(REPLICAS, mounts=mounts, replicas_per_model=1)
+    with TestClient(create_app(router)) as client:
+        assert not router.replicas[down].healthy
+        response = embed(client, "anything")
+        assert response.status_code == 200
+        assert response.headers["x-replica"] != down
+        assert client.get("/ready").json()["replicas"][down]["healthy"] is False
+
+
+def test_collections_go_to_their_owner_without_retries():
+    router, replicas, client = make_router()
+    with client:
+        owner = router.ring.walk("collection:docs")[0]
+        created = client.post("/v1/collections", json={"name": "docs", "model": "m"})
+        searched = client.post("/v1/collections/docs/search", json={"query": "q"})
+        retrieved = client.post(
+            "/v1/retrieve_rerank", json={"query": "q", "collection": "docs"}
+        )
+        assert {r.headers["x-replica"] for r in (created, searched, retrieved)} == {
+            owner
+        }
+
+        replicas[owner].state.status = 503
+        response = client.post("/v1/collections/docs/search", json={"query": "q"})
+        assert response.status_code == 503
+        assert replicas[owner].state.calls == 4
+
+
+def test_api_reports_readiness_and_queue_depth():
+    response = TestClient(api_app).get("/ready")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "ready"
+    assert body["queue_depth"] == 0
+    assert isinstance(body["models"], list)
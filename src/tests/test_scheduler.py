@@ -0,0 +1,111 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock
+
+from app.main import app
+from app.config import EMBEDDING_MODELS
+from app import inference
+from app.scheduler import Scheduler, scheduler, request_latency, INTERACTIVE, BULK
+
+client = TestClient(app)
+
+SUPPORTED_EMBEDDING_MODEL = EMBEDDING_MODELS[0]
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_interactive_lane_runs_before_queued_bulk_work():
+    sched = Scheduler(max_concurrency=1)
+    release = threading.Event()
+    order = []
+
+    def run(lane, name, hold=None):
+        with sched.slot(lane):
+            order.append(name)
+            if hold is not None:
+                hold.wait(5)
+
+    busy = threading.Thread(target=run, args=(BULK, "busy", release))
+    busy.start()
+    wait_until(lambda: sched.running == 1)
+
+    threads = [threading.Thread(target=run, args=(BULK, "bulk"))]
+    threads[0].start()
+    wait_until(lambda: sched.waiting(BULK) == 1)
+    threads.append(threading.Thread(target=run, args=(INTERACTIVE, "query")))
+    threads[1].start()
+    wait_until(lambda: sched.waiting(INTERACTIVE) == 1)
+
+    release.set()
+    for thread in [busy] + threads:
+        thread.join(5)
+    assert order == ["busy", "query", "bulk"]
+
+
+def test_bulk_encode_yields_between_sub_batches():
+    model = MagicMock()
+    calls = []
+    interactive = []
+
+    def fake_encode(texts):
+        calls.append(list(texts))
+        if len(calls) == 1:
+            # An interactive query arrives while the first bulk sub-batch runs.
+            thread = threading.Thread(
+                target=lambda: inference.encode(model, ["q"], INTERACTIVE)
+            )
+            thread.start()
+            interactive.append(thread)
+            wait_until(lambda: scheduler.waiting(INTERACTIVE) == 1)
+        return np.ones((len(texts), 2))
+
+    model.encode.side_effect = fake_encode
+    with patch("app.inference.SCHEDULER_SUB_BATCH_SIZE", 2):
+        vectors = inference.encode(model, list("abcdef"), BULK)
+    interactive[0].join(5)
+
+    assert vectors.shape == (6, 2)
+    assert calls == [["a", "b"], ["q"], ["c", "d"], ["e", "f"]]
+
+
+@pytest.fixture
+def mock_model(fake_model):
+    return fake_model(encode=lambda texts: np.ones((len(texts), 3)), tokens=1)
+
+
+@pytest.mark.parametrize(
+    "payload, lane",
+    [
+        ({"input": ["a", "b"], "input_type": "query"}, INTERACTIVE),
+        ({"input": "a", "input_type": "document"}, BULK),
+        ({"input": "a"}, INTERACTIVE),
+        ({"input": ["a", "b"]}, BULK),
+        (
+            {"input": ["a", "b"], "input_type": "document", "priority": "interactive"},
+            INTERACTIVE,
+        ),
+    ],
+)
+def test_embedding_lane_and_latency_metrics(mock_model, payload, lane):
+    before = request_latency.count(endpoint="embeddings", lane=lane)
+    response = client.post(
+        "/v1/embeddings", json={**payload, "model": SUPPORTED_EMBEDDING_MODEL}
+    )
+    assert response.status_code == 200
+    assert request_latency.count(endpoint="embeddings", lane=lane) == before + 1
+
+    metrics = client.get("/metrics").text
+    assert (
+        f'request_latency_seconds_count{{endpoint="embeddings",lane="{lane}"}}'
+        in metrics
+    )
+    assert "scheduler_queue_wait_seconds_bucket" in metrics
@@ -0,0 +1,98 @@
+import base64
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.config import EMBEDDING_MODELS
+from app.index import top_k_rows
+
+client = TestClient(app)
+
+SUPPORTED_EMBEDDING_MODEL = EMBEDDING_MODELS[0]
+
+VECTORS = {
+    "cat": [1.0, 0.0, 0.0],
+    "kitten": [0.9, 0.1, 0.0],
+    "dog": [0.0, 1.0, 0.0],
+    "car": [0.0, 0.0, 2.0],
+}
+
+
+@pytest.fixture
+def mock_model(fake_model):
+    return fake_model(encode=lambda texts: np.array([VECTORS[t] for t in texts]))
+
+
+def cosine(a, b):
+    a, b = np.array(VECTORS[a]), np.array(VECTORS[b])
+    return float(a @ b / np.linalg.norm(a) / np.linalg.norm(b))
+
+
+def test_top_k_rows():
+    scores = np.array([[0.1, 0.9, 0.5, 0.9], [0.3, 0.2, 0.1, 0.0]])
+    values, indices = top_k_rows(scores, 2)
+    assert indices.tolist() == [[1, 3], [0, 1]]
+    np.testing.assert_allclose(values, [[0.9, 0.9], [0.3, 0.2]])
+    assert top_k_rows(scores, 10)[1].shape == (2, 4)
+
+
+def test_similarity_matrix_in_one_pass(mock_model):
+    response = client.post(
+        "/v1/similarity",
+        json={
+            "input": ["cat", "dog"],
+            "targets": ["kitten", "car", "cat"],
+            "model": SUPPORTED_EMBEDDING_MODEL,
+        },
+    )
+    assert response.status_code == 200
+    # Both lists in a single encode call, "cat" encoded once
+    mock_model.encode.assert_called_once_with(["cat", "dog", "kitten", "car"])
+
+    body = response.json()
+    assert body["shape"] == [2, 3]
+    assert "indices" not in body
+    np.testing.assert_allclose(
+        body["scores"],
+        [
+            [cosine("cat", "kitten"), 0.0, 1.0],
+            [cosine("dog", "kitten"), 0.0, 0.0],
+        ],
+        rtol=1e-6,
+    )
+    assert body["usage"]["total_tokens"] == 10
+
+
+def test_similarity_self_top_k_base64(mock_model):
+    response = client.post(
+        "/v1/similarity",
+        json={
+            "input": ["cat", "dog", "kitten"],
+            "model": SUPPORTED_EMBEDDING_MODEL,
+            "top_k": 5,
+            "exclude_self": True,
+            "encoding_format": "base64",
+        },
+    )
+    assert response.status_code == 200
+    body = response.json()
+    # k is capped at the number of other inputs
+    assert body["shape"] == [3, 2]
+
+    scores = np.frombuffer(base64.b64decode(body["scores"]), dtype="<f4").reshape(3, 2)
+    indices = np.frombuffer(base64.b64decode(body["indices"]), dtype="<i4").reshape(
+        3, 2
+    )
+    assert indices.tolist() == [[2, 1], [2, 0], [0, 1]]
+    assert scores[0, 0] == pytest.approx(cosine("cat", "kitten"), rel=1e-6)
+
+
+def test_similarity_validation(mock_model):
+    response = client.post(
+        "/v1/similarity", json={"input": [], "model": SUPPORTED_EMBEDDING_MODEL}
+    )
+    assert response.status_code == 422
+    response = client.post("/v1/similarity", json={"input": ["cat"], "model": "nope"})
+    assert response.status_code == 400
@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+from app.main import app
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time of app.main, in microseconds. Importing torch and
+# sentence-transformers alone takes several seconds.
+IMPORT_TIME_BUDGET_US = 3_000_000
+
+HEAVY_MODULES = {"torch", "sentence_transformers", "transformers"}
+
+
+def import_times(module):
+    """
+    Runs `python -X importtime -c "import module"` in a fresh interpreter and
+    returns {module name: cumulative microseconds}.
+    """
+    env = dict(os.environ, PYTHONPATH=SRC_DIR)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_app_import_is_light():
+    times = import_times("app.main")
+    assert not HEAVY_MODULES & set(times), sorted(HEAVY_MODULES & set(times))
+    assert times["app.main"] < IMPORT_TIME_BUDGET_US
+
+
+def test_preload_models_at_startup():
+    with (
+        patch("app.main.PRELOAD_MODELS", ["model-a", "model-b"]),
+        patch("app.models.get_model") as get_model,
+    ):
+        with TestClient(app):
+            pass
+    assert [c.args[0] for c in get_model.call_args_list] == ["model-a", "model-b"]
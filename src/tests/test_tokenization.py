@@ -0,0 +1,82 @@
+import numpy as np
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock
+
+from app.main import app
+from app.cache import LRUCache, cache_requests
+from app.config import EMBEDDING_MODELS
+from app.tokenization import tokenize, tokenize_pairs
+
+client = TestClient(app)
+
+
+def make_tokenizer():
+    tokenizer = MagicMock()
+    tokenizer.side_effect = lambda texts, *args, **kwargs: {
+        "input_ids": [[ord(c) for c in t] for t in texts]
+    }
+    tokenizer.num_special_tokens_to_add.return_value = 2
+    return tokenizer
+
+
+def test_tokenize_only_sends_misses_to_tokenizer():
+    tokenizer = make_tokenizer()
+    first = tokenize(tokenizer, ["ab", "cde"])
+    assert [ids.tolist() for ids in first] == [[97, 98], [99, 100, 101]]
+    assert all(ids.dtype == np.int32 for ids in first)
+
+    hits_before = cache_requests.value(cache="tokens", result="hit")
+    second = tokenize(tokenizer, ["cde", "fg"])
+    assert [ids.tolist() for ids in second] == [[99, 100, 101], [102, 103]]
+    # Only the new string was tokenized
+    tokenizer.assert_called_with(["fg"], add_special_tokens=False)
+    assert cache_requests.value(cache="tokens", result="hit") == hits_before + 1
+
+
+def test_tokenize_pairs_caches_per_query_and_document():
+    tokenizer = make_tokenizer()
+    tokenize_pairs(tokenizer, "q", ["d1", "d2"])
+    tokenize_pairs(tokenizer, "q", ["d2", "d3"])
+    tokenizer.assert_called_with(["q"], ["d3"], add_special_tokens=True)
+    assert tokenizer.call_count == 2
+
+
+def test_lru_cache_bounded_by_weight():
+    cache = LRUCache("test", maxsize=5, weigher=len)
+    cache.put("a", np.zeros(3))
+    cache.put("b", np.zeros(2))
+    cache.put("c", np.zeros(2))  # Evicts "a"
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+    assert cache.weight == 4
+    cache.put("huge", np.zeros(10))  # Larger than the whole cache: not stored
+    assert cache.get("huge") is None
+
+
+@patch("app.main.get_model")
+def test_repeated_embedding_requests_reuse_tokens(mock_get_model):
+    model = mock_get_model.return_value
+    model.tokenizer = make_tokenizer()
+    model.max_seq_length = 8192
+    model.encode.side_effect = lambda texts: np.zeros((len(texts), 2))
+
+    payload = {"input": ["繰り返し文書", "別の文書"], "model": EMBEDDING_MODELS[0]}
+    first = client.post("/v1/embeddings", json=payload)
+    calls = model.tokenizer.call_count
+    second = client.post("/v1/embeddings", json=payload)
+
+    assert model.tokenizer.call_count == calls
+    assert first.json()["usage"] == second.json()["usage"]
+
+
+def test_tokenizer_calls_bounded_by_characters():
+    tokenizer = make_tokenizer()
+    with patch("app.tokenization.MAX_BATCH_CHARS", 10):
+        ids = tokenize(tokenizer, ["a" * 6, "b" * 3, "c" * 12, "d"])
+    assert [len(x) for x in ids] == [6, 3, 12, 1]
+    # An input longer than the limit is tokenized on its own
+    assert [c.args[0] for c in tokenizer.call_args_list] == [
+        ["a" * 6, "b" * 3],
+        ["c" * 12],
+        ["d"],
+    ]
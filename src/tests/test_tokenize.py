@@ -0,0 +1,200 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock
+
+from app import models
+from app.config import EMBEDDING_MODELS, RERANK_MODELS
+from app.main import app
+from app.models import TokenizerOnly
+from app.tokenization import token_cache
+
+client = TestClient(app)
+
+RURI = "cl-nagoya/ruri-v3-310m"
+
+
+class CharTokenizer:
+    """
+    Fast-tokenizer stand-in: one token per character, [CLS] x [SEP] around
+    a text and [CLS] a [SEP] b [SEP] around a pair.
+    """
+
+    is_fast = True
+
+    def num_special_tokens_to_add(self, pair=False):
+        return 3 if pair else 2
+
+    def decode(self, ids):
+        return "".join(chr(i) for i in ids)
+
+    def __call__(
+        self,
+        texts,
+        pairs=None,
+        add_special_tokens=True,
+        truncation=False,
+        max_length=None,
+        return_offsets_mapping=False,
+    ):
+        input_ids, offsets, sequences = [], [], []
+        for j, text in enumerate(texts):
+            first = [(i, i + 1) for i in range(len(text))]
+            second = [(i, i + 1) for i in range(len(pairs[j]))] if pairs else []
+            if truncation and pairs:
+                budget = max_length - self.num_special_tokens_to_add(True)
+                while len(first) + len(second) > budget:
+                    if len(first) > len(second):
+                        first.pop()
+                    else:
+                        second.pop()
+            elif truncation:
+                first = first[:max_length]
+            if pairs:
+                ids = [1] + [ord(text[s]) for s, _ in first] + [2]
+                ids += [ord(pairs[j][s]) for s, _ in second] + [2]
+                mapping = [(0, 0)] + first + [(0, 0)] + second + [(0, 0)]
+                seq = [None] + [0] * len(first) + [None] + [1] * len(second) + [None]
+            elif add_special_tokens:
+                ids = [1] + [ord(text[s]) for s, _ in first] + [2]
+                mapping = [(0, 0)] + first + [(0, 0)]
+                seq = [None] + [0] * len(first) + [None]
+            else:
+                ids = [ord(text[s]) for s, _ in first]
+                mapping, seq = first, [0] * len(first)
+            input_ids.append(ids)
+            offsets.append(mapping)
+            sequences.append(seq)
+        encodings = MagicMock()
+        data = {"input_ids": input_ids, "offset_mapping": offsets}
+        encodings.__getitem__.side_effect = data.__getitem__
+        encodings.sequence_ids.side_effect = sequences.__getitem__
+        return encodings
+
+
+@pytest.fixture
+def tokenizer():
+    token_cache.clear()
+    tokenizer = CharTokenizer()
+    with patch(
+        "app.main.get_tokenizer", return_value=TokenizerOnly(tokenizer, 16)
+    ) as get_tokenizer:
+        yield tokenizer, get_tokenizer
+
+
+def test_tokenize_counts_and_truncates_like_embeddings(tokenizer):
+    tok, _ = tokenizer
+    inputs = ["short", "x" * 40]
+    response = client.post(
+        "/v1/tokenize",
+        json={"model": EMBEDDING_MODELS[0], "input": inputs, "return_offsets": True},
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["max_tokens"] == 16
+    assert body["data"][0] == {
+        "object": "tokens",
+        "index": 0,
+        "tokens": 7,
+        "truncated": False,
+    }
+    assert body["data"][1]["tokens"] == 16
+    assert body["data"][1]["truncated"]
+    # 14 content tokens fit next to [CLS] and [SEP]
+    assert body["data"][1]["truncation_offset"] == 14
+
+    # Same usage as the embeddings endpoint
+    model = MagicMock()
+    model.tokenizer = tok
+    model.max_seq_length = 16
+    model.encode.side_effect = lambda texts, **kwargs: np.ones((len(texts), 4))
+    with patch("app.main.get_model", return_value=model):
+        embedded = client.post(
+            "/v1/embeddings", json={"model": EMBEDDING_MODELS[0], "input": inputs}
+        )
+    assert embedded.json()["usage"] == body["usage"]
+    assert model.encode.call_args.args[0][1] == "x" * 14
+
+
+def test_tokenize_applies_ruri_prefix(tokenizer):
+    with patch("app.main.EMBEDDING_MODELS", [RURI]):
+        response = client.post(
+            "/v1/tokenize",
+            json={
+                "model": RURI,
+                "input": ["y" * 40],
+                "input_type": "query",
+                "return_offsets": True,
+            },
+        )
+    item = response.json()["data"][0]
+    # "検索クエリ: " takes 7 of the 14 content tokens; offsets exclude it
+    assert item["truncation_offset"] == 7
+    assert item["tokens"] == 16
+
+
+def test_tokenize_pairs_like_rerank(tokenizer):
+    tok, _ = tokenizer
+    documents = ["doc", "z" * 40]
+    response = client.post(
+        "/v1/tokenize",
+        json={
+            "model": RERANK_MODELS[0],
+            "query": "query",
+            "input": documents,
+            "return_offsets": True,
+        },
+    )
+    data = response.json()["data"]
+    assert [item["tokens"] for item in data] == [11, 48]
+    assert [item["truncated"] for item in data] == [False, True]
+    # 16 - 3 special tokens - 5 query tokens
+    assert data[1]["truncation_offset"] == 8
+
+    model = MagicMock()
+    model.tokenizer = tok
+    model.predict.side_effect = lambda pairs, **kwargs: np.zeros(len(pairs))
+    with patch("app.main.get_model", return_value=model):
+        reranked = client.post(
+            "/v1/rerank",
+            json={"model": RERANK_MODELS[0], "query": "query", "documents": documents},
+        )
+    assert reranked.json()["usage"] == response.json()["usage"]
+
+
+def test_tokenize_validates_query_and_model(tokenizer):
+    _, get_tokenizer = tokenizer
+    response = client.post(
+        "/v1/tokenize", json={"model": RERANK_MODELS[0], "input": ["a"]}
+    )
+    assert response.status_code == 400
+    response = client.post(
+        "/v1/tokenize",
+        json={"model": EMBEDDING_MODELS[0], "query": "q", "input": ["a"]},
+    )
+    assert response.status_code == 400
+
+    get_tokenizer.side_effect = ValueError("Model 'nope' is not supported.")
+    response = client.post("/v1/tokenize", json={"model": "nope", "input": "a"})
+    assert response.status_code == 400
+
+
+def test_get_tokenizer_does_not_load_weights():
+    loaded = TokenizerOnly(CharTokenizer(), 128)
+    with (
+        patch("app.models.load_tokenizer", return_value=loaded) as load_tokenizer,
+        patch("app.models.load_model") as load_model,
+        patch.dict(models._tokenizer_cache, clear=True),
+    ):
+        assert models.get_tokenizer(EMBEDDING_MODELS[0]) is loaded
+        assert models.get_tokenizer(EMBEDDING_MODELS[0]) is loaded
+        load_tokenizer.assert_called_once_with(EMBEDDING_MODELS[0], "embedding")
+        load_model.assert_not_called()
+
+        # A loaded model's own tokenizer is used
+        model = MagicMock(max_seq_length=64)
+        with patch.dict(models._model_cache, {EMBEDDING_MODELS[0]: model}):
+            assert models.get_tokenizer(EMBEDDING_MODELS[0]) == (model.tokenizer, 64)
+
+    with pytest.raises(ValueError):
+        models.get_tokenizer("unknown/model")
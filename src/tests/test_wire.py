@@ -0,0 +1,155 @@
+import json
+
+import msgpack
+import numpy as np
+import pyarrow as pa
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+from app.main import app
+from app.config import EMBEDDING_MODELS, RERANK_MODELS
+from app.wire import MSGPACK, ARROW
+
+client = TestClient(app)
+
+SUPPORTED_EMBEDDING_MODEL = EMBEDDING_MODELS[0]
+SUPPORTED_RERANK_MODEL = RERANK_MODELS[0]
+
+
+@pytest.fixture
+def mock_model(fake_model):
+    model = fake_model(
+        encode=lambda texts: np.array([[len(t), 0.5, -1.0] for t in texts]),
+        predict=lambda pairs: np.array([float(len(doc)) for _, doc in pairs]),
+    )
+    model.max_length = 512
+    return model
+
+
+def arrow_stream(columns, **fields):
+    metadata = {key: json.dumps(value) for key, value in fields.items()}
+    table = pa.table(columns, metadata=metadata)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def read_arrow(content):
+    return pa.ipc.open_stream(content).read_all()
+
+
+def test_embeddings_msgpack_roundtrip(mock_model):
+    body = msgpack.packb({"input": ["a", "bbb"], "model": SUPPORTED_EMBEDDING_MODEL})
+    response = client.post(
+        "/v1/embeddings",
+        content=body,
+        headers={"Content-Type": MSGPACK, "Accept": MSGPACK},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == MSGPACK
+
+    result = msgpack.unpackb(response.content)
+    assert "data" not in result
+    assert result["model"] == SUPPORTED_EMBEDDING_MODEL
+    assert result["usage"]["total_tokens"] == 4
+    tensor = result["embeddings"]
+    assert tensor["dtype"] == "float32"
+    matrix = np.frombuffer(tensor["data"], dtype="<f4").reshape(tensor["shape"])
+    np.testing.assert_array_equal(matrix, [[1, 0.5, -1], [3, 0.5, -1]])
+
+
+def test_embeddings_arrow_roundtrip(mock_model):
+    body = arrow_stream({"input": ["a", "bb"]}, model=SUPPORTED_EMBEDDING_MODEL)
+    response = client.post(
+        "/v1/embeddings",
+        content=body,
+        headers={"Content-Type": ARROW, "Accept": ARROW},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == ARROW
+
+    table = read_arrow(response.content)
+    column = table.column("embedding").combine_chunks()
+    assert column.type == pa.list_(pa.float32(), 3)
+    matrix = column.flatten().to_numpy().reshape(len(column), 3)
+    np.testing.assert_array_equal(matrix, [[1, 0.5, -1], [2, 0.5, -1]])
+    assert json.loads(table.schema.metadata[b"model"]) == SUPPORTED_EMBEDDING_MODEL
+
+
+def test_json_stays_default(mock_model):
+    # A binary request body can still ask for a JSON response
+    body = msgpack.packb({"input": "a", "model": SUPPORTED_EMBEDDING_MODEL})
+    response = client.post(
+        "/v1/embeddings", content=body, headers={"Content-Type": MSGPACK}
+    )
+    assert response.status_code == 200
+    assert response.json()["data"][0]["embedding"] == [1.0, 0.5, -1.0]
+
+    # The highest quality value wins
+    response = client.post(
+        "/v1/embeddings",
+        json={"input": "a", "model": SUPPORTED_EMBEDDING_MODEL},
+        headers={"Accept": f"{MSGPACK};q=0.5, application/json"},
+    )
+    assert response.headers["content-type"] == "application/json"
+
+
+def test_rerank_binary_responses(mock_model):
+    body = msgpack.packb(
+        {
+            "query": "q",
+            "documents": ["a", "ccc", "bb"],
+            "model": SUPPORTED_RERANK_MODEL,
+        }
+    )
+    response = client.post(
+        "/v1/rerank",
+        content=body,
+        headers={"Content-Type": MSGPACK, "Accept": MSGPACK},
+    )
+    assert response.status_code == 200
+    result = msgpack.unpackb(response.content)
+    assert [item["document"] for item in result["data"]] == [1, 2, 0]
+
+    response = client.post(
+        "/v1/rerank",
+        content=arrow_stream(
+            {"documents": ["a", "ccc", "bb"]}, query="q", model=SUPPORTED_RERANK_MODEL
+        ),
+        headers={"Content-Type": ARROW, "Accept": ARROW},
+    )
+    assert response.status_code == 200
+    table = read_arrow(response.content)
+    assert table.column("document").to_pylist() == [1, 2, 0]
+    assert table.column("score").to_pylist() == [3.0, 2.0, 1.0]
+    assert json.loads(table.schema.metadata[b"query"]) == "q"
+
+
+def test_invalid_binary_bodies(mock_model):
+    response = client.post(
+        "/v1/embeddings", content=b"\xc1", headers={"Content-Type": MSGPACK}
+    )
+    assert response.status_code == 400
+
+    # Decoded bodies are validated like JSON ones
+    body = msgpack.packb({"input": ["a"] * 1000, "model": SUPPORTED_EMBEDDING_MODEL})
+    response = client.post(
+        "/v1/embeddings", content=body, headers={"Content-Type": MSGPACK}
+    )
+    assert response.status_code == 422
+
+
+def test_missing_optional_dependency(mock_model):
+    with patch("app.wire.importlib.import_module", side_effect=ImportError):
+        response = client.post(
+            "/v1/embeddings",
+            json={"input": "a", "model": SUPPORTED_EMBEDDING_MODEL},
+            headers={"Accept": ARROW},
+        )
+        assert response.status_code == 406
+        response = client.post(
+            "/v1/embeddings", content=b"\x80", headers={"Content-Type": MSGPACK}
+        )
+        assert response.status_code == 415